@@ -1,13 +1,22 @@
 """Diffusers backend service for image generation."""
 
 import importlib
+import os
+import threading
+import time
 from io import BytesIO
 
 import torch
 
 from backends.base import BaseBackend
 from backends.diffusers.config import DiffusersConfig
-from backends.diffusers.registry import get_model_config
+from backends.diffusers.registry import (
+    get_model_config,
+    get_models_by_gpu_tier,
+    get_supported_models,
+)
+from backends.prefetch import prefetch_files
+from backends.timing import ContainerClock
 
 
 def _get_torch_dtype(dtype_str: str):
@@ -27,6 +36,23 @@ def _get_torch_dtype(dtype_str: str):
     return dtype_map.get(dtype_str, torch.float16)
 
 
+def _model_cache_files(cache_dir: str, model_id: str) -> list[str]:
+    """List the downloaded blob files of a model in the HuggingFace hub cache.
+
+    Args:
+        cache_dir: HuggingFace cache root (HF_HOME)
+        model_id: HuggingFace model identifier
+
+    Returns:
+        Paths of the model's blob files (empty if it was never downloaded)
+    """
+    blobs_dir = os.path.join(cache_dir, "hub", f"models--{model_id.replace('/', '--')}", "blobs")
+    try:
+        return [entry.path for entry in os.scandir(blobs_dir) if entry.is_file()]
+    except OSError:
+        return []
+
+
 class DiffusersService(BaseBackend):
     """Service for generating images using HuggingFace diffusers pipelines.
 
@@ -36,19 +62,40 @@ class DiffusersService(BaseBackend):
 
     name = "diffusers"
 
-    def __init__(self, config: DiffusersConfig):
+    def __init__(self, config: DiffusersConfig, gpu_tier: str | None = None):
         """Initialize the diffusers service.
 
         Args:
             config: Diffusers configuration
+            gpu_tier: GPU tier this service runs on ('a10g' or 'l40s');
+                None means all registry models may be served
         """
         self.config = config
+        self.gpu_tier = gpu_tier
         self._current_model_id: str | None = None
         self._pipeline = None
+        self._clock = ContainerClock()
+        self.startup_seconds = 0.0
+        # Timing of the most recent generate() call, in seconds
+        self.last_timing: dict = {}
 
     def start(self) -> None:
-        """Start the service (no-op for lazy loading)."""
-        pass
+        """Start the service.
+
+        Pipelines are still loaded lazily; this only starts warming the page
+        cache, in the background, with the cached weights of the registry
+        models served on this GPU tier. The container is ready immediately.
+        """
+        if not self.config.prefetch:
+            return
+        threading.Thread(target=self._prefetch_weights, name="diffusers-prefetch", daemon=True).start()
+
+    def _prefetch_weights(self) -> None:
+        """Read the cached weights of this tier's models into the page cache."""
+        models = get_models_by_gpu_tier(self.gpu_tier) if self.gpu_tier else get_supported_models()
+        paths = [p for model_id in models for p in _model_cache_files(self.config.volume_mount, model_id)]
+        result = prefetch_files(paths)
+        print(f"Prefetched model weights: {result}")
 
     def health_check(self) -> dict:
         """Return health status.
@@ -120,14 +167,20 @@ class DiffusersService(BaseBackend):
             seed: Random seed for reproducibility
 
         Returns:
-            Raw PNG image bytes (HuggingFace Inference API style)
+            Raw PNG image bytes (HuggingFace Inference API style). Stage
+            timings are left in `last_timing`.
         """
         model_config = get_model_config(model_id)
         if model_config is None:
             raise ValueError(f"Unsupported model: {model_id}")
 
+        timing = self._clock.stamp()
+        timing["startup"] = self.startup_seconds
+        started = time.perf_counter()
+
         # Load pipeline (lazy loading)
         self._load_pipeline(model_id)
+        timing["pipeline_load"] = time.perf_counter() - started
 
         # Merge parameters with defaults
         defaults = model_config["defaults"]
@@ -152,11 +205,17 @@ class DiffusersService(BaseBackend):
             params["generator"] = torch.Generator(device="cuda").manual_seed(seed)
 
         # Generate image
+        denoise_started = time.perf_counter()
         result = self._pipeline(**params)
         image = result.images[0]
+        timing["denoise"] = time.perf_counter() - denoise_started
 
         # Return raw PNG bytes (HuggingFace Inference API style)
+        encode_started = time.perf_counter()
         buffer = BytesIO()
         image.save(buffer, format="PNG")
         buffer.seek(0)
+        timing["encode"] = time.perf_counter() - encode_started
+        timing["handler"] = time.perf_counter() - started
+        self.last_timing = timing
         return buffer.getvalue()
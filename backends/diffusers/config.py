@@ -1,5 +1,6 @@
 """Diffusers backend configuration."""
 
+import os
 from dataclasses import dataclass, field
 
 
@@ -12,3 +13,8 @@ class DiffusersConfig:
 
     # Mount path for the volume (HuggingFace default cache location)
     volume_mount: str = "/root/.cache/huggingface"
+
+    # Read cached weight files into the page cache at container startup
+    prefetch: bool = field(
+        default_factory=lambda: os.environ.get("DIFFUSERS_PREFETCH", "true").lower() == "true"
+    )
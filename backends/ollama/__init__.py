@@ -1,6 +1,6 @@
 """Ollama backend module."""
 
-from backends.ollama.backend import OllamaService
+from backends.ollama.backend import OllamaService, normalize_model_name
 from backends.ollama.config import OllamaConfig
 
-__all__ = ["OllamaService", "OllamaConfig"]
+__all__ = ["OllamaService", "OllamaConfig", "normalize_model_name"]
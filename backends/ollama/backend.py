@@ -1,16 +1,116 @@
 """Ollama backend implementation."""
 
+import asyncio
+import json
 import os
 import subprocess
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 import httpx
 
-from typing import Iterator
+from typing import AsyncIterator, Awaitable, Callable
 
 from backends.base import BaseBackend
 from backends import register_backend
+from backends.ollama.coalesce import coalesce_chunks
 from backends.ollama.config import OllamaConfig
+from backends.prefetch import prefetch_files
+from backends.timing import ContainerClock, ollama_durations, ollama_durations_raw
+
+
+# Response headers that describe one hop's framing, not the content
+HOP_HEADERS = {"connection", "content-encoding", "content-length", "date", "keep-alive", "transfer-encoding"}
+
+
+class ModelPullFailed(Exception):
+    """A request needs a model whose background pull failed."""
+
+    def __init__(self, model: str, error: BaseException):
+        super().__init__(f"model '{model}' is unavailable: pull failed ({error}); a later request retries it")
+        self.model = model
+
+
+def normalize_model_name(name: str) -> str:
+    """Return the canonical model name, adding Ollama's implicit ':latest' tag."""
+    return name if ":" in name else f"{name}:latest"
+
+
+def _manifest_path(models_dir: str, model: str) -> str:
+    """Return the manifest path for a model in an Ollama models directory.
+
+    'glm-4.7-flash:q8_0' maps to
+    manifests/registry.ollama.ai/library/glm-4.7-flash/q8_0.
+    """
+    name, tag = normalize_model_name(model).rsplit(":", 1)
+    parts = name.split("/")
+    if len(parts) == 1:
+        parts = ["library", *parts]
+    if len(parts) == 2:
+        parts = ["registry.ollama.ai", *parts]
+    return os.path.join(models_dir, "manifests", *parts, tag)
+
+
+def _model_blob_paths(models_dir: str, model: str) -> list[str]:
+    """Return the blob files (weights, template, params) of a cached model."""
+    try:
+        with open(_manifest_path(models_dir, model)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return []
+    layers = [manifest.get("config", {}), *manifest.get("layers", [])]
+    return [
+        os.path.join(models_dir, "blobs", layer["digest"].replace(":", "-"))
+        for layer in layers
+        if layer.get("digest")
+    ]
+
+
+def _keep_alive(value: str) -> int | float | str:
+    """Convert OLLAMA_KEEP_ALIVE to an API `keep_alive` value.
+
+    `ollama serve` accepts "-1" in its environment, but the API parses a
+    string `keep_alive` as a Go duration, which needs a unit. A number is
+    read as seconds (negative: keep loaded indefinitely), so numeric
+    settings are sent as numbers and durations such as "30m" as strings.
+    """
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+async def _until_cancelled(chunks: AsyncIterator[bytes], cancelled: Awaitable) -> AsyncIterator[bytes]:
+    """Yield from `chunks` until `cancelled` completes, then stop.
+
+    The pending read is cancelled, so the caller can close the upstream
+    connection right away. If `cancelled` fails (e.g. the signal channel is
+    unreachable), the stream carries on without it.
+    """
+    stop = asyncio.ensure_future(cancelled)
+    step = None
+    try:
+        while True:
+            step = asyncio.ensure_future(anext(chunks))
+            await asyncio.wait((step, stop) if not stop.done() else (step,), return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                if stop.exception() is None:
+                    return
+                print(f"Stream cancel signal failed: {stop.exception()}")
+                await asyncio.wait((step,))
+            try:
+                chunk = step.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        stop.cancel()
+        if step is not None and not step.done():
+            step.cancel()
+            await asyncio.wait((step,))
 
 
 @register_backend
@@ -19,47 +119,310 @@ class OllamaService(BaseBackend):
 
     name = "ollama"
 
-    def __init__(self, config: OllamaConfig | None = None, volume=None):
+    def __init__(
+        self,
+        config: OllamaConfig | None = None,
+        volume=None,
+        metadata=None,
+        cancel_signal: Callable[[str], Awaitable] | None = None,
+    ):
         self.config = config or OllamaConfig()
         self.volume = volume
+        # Dict-like store (e.g. modal.Dict) receiving the model metadata snapshot
+        self.metadata = metadata
+        # Returns an awaitable that completes once the caller abandons the stream with that key
+        self.cancel_signal = cancel_signal
         self._process = None
+        self._client: httpx.AsyncClient | None = None
+        self._base_url = f"http://localhost:{self.config.port}"
+        # Model pulls started by start(), keyed by normalized model name
+        self._pulls: dict[str, Future] = {}
+        self._pulls_lock = threading.Lock()
+        # Runs pulls retried by requests after a failed background pull
+        self._pull_retries = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ollama-pull-retry")
+        # Seconds spent in each startup stage, reported by health_check()
+        self.startup_timings: dict[str, float] = {}
+        # Container age and first-request flag for per-request timing
+        self._clock = ContainerClock()
+
+    @property
+    def keep_alive(self) -> str:
+        """OLLAMA_KEEP_ALIVE for the server: the setting, else "-1" when preloading, else unset ("")."""
+        return self.config.keep_alive or ("-1" if self.config.preload_models else "")
 
     def start(self) -> None:
         """Start Ollama server and pull configured models."""
-        # Start ollama serve in background
+        started = time.perf_counter()
+
+        # Warm the page cache with model weights while the server boots. Only
+        # a preload reads weights during startup, so only a preload waits for it.
+        prefetch = None
+        if self.config.prefetch:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ollama-prefetch")
+            prefetch = executor.submit(self._prefetch_weights)
+            executor.shutdown(wait=False)
+
+        # Start ollama serve in background. Preloaded models stay resident
+        # unless OLLAMA_KEEP_ALIVE says otherwise; without a preload, Ollama's
+        # default applies.
+        env = {
+            **os.environ,
+            "OLLAMA_HOST": f"0.0.0.0:{self.config.port}",
+            "OLLAMA_NUM_PARALLEL": str(self.config.num_parallel),
+        }
+        if self.keep_alive:
+            env["OLLAMA_KEEP_ALIVE"] = self.keep_alive
         self._process = subprocess.Popen(
             ["ollama", "serve"],
-            env={**os.environ, "OLLAMA_HOST": "0.0.0.0"},
+            env=env,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
-        time.sleep(5)
+        self._wait_until_ready()
+        self.startup_timings["server_ready"] = time.perf_counter() - started
+
+        # Pull models that are not already cached on the volume
+        self._pull_missing_models()
+        self.startup_timings["models_ready"] = time.perf_counter() - started
+
+        # Load weights into VRAM so the first request skips the model load
+        if self.config.preload_models:
+            if prefetch is not None:
+                prefetch.result()
+            self._preload_models()
+            self.startup_timings["preload"] = time.perf_counter() - started
+
+        self._client = self._create_client()
+        self._publish_metadata()
+        self.startup_timings["total"] = time.perf_counter() - started
+        print(
+            f"Ollama ready in {self.startup_timings['total']:.2f}s "
+            f"(server {self.startup_timings['server_ready']:.2f}s)"
+        )
 
-        # Pull models if not already cached
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-        pulled_any = False
+    def _publish_metadata(self) -> None:
+        """Write the model metadata snapshot for the gateway.
 
+        The snapshot holds the /api/tags and /v1/models responses plus
+        /api/show output per model, so the gateway can answer those requests
+        without waking a GPU container. Failures are logged, not raised.
+        """
+        if self.metadata is None:
+            return
+        try:
+            with httpx.Client(base_url=self._base_url, timeout=30.0) as client:
+                tags = client.get("/api/tags").json()
+                v1_models = client.get("/v1/models").json()
+                show = {}
+                for model in tags.get("models", []):
+                    response = client.post("/api/show", json={"model": model["name"]})
+                    if response.status_code == 200:
+                        show[normalize_model_name(model["name"])] = response.json()
+            self.metadata[self.config.metadata_key] = {
+                "updated_at": time.time(),
+                "tags": tags,
+                "v1_models": v1_models,
+                "show": show,
+            }
+            print(f"Published metadata snapshot for {len(show)} model(s).")
+        except Exception as e:
+            print(f"Failed to publish metadata snapshot: {e}")
+
+    def _prefetch_weights(self) -> None:
+        """Read cached weight blobs for the served models into the page cache.
+
+        Only the preload models are prefetched when preloading is configured,
+        since those are the ones read during startup. Without a preload this
+        runs in the background and startup does not wait for it.
+        """
+        models_dir = os.path.join(self.config.volume_mount, "models")
+        models = self.config.preload_models or self.config.models
+        paths = sorted({p for model in models for p in _model_blob_paths(models_dir, model)})
+        result = prefetch_files(paths)
+        self.startup_timings["prefetch"] = result.seconds
+        print(f"Prefetched model weights: {result}")
+
+    def _pull_missing_models(self) -> None:
+        """Pull configured models missing from the server, a few at a time.
+
+        The cache check compares exact model names from /api/tags. Pulls run on
+        a bounded thread pool and the volume is committed once when they finish.
+        In lazy mode the pulls continue in the background: cached models are
+        served right away and requests for a pending model wait for its pull.
+        """
+        with httpx.Client(base_url=self._base_url, timeout=10.0) as client:
+            response = client.get("/api/tags")
+            response.raise_for_status()
+            cached = {normalize_model_name(m["name"]) for m in response.json().get("models", [])}
+
+        missing = []
         for model in self.config.models:
-            if model not in result.stdout:
-                print(f"Pulling model {model}...")
-                subprocess.run(["ollama", "pull", model], check=True)
-                pulled_any = True
-                print(f"Model {model} pulled.")
-            else:
+            if normalize_model_name(model) in cached:
                 print(f"Model {model} already cached.")
+            else:
+                missing.append(model)
+        if not missing:
+            return
 
-        # Commit volume if we pulled new models
-        if pulled_any and self.volume is not None:
+        executor = ThreadPoolExecutor(
+            max_workers=self.config.pull_concurrency, thread_name_prefix="ollama-pull"
+        )
+        self._pulls = {normalize_model_name(m): executor.submit(self._pull_model, m) for m in missing}
+        executor.shutdown(wait=False)
+
+        if self.config.lazy_pull:
+            print(f"Pulling {len(missing)} model(s) in the background.")
+            threading.Thread(target=self._finish_pulls, daemon=True).start()
+        else:
+            self._finish_pulls()
+
+    def _pull_model(self, model: str) -> None:
+        """Pull one model through the Ollama API."""
+        print(f"Pulling model {model}...")
+        with httpx.Client(base_url=self._base_url, timeout=None) as client:
+            response = client.post("/api/pull", json={"model": model, "stream": False})
+            if response.is_error:
+                raise RuntimeError(f"Ollama returned {response.status_code}: {response.text.strip()}")
+        print(f"Model {model} pulled.")
+
+    def _finish_pulls(self) -> None:
+        """Wait for pending pulls and commit the volume once.
+
+        Raises:
+            Exception: The first pull failure, when not in lazy mode
+        """
+        wait(self._pulls.values())
+        failures = {m: f.exception() for m, f in self._pulls.items() if f.exception()}
+        for model, error in failures.items():
+            print(f"Failed to pull model {model}: {error}")
+
+        if len(failures) < len(self._pulls) and self.volume is not None:
             self.volume.commit()
             print("All new models cached to volume.")
 
+        if failures and not self.config.lazy_pull:
+            raise next(iter(failures.values()))
+
+        # Lazily pulled models appear in the snapshot once they are available
+        if self.config.lazy_pull:
+            self._publish_metadata()
+
+    def _preload_models(self) -> None:
+        """Load the configured preload models into VRAM one at a time.
+
+        An empty /api/generate request loads a model without generating; its
+        `keep_alive` keeps the weights resident for the container's lifetime.
+        Models still being pulled in lazy mode are skipped.
+        """
+        with httpx.Client(base_url=self._base_url, timeout=None) as client:
+            for model in self.config.preload_models:
+                pull = self._pulls.get(normalize_model_name(model))
+                if pull is not None and not pull.done():
+                    print(f"Skipping preload of {model}: still pulling.")
+                    continue
+                loaded = time.perf_counter()
+                response = client.post(
+                    "/api/generate",
+                    json={"model": model, "keep_alive": _keep_alive(self.keep_alive)},
+                )
+                response.raise_for_status()
+                print(f"Model {model} loaded into VRAM in {time.perf_counter() - loaded:.2f}s.")
+
+    def _retry_pull(self, model: str) -> None:
+        """Pull a model again after its pull failed, then commit and republish."""
+        try:
+            self._pull_model(model)
+        except Exception as e:
+            print(f"Failed to pull model {model}: {e}")
+            raise
+        if self.volume is not None:
+            self.volume.commit()
+        self._publish_metadata()
+
+    async def _wait_for_model(self, model: str | None) -> None:
+        """Wait for a model that is still being pulled before using it.
+
+        After a pull fails, the next request for the model starts a new pull
+        and waits for it.
+
+        Raises:
+            ModelPullFailed: The pull this request waited for failed
+        """
+        key = normalize_model_name(model) if model else None
+        if key not in self._pulls:
+            return
+        with self._pulls_lock:
+            future = self._pulls[key]
+            if future.done() and future.exception() is not None:
+                print(f"Retrying pull of model {model}...")
+                future = self._pulls[key] = self._pull_retries.submit(self._retry_pull, model)
+        if not future.done():
+            print(f"Waiting for model {model} to finish pulling...")
+        try:
+            await asyncio.wrap_future(future)
+        except Exception as e:
+            raise ModelPullFailed(model, e) from e
+
+    def _wait_until_ready(self) -> None:
+        """Poll the Ollama server until it answers, with backoff and a deadline.
+
+        Raises:
+            RuntimeError: If `ollama serve` exits or does not answer within
+                `config.startup_timeout` seconds
+        """
+        deadline = time.monotonic() + self.config.startup_timeout
+        delay = 0.05
+        with httpx.Client(timeout=1.0) as client:
+            while True:
+                exit_code = self._process.poll()
+                if exit_code is not None:
+                    raise RuntimeError(f"ollama serve exited with code {exit_code} during startup")
+                try:
+                    if client.get(f"{self._base_url}/").status_code == 200:
+                        return
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() + delay > deadline:
+                    self._process.terminate()
+                    raise RuntimeError(
+                        f"ollama serve not ready after {self.config.startup_timeout:.0f}s"
+                    )
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+
+    def _create_client(self) -> httpx.AsyncClient:
+        """Create the pooled HTTP client shared by all concurrent inputs.
+
+        Keep-alive connections are sized to Ollama's parallel decode slots so
+        concurrent requests reuse sockets instead of reconnecting per call.
+        """
+        return httpx.AsyncClient(
+            base_url=self._base_url,
+            timeout=600.0,
+            limits=httpx.Limits(max_keepalive_connections=self.config.num_parallel),
+        )
+
+    async def stop(self) -> None:
+        """Close the pooled HTTP client and stop the Ollama server."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._process is not None:
+            self._process.terminate()
+            self._process = None
+
     def health_check(self) -> dict:
         """Check if Ollama server is responding."""
         try:
             with httpx.Client(timeout=5.0) as client:
-                response = client.get(f"http://localhost:{self.config.port}/")
+                response = client.get(f"{self._base_url}/")
                 if response.status_code == 200:
-                    return {"status": "healthy", "port": self.config.port}
+                    return {
+                        "status": "healthy",
+                        "port": self.config.port,
+                        "startup_timings": self.startup_timings,
+                        "pending_pulls": [m for m, f in self._pulls.items() if not f.done()],
+                    }
         except Exception as e:
             return {"status": "unhealthy", "error": str(e)}
         return {"status": "unhealthy"}
@@ -68,7 +431,7 @@ class OllamaService(BaseBackend):
     # Methods for remote invocation via @modal.method()
     # =========================================================================
 
-    def generate(self, model: str, prompt: str, **kwargs) -> dict:
+    async def generate(self, model: str, prompt: str, **kwargs) -> dict:
         """Generate text using Ollama.
 
         Args:
@@ -79,14 +442,14 @@ class OllamaService(BaseBackend):
         Returns:
             Generation response dict
         """
-        with httpx.Client(timeout=600.0) as client:
-            response = client.post(
-                f"http://localhost:{self.config.port}/api/generate",
-                json={"model": model, "prompt": prompt, "stream": False, **kwargs},
-            )
-            return response.json()
+        await self._wait_for_model(model)
+        response = await self._client.post(
+            "/api/generate",
+            json={"model": model, "prompt": prompt, "stream": False, **kwargs},
+        )
+        return response.json()
 
-    def chat(self, model: str, messages: list, **kwargs) -> dict:
+    async def chat(self, model: str, messages: list, **kwargs) -> dict:
         """Chat completion using Ollama.
 
         Args:
@@ -97,24 +460,23 @@ class OllamaService(BaseBackend):
         Returns:
             Chat completion response dict
         """
-        with httpx.Client(timeout=600.0) as client:
-            response = client.post(
-                f"http://localhost:{self.config.port}/api/chat",
-                json={"model": model, "messages": messages, "stream": False, **kwargs},
-            )
-            return response.json()
+        await self._wait_for_model(model)
+        response = await self._client.post(
+            "/api/chat",
+            json={"model": model, "messages": messages, "stream": False, **kwargs},
+        )
+        return response.json()
 
-    def list_models(self) -> dict:
+    async def list_models(self) -> dict:
         """List available models.
 
         Returns:
             Dict with 'models' key containing list of model info
         """
-        with httpx.Client(timeout=10.0) as client:
-            response = client.get(f"http://localhost:{self.config.port}/api/tags")
-            return response.json()
+        response = await self._client.get("/api/tags", timeout=10.0)
+        return response.json()
 
-    def show_model(self, name: str) -> dict:
+    async def show_model(self, name: str) -> dict:
         """Show model information.
 
         Args:
@@ -123,14 +485,11 @@ class OllamaService(BaseBackend):
         Returns:
             Model information dict
         """
-        with httpx.Client(timeout=10.0) as client:
-            response = client.post(
-                f"http://localhost:{self.config.port}/api/show",
-                json={"name": name},
-            )
-            return response.json()
+        await self._wait_for_model(name)
+        response = await self._client.post("/api/show", json={"name": name}, timeout=10.0)
+        return response.json()
 
-    def embeddings(self, model: str, input: str | list[str], **kwargs) -> dict:
+    async def embeddings(self, model: str, input: str | list[str], **kwargs) -> dict:
         """Generate embeddings.
 
         Args:
@@ -141,14 +500,15 @@ class OllamaService(BaseBackend):
         Returns:
             Embeddings response dict
         """
-        with httpx.Client(timeout=300.0) as client:
-            response = client.post(
-                f"http://localhost:{self.config.port}/api/embed",
-                json={"model": model, "input": input, **kwargs},
-            )
-            return response.json()
+        await self._wait_for_model(model)
+        response = await self._client.post(
+            "/api/embed",
+            json={"model": model, "input": input, **kwargs},
+            timeout=300.0,
+        )
+        return response.json()
 
-    def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
         """Generic proxy to forward requests to local Ollama server.
 
         Args:
@@ -157,39 +517,152 @@ class OllamaService(BaseBackend):
             body: Request body for POST requests
 
         Returns:
-            Dict with 'status_code' and 'body' from Ollama response
-        """
-        url = f"http://localhost:{self.config.port}{path}"
-        with httpx.Client(timeout=600.0) as client:
-            if method == "GET":
-                response = client.get(url)
-            elif method == "POST":
-                response = client.post(url, json=body)
-            elif method == "DELETE":
-                response = client.delete(url)
-            else:
-                return {"status_code": 405, "body": {"error": f"Method {method} not allowed"}}
-
+            Dict with 'status_code' and 'body' from Ollama response, and
+            'timing' (seconds): container age, first-request flag, container
+            startup, time waiting for a model pull, handler time and Ollama's
+            own load/prompt_eval/eval durations when it reports them. A
+            model whose pull failed gives a 503 with the pull error.
+        """
+        timing = self._clock.stamp()
+        timing["startup"] = self.startup_timings.get("total", 0.0)
+        started = time.perf_counter()
+        if body:
             try:
-                return {"status_code": response.status_code, "body": response.json()}
-            except Exception:
-                return {"status_code": response.status_code, "body": response.text}
+                await self._wait_for_model(body.get("model") or body.get("name"))
+            except ModelPullFailed as e:
+                return {"status_code": 503, "body": {"error": str(e)}, "timing": timing}
+        timing["model_wait"] = time.perf_counter() - started
+
+        if method == "GET":
+            response = await self._client.get(path)
+        elif method == "POST":
+            response = await self._client.post(path, json=body)
+        elif method == "DELETE":
+            response = await self._client.delete(path)
+        else:
+            return {"status_code": 405, "body": {"error": f"Method {method} not allowed"}}
+
+        try:
+            content = response.json()
+        except Exception:
+            content = response.text
+        timing.update(ollama_durations(content))
+        timing["handler"] = time.perf_counter() - started
+        return {"status_code": response.status_code, "body": content, "timing": timing}
+
+    async def raw_proxy(
+        self,
+        method: str,
+        path: str,
+        content: bytes = b"",
+        content_type: str | None = None,
+        model: str | None = None,
+    ) -> dict:
+        """Forward an undecoded request body and return Ollama's response bytes.
+
+        Neither body is parsed, so a multi-megabyte request or response costs
+        a copy rather than a JSON decode and re-encode on each side.
 
-    def stream_proxy(self, path: str, body: dict) -> Iterator[bytes]:
+        Args:
+            method: HTTP method (GET, POST, DELETE)
+            path: Request path (e.g., '/api/chat', '/v1/embeddings')
+            content: Raw request body
+            content_type: Request Content-Type, forwarded unchanged
+            model: Model the request uses, so a pending pull can be awaited
+
+        Returns:
+            Dict with 'status_code', 'content' (raw response bytes),
+            'headers' (Ollama's response headers, minus per-hop framing) and
+            'timing' as in `proxy` (a 503 if the model's pull failed)
+        """
+        timing = self._clock.stamp()
+        timing["startup"] = self.startup_timings.get("total", 0.0)
+        started = time.perf_counter()
+        try:
+            await self._wait_for_model(model)
+        except ModelPullFailed as e:
+            return {
+                "status_code": 503,
+                "content": json.dumps({"error": str(e)}).encode(),
+                "headers": {"content-type": "application/json"},
+                "timing": timing,
+            }
+        timing["model_wait"] = time.perf_counter() - started
+
+        if method not in ("GET", "POST", "DELETE"):
+            return {
+                "status_code": 405,
+                "content": json.dumps({"error": f"Method {method} not allowed"}).encode(),
+                "headers": {"content-type": "application/json"},
+                "timing": timing,
+            }
+        headers = {"content-type": content_type} if content_type else {}
+        response = await self._client.request(method, path, content=content or None, headers=headers)
+
+        timing.update(ollama_durations_raw(response.content))
+        timing["handler"] = time.perf_counter() - started
+        return {
+            "status_code": response.status_code,
+            "content": response.content,
+            "headers": {k: v for k, v in response.headers.items() if k not in HOP_HEADERS},
+            "timing": timing,
+        }
+
+    async def stream_proxy(
+        self,
+        path: str,
+        body: dict,
+        content: bytes | None = None,
+        content_type: str | None = None,
+        cancel_key: str | None = None,
+    ) -> AsyncIterator[bytes]:
         """Stream proxy for SSE responses.
 
-        Yields raw bytes from Ollama's streaming response.
+        Yields raw bytes from Ollama's streaming response, coalesced into
+        batches of whole lines unless `config.stream_coalesce_bytes` is 0.
         Use with Modal's .remote_gen() to maintain CPU/GPU separation.
 
+        A Modal generator keeps running after its caller stops reading, so
+        the caller can instead signal `cancel_key` through `cancel_signal`.
+        The stream then ends early and its Ollama connection is closed,
+        which makes Ollama stop decoding.
+
         Args:
             path: Request path (e.g., '/api/generate', '/v1/chat/completions')
-            body: Request body (should include stream: true)
+            body: Request body (should include stream: true). With `content`,
+                only its `model` is read.
+            content: Raw request body to forward instead of encoding `body`
+            content_type: Content-Type of `content`
+            cancel_key: Key the caller cancels the stream with (None: only
+                closing the generator ends it early)
 
         Yields:
-            Raw bytes from Ollama's streaming response
+            Raw bytes from Ollama's streaming response, or a single error
+            event if the model could not be pulled
         """
-        url = f"http://localhost:{self.config.port}{path}"
-        with httpx.Client(timeout=600.0) as client:
-            with client.stream("POST", url, json=body) as response:
-                for chunk in response.iter_bytes():
-                    yield chunk
+        try:
+            await self._wait_for_model(body.get("model"))
+        except ModelPullFailed as e:
+            # Headers are already sent, so the error goes in the stream, as Ollama does
+            error = json.dumps({"error": str(e)})
+            yield f"data: {error}\n\n".encode() if path.startswith("/v1/") else f"{error}\n".encode()
+            return
+        if content is not None:
+            request = self._client.stream(
+                "POST", path, content=content, headers={"content-type": content_type or "application/json"}
+            )
+        else:
+            request = self._client.stream("POST", path, json=body)
+        async with request as response:
+            chunks = response.aiter_bytes()
+            if self.config.stream_coalesce_bytes > 0:
+                # Batch per-token chunks into fewer generator messages
+                chunks = coalesce_chunks(
+                    chunks,
+                    max_bytes=self.config.stream_coalesce_bytes,
+                    max_delay=self.config.stream_coalesce_ms / 1000,
+                )
+            if cancel_key and self.cancel_signal is not None:
+                chunks = _until_cancelled(chunks, self.cancel_signal(cancel_key))
+            async for chunk in chunks:
+                yield chunk
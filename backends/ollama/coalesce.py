@@ -0,0 +1,90 @@
+"""Nagle-style coalescing of streamed chunks.
+
+During fast decoding Ollama writes one small chunk per token, and each chunk
+becomes its own Modal generator message. Coalescing batches chunks into
+fewer, larger messages while keeping time to first token low:
+
+- the first complete line is flushed as soon as it arrives
+- later lines are held until `max_bytes` accumulate or `max_delay` passes
+- output is only split on line boundaries, so every message carries whole
+  SSE events or NDJSON objects
+"""
+
+import asyncio
+from typing import AsyncIterator
+
+
+class _End:
+    """Marks the end of the upstream iterator (optionally with an error)."""
+
+    def __init__(self, error: BaseException | None = None):
+        self.error = error
+
+
+async def coalesce_chunks(
+    chunks: AsyncIterator[bytes],
+    max_bytes: int = 4096,
+    max_delay: float = 0.01,
+) -> AsyncIterator[bytes]:
+    """Re-chunk a byte stream into batches of complete lines.
+
+    Args:
+        chunks: Upstream byte chunks (e.g. `response.aiter_bytes()`)
+        max_bytes: Flush once this many bytes are buffered
+        max_delay: Flush buffered lines at most this many seconds after
+            the oldest arrived
+
+    Yields:
+        Batches of complete lines; any unterminated tail is yielded last
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump() -> None:
+        # Read upstream in its own task so the flush timer can fire between chunks
+        try:
+            async for chunk in chunks:
+                queue.put_nowait(chunk)
+        except Exception as e:
+            queue.put_nowait(_End(e))
+        else:
+            queue.put_nowait(_End())
+
+    reader = asyncio.create_task(pump())
+    buffer = bytearray()
+    deadline: float | None = None
+    first = True
+    try:
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if isinstance(item, _End):
+                if item.error is not None:
+                    raise item.error
+                break
+            if item is not None:
+                buffer += item
+                if deadline is None:
+                    deadline = loop.time() + max_delay
+
+            if item is None or first or len(buffer) >= max_bytes:
+                cut = buffer.rfind(b"\n") + 1
+                if cut:
+                    yield bytes(buffer[:cut])
+                    del buffer[:cut]
+                    first = False
+                # Only a partial line left: wait for the rest before timing again
+                deadline = None if not buffer or not cut else loop.time() + max_delay
+
+        if buffer:
+            yield bytes(buffer)
+    finally:
+        reader.cancel()
+        try:
+            await reader
+        except asyncio.CancelledError:
+            pass
@@ -23,8 +23,64 @@ class OllamaConfig:
     # Port Ollama listens on
     port: int = 11434
 
+    # Parallel decode slots per model (OLLAMA_NUM_PARALLEL for `ollama serve`).
+    # The container accepts the same number of concurrent inputs.
+    num_parallel: int = field(
+        default_factory=lambda: int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+    )
+
+    # Streamed chunks are batched up to this many bytes (0 disables coalescing)
+    stream_coalesce_bytes: int = field(
+        default_factory=lambda: int(os.environ.get("OLLAMA_STREAM_COALESCE_BYTES", "4096"))
+    )
+
+    # Maximum milliseconds a streamed line waits to be batched with later ones
+    stream_coalesce_ms: float = field(
+        default_factory=lambda: float(os.environ.get("OLLAMA_STREAM_COALESCE_MS", "10"))
+    )
+
+    # Seconds to wait for `ollama serve` to answer before failing startup
+    startup_timeout: float = field(
+        default_factory=lambda: float(os.environ.get("OLLAMA_STARTUP_TIMEOUT", "60"))
+    )
+
+    # Maximum number of models pulled at the same time
+    pull_concurrency: int = field(
+        default_factory=lambda: int(os.environ.get("OLLAMA_PULL_CONCURRENCY", "2"))
+    )
+
+    # Serve cached models immediately and pull missing ones in the background
+    lazy_pull: bool = field(
+        default_factory=lambda: os.environ.get("OLLAMA_LAZY_PULL", "false").lower() == "true"
+    )
+
+    # Models loaded into VRAM during container startup (opt-in, comma-separated)
+    preload_models: list[str] = field(
+        default_factory=lambda: [
+            m for m in os.environ.get("OLLAMA_PRELOAD_MODELS", "").split(",") if m
+        ]
+    )
+
+    # How long Ollama keeps idle models in VRAM (OLLAMA_KEEP_ALIVE). "-1" keeps
+    # them resident until the container itself scales down. Unset: Ollama's
+    # own default, or "-1" when models are preloaded.
+    keep_alive: str = field(
+        default_factory=lambda: os.environ.get("OLLAMA_KEEP_ALIVE", "")
+    )
+
+    # Read cached weight blobs into the page cache at container startup
+    prefetch: bool = field(
+        default_factory=lambda: os.environ.get("OLLAMA_PREFETCH", "true").lower() == "true"
+    )
+
     # Volume name for model storage
     volume_name: str = "ollama-models"
 
     # Mount path for the volume
     volume_mount: str = "/root/.ollama"
+
+    # Modal Dict holding the model metadata snapshot served by the gateway
+    metadata_dict_name: str = "ollama-metadata"
+
+    # Key of this backend's snapshot in the metadata Dict
+    metadata_key: str = "models"
@@ -0,0 +1,48 @@
+"""Per-request timing that backends report back to the gateway.
+
+Backends attach a `timing` dict (seconds) to each response; the gateway
+turns it into a `Server-Timing` header so a slow request can be attributed
+to a cold start, model load, prompt evaluation or decoding.
+"""
+
+import time
+
+from common.peek import peek_json
+
+# Ollama response fields (nanoseconds) copied into the timing report
+OLLAMA_DURATIONS = {
+    "load_duration": "load",
+    "prompt_eval_duration": "prompt_eval",
+    "eval_duration": "eval",
+}
+
+
+class ContainerClock:
+    """Tracks container age and whether a request is the container's first."""
+
+    def __init__(self):
+        self._started = time.monotonic()
+        self._requests = 0
+
+    def stamp(self) -> dict:
+        """Return container age and first-request flag for a request starting now."""
+        self._requests += 1
+        return {
+            "container_age": time.monotonic() - self._started,
+            "first_request": self._requests == 1,
+        }
+
+
+def ollama_durations(body) -> dict:
+    """Extract Ollama's own load/prompt-eval/eval durations from a response body."""
+    if not isinstance(body, dict):
+        return {}
+    return {name: body[field] / 1e9 for field, name in OLLAMA_DURATIONS.items() if field in body}
+
+
+def ollama_durations_raw(content: bytes) -> dict:
+    """Like `ollama_durations`, for an undecoded JSON response body."""
+    try:
+        return ollama_durations(peek_json(content, OLLAMA_DURATIONS))
+    except ValueError:
+        return {}
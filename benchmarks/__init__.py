@@ -0,0 +1 @@
+"""Offline benchmarks that run against local stand-ins instead of Modal GPUs."""
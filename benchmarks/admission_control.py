@@ -0,0 +1,102 @@
+"""Benchmark: gateway behaviour under a burst with and without admission control.
+
+Runs the gateway in-process against a stand-in Ollama backend that serves
+`--capacity` requests at a time, then fires a burst of non-streaming chat
+requests. Compares a queue with room for the whole burst and no deadline
+(the old behaviour) with a bounded queue and an `X-Request-Timeout`
+deadline, reporting status codes, latency of successful requests and how
+fast rejected clients hear back.
+
+Run:
+    python -m benchmarks.admission_control --burst 200 --capacity 4 --queue 16
+"""
+
+import argparse
+import asyncio
+import collections
+import time
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInCls
+from common import AdmissionController
+
+
+class BoundedOllama:
+    """Ollama stand-in serving `capacity` requests at once, `seconds` each."""
+
+    def __init__(self, capacity: int, seconds: float):
+        self.slots = asyncio.Semaphore(capacity)
+        self.seconds = seconds
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        async with self.slots:
+            await asyncio.sleep(self.seconds)
+        return {"status_code": 200, "body": {"message": {"role": "assistant", "content": "ok"}}}
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def burst(args: argparse.Namespace, max_queue: int, deadline: bool) -> None:
+    serve.OllamaBackend = StandInCls(BoundedOllama(args.capacity, args.backend_seconds))
+    serve.ollama_admission = AdmissionController("ollama", args.capacity, max_queue)
+
+    body = {"model": "glm-4.7-flash:q4_K_M", "messages": [{"role": "user", "content": "hi"}]}
+    headers = {"X-Request-Timeout": str(args.deadline)} if deadline else {}
+
+    async def one(i: int) -> tuple[int, float, str | None]:
+        started = time.perf_counter()
+        # Distinct bodies so in-flight coalescing does not merge the burst
+        response = await client.post(
+            "/ollama/api/chat", json={**body, "user": str(i)}, headers=headers
+        )
+        return response.status_code, time.perf_counter() - started, response.headers.get("retry-after")
+
+    transport = httpx.ASGITransport(app=serve.gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        results = await asyncio.gather(*(one(i) for i in range(args.burst)))
+
+    by_status = collections.defaultdict(list)
+    for status, latency, _ in results:
+        by_status[status].append(latency)
+    ok = by_status.get(200, [])
+    late = sum(1 for latency in ok if latency > args.deadline)
+    label = f"queue of {max_queue}, " + ("deadline header" if deadline else "no deadline")
+    print(f"{label}:")
+    print(f"  statuses        {dict(sorted((s, len(v)) for s, v in by_status.items()))}")
+    print(f"  200 latency     p50 {percentile(ok, 0.5):6.2f}s  p99 {percentile(ok, 0.99):6.2f}s  "
+          f"answered after the {args.deadline:g}s deadline: {late}")
+    for status in (429, 503):
+        if status in by_status:
+            retry = {r for s, _, r in results if s == status}
+            print(f"  {status} latency     p50 {percentile(by_status[status], 0.5):6.2f}s  "
+                  f"Retry-After {sorted(retry)}")
+    print(f"  admission       {serve.ollama_admission.stats()}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(f"burst of {args.burst}, backend serves {args.capacity} at a time, "
+          f"{args.backend_seconds}s each, client deadline {args.deadline}s")
+    # Room for the whole burst and no deadline: what the gateway did before
+    await burst(args, max_queue=args.burst, deadline=False)
+    await burst(args, max_queue=args.queue, deadline=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--backend-seconds", type=float, default=0.2)
+    parser.add_argument("--deadline", type=float, default=2.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
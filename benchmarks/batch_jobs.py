@@ -0,0 +1,304 @@
+"""Check and benchmark: batch jobs vs one request at a time.
+
+A stand-in backend simulates one Ollama container with `--slots` parallel
+slots, each chat taking `--generate-seconds`. The `gateway-batches` Dict
+and Volume are replaced by in-memory and temporary-directory stand-ins,
+and `run_batch.spawn` runs the job in a local task.
+
+1. Baseline: a client sends `--requests` chats through
+   /ollama/v1/chat/completions one at a time, as a nightly job would.
+2. Batch: the same requests are uploaded as a JSONL file and run as a
+   batch job. The output file is downloaded when the job completes. One
+   extra request names an unknown model, so the error file is exercised
+   too.
+3. Crash: a second job is killed halfway through and a partial result
+   line is left at the end of its output file. The job is then started
+   again. Every custom_id must get exactly one result line, and the
+   backend may only redo the requests that were in flight.
+4. Cancel: a third job is cancelled through the API and must end as
+   "cancelled" with part of its requests done.
+5. Expiry: a completion window other than 24h is rejected. A job whose
+   `expires_at` passes halfway through must end as "expired", with every
+   unfinished request in the error file as `batch_expired`.
+6. Failure: jobs whose input file record is gone, or whose input file
+   cannot be read, must end as "failed" once Modal's retries (run here
+   back to back) are used up.
+
+The exit status is 1 if any check fails.
+
+Run:
+    python -m benchmarks.batch_jobs --requests 200 --slots 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInParamCls
+from common import AdmissionController, AffinityRouter
+
+MODEL = "glm-4.7-flash:q4_K_M"
+
+
+class SimulatedOllama:
+    """One container: `slots` chats at a time, `generate_seconds` each."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.slots = asyncio.Semaphore(args.slots)
+        self.generate_seconds = args.generate_seconds
+        self.calls = 0
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        self.calls += 1
+        if body["model"] != MODEL:
+            return {"status_code": 404, "body": {"error": {"message": f"model '{body['model']}' not found"}}}
+        async with self.slots:
+            await asyncio.sleep(self.generate_seconds)
+        message = {"role": "assistant", "content": f"answer to {body['messages'][0]['content']}"}
+        content = {"object": "chat.completion", "model": MODEL, "choices": [{"index": 0, "message": message}]}
+        return {"status_code": 200, "body": content}
+
+
+class LocalDict:
+    """Stand-in for the `gateway-batches` Dict."""
+
+    def __init__(self):
+        self.data: dict = {}
+        self.get = SimpleNamespace(aio=self._get)
+        self.put = SimpleNamespace(aio=self._put)
+        self.items = SimpleNamespace(aio=self._items)
+
+    async def _get(self, key, default=None):
+        return self.data.get(key, default)
+
+    async def _put(self, key, value) -> None:
+        self.data[key] = value
+
+    async def _items(self):
+        for item in list(self.data.items()):
+            yield item
+
+
+class LocalVolume:
+    """Stand-in for the `gateway-batches` Volume, backed by a local directory."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.read_file = SimpleNamespace(aio=self._read_file)
+        self.batch_upload = SimpleNamespace(aio=self._batch_upload)
+        self.commit = SimpleNamespace(aio=self._noop)
+        self.reload = SimpleNamespace(aio=self._noop)
+
+    async def _read_file(self, path: str):
+        with open(Path(self.root, path.lstrip("/")), "rb") as f:
+            while chunk := f.read(64 * 1024):
+                yield chunk
+
+    @contextlib.asynccontextmanager
+    async def _batch_upload(self):
+        def put_file(fileobj, path: str) -> None:
+            target = Path(self.root, path.lstrip("/"))
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with open(target, "wb") as f:
+                shutil.copyfileobj(fileobj, f)
+
+        yield SimpleNamespace(put_file=put_file)
+
+    async def _noop(self) -> None:
+        pass
+
+
+def input_file(requests: int) -> bytes:
+    lines = [
+        {"custom_id": f"q-{i}", "method": "POST", "url": "/v1/chat/completions",
+         "body": {"model": MODEL, "messages": [{"role": "user", "content": f"question {i}"}]}}
+        for i in range(requests)
+    ]
+    lines.append({"custom_id": "unknown-model", "method": "POST", "url": "/v1/chat/completions",
+                  "body": {"model": "missing:latest", "messages": [{"role": "user", "content": "hi"}]}})
+    return "".join(json.dumps(line) + "\n" for line in lines).encode()
+
+
+async def start_batch(client: httpx.AsyncClient, file_id: str) -> str:
+    response = await client.post(
+        "/ollama/v1/batches", json={"input_file_id": file_id, "endpoint": "/v1/chat/completions"}
+    )
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def wait_for(client: httpx.AsyncClient, batch_id: str, done) -> dict:
+    while True:
+        batch = (await client.get(f"/ollama/v1/batches/{batch_id}")).json()
+        if done(batch):
+            return batch
+        await asyncio.sleep(0.02)
+
+
+async def result_ids(client: httpx.AsyncClient, file_id: str | None) -> list[str]:
+    if file_id is None:
+        return []
+    response = await client.get(f"/ollama/v1/files/{file_id}/content")
+    response.raise_for_status()
+    return [json.loads(line)["custom_id"] for line in response.text.splitlines()]
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    backend = SimulatedOllama(args)
+    serve.OllamaBackend = StandInParamCls(lambda replica=0: backend)
+    serve.affinity_router = AffinityRouter(1, capacity=args.slots)
+    serve.ollama_admission = AdmissionController("ollama", args.slots, 1024)
+    serve.model_pools = {}
+    serve.CPU_EMBED_MODELS = set()
+    serve.embedding_pipeline = None
+    root = tempfile.mkdtemp(prefix="batches-")
+    serve.GATEWAY_BATCH_DIR = root
+    serve.GATEWAY_BATCH_CHECKPOINT = args.checkpoint_seconds
+    serve.batch_volume = LocalVolume(root)
+    serve.batch_records = LocalDict()
+    jobs: dict[str, asyncio.Task] = {}
+
+    async def run_job(batch_id: str) -> None:
+        # Modal's retries, without the delay
+        for _ in range(serve.BATCH_JOB_RETRIES + 1):
+            try:
+                return await serve.run_batch_attempt(batch_id)
+            except Exception:
+                continue
+
+    async def spawn_job(batch_id: str) -> None:
+        jobs[batch_id] = asyncio.ensure_future(run_job(batch_id))
+
+    serve.run_batch = SimpleNamespace(spawn=SimpleNamespace(aio=spawn_job))
+    data = input_file(args.requests)
+    expected = {f"q-{i}" for i in range(args.requests)}
+    failed = False
+
+    def check(ok: bool, label: str) -> None:
+        nonlocal failed
+        failed |= not ok
+        print(f"  {label}: {'ok' if ok else 'FAIL'}")
+
+    transport = httpx.ASGITransport(app=serve.gateway)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+            started = time.perf_counter()
+            for line in data.splitlines()[:args.requests]:
+                response = await client.post("/ollama/v1/chat/completions", json=json.loads(line)["body"])
+                response.raise_for_status()
+            sequential = time.perf_counter() - started
+            print(f"one at a time  {args.requests} requests in {sequential:6.2f} s  "
+                  f"{args.requests / sequential:7.1f} req/s")
+
+            response = await client.post(
+                "/ollama/v1/files",
+                files={"file": ("input.jsonl", data, "application/jsonl")},
+                data={"purpose": "batch"},
+            )
+            response.raise_for_status()
+            file_id = response.json()["id"]
+
+            started = time.perf_counter()
+            batch_id = await start_batch(client, file_id)
+            batch = await wait_for(client, batch_id, lambda b: b["status"] in serve.FINAL_STATUSES)
+            outputs = await result_ids(client, batch["output_file_id"])
+            errors = await result_ids(client, batch["error_file_id"])
+            batched = time.perf_counter() - started
+            print(f"batch job      {args.requests} requests in {batched:6.2f} s  "
+                  f"{args.requests / batched:7.1f} req/s  ({sequential / batched:.1f}x)")
+            check(batch["status"] == "completed", f"status {batch['status']}")
+            check(sorted(outputs) == sorted(expected) and errors == ["unknown-model"],
+                  f"{len(outputs)} output lines, {len(errors)} error lines")
+
+            print("crash and resume")
+            calls = backend.calls
+            batch_id = await start_batch(client, file_id)
+            await wait_for(client, batch_id, lambda b: b["request_counts"]["completed"] >= args.requests // 2)
+            jobs[batch_id].cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await jobs[batch_id]
+            with open(Path(root, "batches", batch_id, "output.jsonl"), "a") as f:
+                f.write('{"id":"batch_req_cut","custom_id":"q-')
+            batch = await serve.execute_batch(batch_id)
+            outputs = await result_ids(client, batch["output_file_id"])
+            redone = backend.calls - calls - (args.requests + 1)
+            check(batch["status"] == "completed", f"status {batch['status']}")
+            check(sorted(outputs) == sorted(expected), f"{len(outputs)} output lines, each custom_id once")
+            check(0 <= redone <= args.slots, f"{redone} requests redone after the crash (at most {args.slots})")
+
+            print("cancel")
+            batch_id = await start_batch(client, file_id)
+            await wait_for(client, batch_id, lambda b: b["request_counts"]["completed"] > 0)
+            response = await client.post(f"/ollama/v1/batches/{batch_id}/cancel")
+            check(response.json()["status"] == "cancelling", f"cancel returns {response.json()['status']}")
+            await jobs[batch_id]
+            batch = (await client.get(f"/ollama/v1/batches/{batch_id}")).json()
+            done = batch["request_counts"]["completed"]
+            check(batch["status"] == "cancelled" and 0 < done < args.requests,
+                  f"status {batch['status']} with {done}/{args.requests} done")
+            listed = (await client.get("/ollama/v1/batches", params={"limit": 2})).json()
+            check([b["id"] for b in listed["data"]][0] == batch_id and listed["has_more"], "list, newest first")
+            rest = (await client.get("/ollama/v1/batches", params={"after": listed["last_id"]})).json()
+            pages = [b["id"] for b in listed["data"] + rest["data"]]
+            check(len(pages) == 3 and pages == sorted(pages, reverse=True) and not rest["has_more"],
+                  "list, second page after last_id")
+
+            print("expiry")
+            response = await client.post("/ollama/v1/batches", json={
+                "input_file_id": file_id, "endpoint": "/v1/chat/completions", "completion_window": "1h"})
+            check(response.status_code == 400, f"completion_window 1h returns {response.status_code}")
+            batch = serve.new_batch(file_id, "/v1/chat/completions", "24h", None)
+            batch["expires_at"] = time.time() + batched / 2
+            await serve.batch_records.put.aio(batch["id"], batch)
+            await run_job(batch["id"])
+            batch = (await client.get(f"/ollama/v1/batches/{batch['id']}")).json()
+            outputs = await result_ids(client, batch["output_file_id"])
+            errors = await result_ids(client, batch["error_file_id"])
+            check(batch["status"] == "expired" and 0 < len(outputs) < args.requests,
+                  f"status {batch['status']} with {len(outputs)}/{args.requests} done")
+            check(sorted(outputs + errors) == sorted(expected | {"unknown-model"})
+                  and batch["request_counts"]["failed"] == len(errors),
+                  f"{len(errors)} error lines, each unfinished custom_id once")
+
+            print("failure")
+            batch = serve.new_batch("file_gone", "/v1/chat/completions", "24h", None)
+            await serve.batch_records.put.aio(batch["id"], batch)
+            await run_job(batch["id"])
+            batch = (await client.get(f"/ollama/v1/batches/{batch['id']}")).json()
+            check(batch["status"] == "failed" and batch["failed_at"] is not None,
+                  f"missing input file record: status {batch['status']}")
+            missing = {"file": {"id": "file_unreadable"}, "path": "files/unreadable.jsonl"}
+            await serve.batch_records.put.aio("file_unreadable", missing)
+            batch = serve.new_batch("file_unreadable", "/v1/chat/completions", "24h", None)
+            await serve.batch_records.put.aio(batch["id"], batch)
+            await run_job(batch["id"])
+            batch = (await client.get(f"/ollama/v1/batches/{batch['id']}")).json()
+            attempts = await serve.batch_records.get.aio(f"attempts:{batch['id']}")
+            check(batch["status"] == "failed" and batch["errors"]["data"][0]["code"] == "batch_error",
+                  f"unreadable input file: status {batch['status']} after {attempts} attempts")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests in the input file")
+    parser.add_argument("--slots", type=int, default=8, help="parallel requests per container")
+    parser.add_argument("--generate-seconds", type=float, default=0.05, help="time per chat")
+    parser.add_argument("--checkpoint-seconds", type=float, default=0.1)
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
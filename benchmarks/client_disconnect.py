@@ -0,0 +1,202 @@
+"""Check: generation stops soon after the client disconnects.
+
+Serves the gateway with uvicorn in this process, in front of a real
+OllamaService that drives the fake Ollama server. The backend stand-in
+behaves the way Modal calls do:
+
+- a `.remote()` call keeps running after its caller is cancelled
+- a spawned call stops only when it is cancelled
+- a `.remote_gen()` stream keeps producing in its container after the
+  caller stops reading
+
+Stream cancel signals go through a local stand-in for the
+`ollama-cancellations` Queue.
+
+For each request kind, a client starts a long generation, waits until
+tokens are being decoded, then closes its connection. The check measures
+how long the fake server keeps decoding and how many tokens it decodes
+after the disconnect. It runs with GATEWAY_CANCEL_ON_DISCONNECT on, where
+decoding must stop within `--bound` seconds, and then off for comparison.
+The exit status is 1 if any request kind exceeds the bound.
+
+Run:
+    python -m benchmarks.client_disconnect --bound 1.0
+"""
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+
+import serve
+from backends.ollama import OllamaConfig, OllamaService
+from benchmarks.fake_ollama import fake_ollama_on_path, free_port
+from benchmarks.standins import StandInFunctionCall
+from benchmarks.suite import serve_gateway
+
+MODEL = "glm-4.7-flash:q4_K_M"
+MESSAGES = [{"role": "user", "content": "Write a long story."}]
+# (label, path, body, passthrough)
+KINDS = (
+    ("stream /api/chat", "/ollama/api/chat", {"model": MODEL, "messages": MESSAGES, "stream": True}, False),
+    ("stream /v1/chat", "/ollama/v1/chat/completions", {"model": MODEL, "messages": MESSAGES, "stream": True}, False),
+    ("unary /api/chat", "/ollama/api/chat", {"model": MODEL, "messages": MESSAGES, "stream": False}, False),
+    ("unary passthrough", "/ollama/api/chat", {"model": MODEL, "messages": MESSAGES, "stream": False}, True),
+)
+
+
+class LocalCancellations:
+    """Stand-in for the `ollama-cancellations` Queue: one event per partition."""
+
+    def __init__(self):
+        self.events: dict[str, asyncio.Event] = collections.defaultdict(asyncio.Event)
+        self.put = SimpleNamespace(aio=self._put)
+        self.get = SimpleNamespace(aio=self._get)
+
+    async def _put(self, value, partition: str, partition_ttl: int = 0) -> None:
+        self.events[partition].set()
+
+    async def _get(self, partition: str):
+        await self.events[partition].wait()
+        return True
+
+
+class ContainerMethod:
+    """One backend method with Modal's cancellation semantics."""
+
+    def __init__(self, fn, tasks: set):
+        self.fn = fn
+        self.tasks = tasks
+        self.remote = SimpleNamespace(aio=self._remote)
+        self.spawn = SimpleNamespace(aio=self._spawn)
+        self.remote_gen = SimpleNamespace(aio=self._remote_gen)
+
+    def _start(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _remote(self, *args, **kwargs):
+        return await asyncio.shield(self._start(self.fn(*args, **kwargs)))
+
+    async def _spawn(self, *args, **kwargs) -> StandInFunctionCall:
+        return StandInFunctionCall(self._start(self.fn(*args, **kwargs)))
+
+    async def _remote_gen(self, *args, **kwargs):
+        outputs: asyncio.Queue = asyncio.Queue()
+        done = object()
+
+        async def produce() -> None:
+            try:
+                async for chunk in self.fn(*args, **kwargs):
+                    outputs.put_nowait(chunk)
+            finally:
+                outputs.put_nowait(done)
+
+        self._start(produce())
+        while (chunk := await outputs.get()) is not done:
+            yield chunk
+
+
+class Container:
+    """Backend stand-in: every method of `service` as a ContainerMethod."""
+
+    def __init__(self, service: OllamaService):
+        self.service = service
+        self.tasks: set[asyncio.Task] = set()
+
+    def __call__(self, **params) -> "Container":
+        return self
+
+    def __getattr__(self, name: str) -> ContainerMethod:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return ContainerMethod(getattr(self.service, name), self.tasks)
+
+
+async def fake_stats(fake: httpx.AsyncClient) -> dict:
+    return (await fake.get("/fake/stats")).json()
+
+
+async def disconnect_once(base_url: str, fake: httpx.AsyncClient, path: str, body: dict) -> tuple[float, int]:
+    """Start one generation, drop the connection mid-decode.
+
+    Returns:
+        Seconds the fake server kept decoding after the disconnect, and the
+        tokens it decoded in that time
+    """
+    client = httpx.AsyncClient(base_url=base_url, timeout=None)
+    if body["stream"]:
+        async def call() -> None:
+            async with client.stream("POST", path, json=body) as response:
+                async for _ in response.aiter_bytes():
+                    pass
+    else:
+        async def call() -> None:
+            await client.post(path, json=body)
+
+    request = asyncio.create_task(call())
+    while (await fake_stats(fake))["decoding"] == 0:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.2)
+    request.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await request
+    await client.aclose()
+
+    disconnected = time.perf_counter()
+    tokens = (await fake_stats(fake))["tokens"]
+    while (stats := await fake_stats(fake))["decoding"] > 0:
+        await asyncio.sleep(0.01)
+    return time.perf_counter() - disconnected, stats["tokens"] - tokens
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    settings = {
+        "FAKE_OLLAMA_MODELS": MODEL,
+        "FAKE_OLLAMA_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_OLLAMA_NUM_TOKENS": str(args.num_tokens),
+    }
+    config = OllamaConfig(models=[MODEL], port=free_port(), num_parallel=2)
+    serve.ollama_cancellations = LocalCancellations()
+    with fake_ollama_on_path(**settings), contextlib.redirect_stdout(None):
+        service = OllamaService(config, cancel_signal=serve.stream_cancelled)
+        service.start()
+    serve.OllamaBackend = Container(service)
+    failed = False
+    try:
+        async with serve_gateway() as base_url, httpx.AsyncClient(base_url=f"http://127.0.0.1:{config.port}") as fake:
+            for cancel in (True, False):
+                serve.GATEWAY_CANCEL_ON_DISCONNECT = cancel
+                for label, path, body, passthrough in KINDS:
+                    serve.GATEWAY_PASSTHROUGH = passthrough
+                    seconds, tokens = await disconnect_once(base_url, fake, path, body)
+                    verdict = ""
+                    if cancel:
+                        ok = seconds <= args.bound
+                        failed |= not ok
+                        verdict = "ok" if ok else f"FAIL (bound {args.bound:.2f} s)"
+                    mode = "cancel on" if cancel else "cancel off"
+                    print(f"{mode:<11} {label:<18} decoding stopped after {seconds:5.2f} s, "
+                          f"{tokens:4d} tokens for nobody  {verdict}")
+    finally:
+        await service.stop()
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bound", type=float, default=1.0, help="seconds decoding may continue after a disconnect")
+    parser.add_argument("--tokens-per-second", type=float, default=50)
+    parser.add_argument("--num-tokens", type=int, default=200, help="tokens per generation")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""Benchmark: negotiated response compression and compressed uploads.
+
+A stand-in Ollama backend (in passthrough mode) answers /api/embed with
+random float vectors, the worst case for JSON size. Each embedding response
+is fetched through the gateway uncompressed, then with gzip and with zstd.
+The run reports wire size, latency and CPU per response (gateway plus the
+client decoding it, in this process), and checks that every body decodes to
+the same JSON. A large chat request is then uploaded gzip- and
+zstd-compressed to check request decompression.
+
+A stream whose first chunk takes `--first-chunk-seconds` is then sent to a
+client accepting gzip, to check that its headers are not held back until
+that chunk. Finally, event loop lag is sampled while a burst of large
+responses is compressed. This runs once with compression on the event loop and once
+offloaded to worker threads, to show how long other requests would wait
+behind compression.
+
+Run:
+    python -m benchmarks.compression --inputs 256 --dim 1024
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import statistics
+import time
+
+import httpx
+from starlette.middleware import Middleware
+from starlette.responses import StreamingResponse
+
+import serve
+from benchmarks.standins import StandInCls
+from common import CompressionMiddleware
+from common.compression import available_encodings
+
+
+class EmbeddingOllama:
+    """Stand-in passthrough backend: pre-encoded random embeddings, and an echo of chat sizes.
+
+    Answering with bytes keeps JSON encoding out of the measurements, so
+    only compression costs gateway CPU.
+    """
+
+    def __init__(self, inputs: int, dim: int):
+        rng = random.Random(0)
+        vectors = [[rng.uniform(-1, 1) for _ in range(dim)] for _ in range(inputs)]
+        self.embeddings = json.dumps({"model": "embed", "embeddings": vectors}).encode()
+
+    async def raw_proxy(self, method: str, path: str, content: bytes = b"", content_type=None, model=None) -> dict:
+        if path == "/api/embed":
+            body = self.embeddings
+        else:
+            body = json.dumps({"messages": len(json.loads(content)["messages"])}).encode()
+        return {"status_code": 200, "content": body, "headers": {"content-type": "application/json"}}
+
+
+def configure(**kwargs) -> None:
+    """Change the gateway's CompressionMiddleware settings and rebuild its stack."""
+    for middleware in serve.gateway.user_middleware:
+        if middleware.cls is CompressionMiddleware:
+            middleware.kwargs.update(kwargs)
+            break
+    else:
+        serve.gateway.user_middleware.append(Middleware(CompressionMiddleware, **kwargs))
+    serve.gateway.middleware_stack = None
+
+
+async def fetch(client: httpx.AsyncClient, encoding: str, n: int) -> tuple[list[float], float, int, dict]:
+    """Fetch the embedding response n times; return latencies, CPU seconds, wire bytes, body."""
+    latencies = []
+    cpu_started = time.process_time()
+    for _ in range(n):
+        started = time.perf_counter()
+        response = await client.post(
+            "/ollama/api/embed", json={"model": "embed", "input": ["x"]}, headers={"Accept-Encoding": encoding}
+        )
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    cpu = time.process_time() - cpu_started
+    # num_bytes_downloaded counts the encoded bytes, before httpx decodes them
+    return latencies, cpu, response.num_bytes_downloaded, response.json()
+
+
+async def loop_lag_during_burst(client: httpx.AsyncClient, burst: int) -> list[float]:
+    """Event loop lag (late wake-ups of a 5 ms timer) while `burst` large responses are compressed.
+
+    Any request the gateway received meanwhile would wait at least this long.
+    """
+    async def download() -> None:
+        # Raw bytes: decoding here would put the client's decompression on the same loop
+        async with client.stream(
+            "POST", "/ollama/api/embed", json={"model": "embed", "input": ["x"]}, headers={"Accept-Encoding": "gzip"}
+        ) as response:
+            async for _ in response.aiter_raw():
+                pass
+
+    lags = []
+    heavy = asyncio.gather(*(download() for _ in range(burst)))
+    while not heavy.done():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - started - 0.005)
+    await heavy
+    return lags
+
+
+async def stream_header_delay(first_chunk_seconds: float) -> tuple[float, float]:
+    """Send a slow stream through CompressionMiddleware to a gzip client.
+
+    Returns:
+        Seconds until the response headers and until the first chunk were sent
+    """
+    async def chunks():
+        await asyncio.sleep(first_chunk_seconds)
+        yield b"data: {}\n\n"
+
+    app = CompressionMiddleware(StreamingResponse(chunks(), media_type="text/event-stream"))
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+    sent: dict[str, float] = {}
+    started = time.perf_counter()
+
+    async def receive() -> dict:
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            sent["headers"] = time.perf_counter() - started
+        elif message.get("body"):
+            sent.setdefault("chunk", time.perf_counter() - started)
+
+    await app(scope, receive, send)
+    return sent["headers"], sent["chunk"]
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    serve.OllamaBackend = StandInCls(EmbeddingOllama(args.inputs, args.dim))
+    serve.GATEWAY_PASSTHROUGH = True
+    configure(minimum_size=1024, offload_size=256 * 1024, encodings=available_encodings())
+    transport = httpx.ASGITransport(app=serve.gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        bodies = {}
+        encodings = ["identity", "gzip", *(["zstd"] if "zstd" in available_encodings() else [])]
+        for encoding in encodings:
+            await fetch(client, encoding, 1)  # warm up
+            latencies, cpu, wire, bodies[encoding] = await fetch(client, encoding, args.requests)
+            print(f"{encoding:<9} {wire / 1e6:6.2f} MB on the wire  p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                  f"cpu {cpu / args.requests * 1000:6.1f} ms/req")
+        print(f"bodies match: {all(body == bodies['identity'] for body in bodies.values())}")
+
+        history = [{"role": "user", "content": f"turn {i} " + "lorem ipsum " * 40} for i in range(args.upload_turns)]
+        plain = json.dumps({"model": "m", "messages": history}).encode()
+        uploads = {"gzip": gzip.compress(plain)}
+        if "zstd" in available_encodings():
+            import zstandard
+            uploads["zstd"] = zstandard.ZstdCompressor().compress(plain)
+        for encoding, data in uploads.items():
+            response = await client.post(
+                "/ollama/api/chat", content=data,
+                headers={"Content-Type": "application/json", "Content-Encoding": encoding},
+            )
+            ok = response.status_code == 200 and response.json() == {"messages": len(history)}
+            print(f"upload {encoding:<5} {len(plain) / 1e6:5.2f} MB sent as {len(data) / 1e6:5.2f} MB  "
+                  f"status {response.status_code}  decoded: {ok}")
+
+        headers, chunk = await stream_header_delay(args.first_chunk_seconds)
+        print(f"stream with gzip accepted: headers after {headers * 1000:6.1f} ms, "
+              f"first chunk after {chunk * 1000:6.1f} ms  {'ok' if headers < chunk / 2 else 'FAIL'}")
+
+        for label, offload in (("on event loop", 1 << 62), ("offloaded", 256 * 1024)):
+            configure(offload_size=offload)
+            lags = await loop_lag_during_burst(client, args.burst)
+            print(f"event loop lag during {args.burst} compressions, {label:<13} "
+                  f"p50 {statistics.median(lags) * 1000:6.1f} ms  max {max(lags) * 1000:6.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", type=int, default=256, help="texts per embedding response")
+    parser.add_argument("--dim", type=int, default=1024, help="embedding dimension")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--upload-turns", type=int, default=10000, help="messages in the uploaded chat")
+    parser.add_argument("--first-chunk-seconds", type=float, default=1.0, help="delay before a stream's first chunk")
+    parser.add_argument("--burst", type=int, default=16, help="concurrent large responses during pings")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
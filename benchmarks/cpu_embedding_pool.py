@@ -0,0 +1,120 @@
+"""Benchmark: embeddings on the shared GPU backend vs the CPU embedding pool.
+
+Stand-in backends simulate the two pools. The GPU container has
+`--gpu-slots` Ollama slots shared by chat and embeddings. It embeds fast
+(`--gpu-ms-per-text`), but chats hold a slot for `--chat-seconds`. The CPU
+pool has `--cpu-slots` slots of its own and embeds `--cpu-ms-per-text`
+per text. Embedding clients send `--texts` strings per request in a
+closed loop for `--seconds`. This runs with and without chat clients
+keeping the GPU busy, once with embeddings routed to the GPU and once to
+the CPU pool.
+
+Reports embedding throughput and p50/p99 latency, completed chats, and
+how many embedding calls reached the GPU.
+
+Run:
+    python -m benchmarks.cpu_embedding_pool --seconds 10 --chat-clients 6
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInCls, StandInParamCls
+from common import AdmissionController, AffinityRouter
+
+EMBED_MODEL = "embed:latest"
+CHAT_MODEL = "chat:latest"
+
+
+class SimulatedOllama:
+    """One pool: a fixed number of slots, with simulated compute per call."""
+
+    def __init__(self, slots: int, ms_per_text: float, call_ms: float, chat_seconds: float):
+        self.slots = asyncio.Semaphore(slots)
+        self.ms_per_text = ms_per_text
+        self.call_ms = call_ms
+        self.chat_seconds = chat_seconds
+        self.embed_calls = 0
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        if "embed" in path:
+            texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            self.embed_calls += 1
+            seconds = (self.call_ms + self.ms_per_text * len(texts)) / 1000
+            content = {"model": body["model"], "embeddings": [[0.0] * 8 for _ in texts]}
+        else:
+            seconds = self.chat_seconds
+            content = {"model": body["model"], "message": {"role": "assistant", "content": "ok"}, "done": True}
+        async with self.slots:
+            await asyncio.sleep(seconds)
+        return {"status_code": 200, "body": content}
+
+
+async def closed_loop(client: httpx.AsyncClient, path: str, body: dict, until: float, latencies: list[float]) -> None:
+    while time.perf_counter() < until:
+        started = time.perf_counter()
+        response = await client.post(path, json=body)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace, cpu_pool: bool, chat_clients: int) -> None:
+    gpu = SimulatedOllama(args.gpu_slots, args.gpu_ms_per_text, args.call_ms, args.chat_seconds)
+    cpu = SimulatedOllama(args.cpu_slots, args.cpu_ms_per_text, args.call_ms, args.chat_seconds)
+    serve.OllamaBackend = StandInParamCls(lambda replica=0: gpu)
+    serve.OllamaCPUBackend = StandInCls(cpu)
+    serve.affinity_router = AffinityRouter(1, capacity=args.gpu_slots)
+    serve.ollama_admission = AdmissionController("ollama", args.gpu_slots, 256)
+    serve.ollama_cpu_admission = AdmissionController("ollama-cpu", args.cpu_slots, 256)
+    serve.CPU_EMBED_MODELS = {EMBED_MODEL} if cpu_pool else set()
+    serve.embedding_pipeline = None
+
+    embed_body = {"model": EMBED_MODEL, "input": [f"short text {i}" for i in range(args.texts)]}
+    chat_body = {"model": CHAT_MODEL, "messages": [{"role": "user", "content": "hi"}], "stream": False}
+    embed_latencies: list[float] = []
+    chat_latencies: list[float] = []
+    transport = httpx.ASGITransport(app=serve.gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        until = time.perf_counter() + args.seconds
+        await asyncio.gather(
+            *(closed_loop(client, "/ollama/api/chat", chat_body, until, chat_latencies) for _ in range(chat_clients)),
+            *(closed_loop(client, "/ollama/api/embed", embed_body, until, embed_latencies)
+              for _ in range(args.embed_clients)),
+        )
+    embed_latencies.sort()
+    p99 = embed_latencies[min(len(embed_latencies) - 1, int(len(embed_latencies) * 0.99))]
+    label = f"{'CPU pool' if cpu_pool else 'shared GPU':<10} {chat_clients:2d} chat clients"
+    print(f"{label}  embeds {len(embed_latencies) * args.texts / args.seconds:7.0f} texts/s  "
+          f"p50 {statistics.median(embed_latencies) * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms  "
+          f"chats {len(chat_latencies):3d}  GPU embed calls {gpu.embed_calls}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    for chat_clients in (0, args.chat_clients):
+        for cpu_pool in (False, True):
+            await run(args, cpu_pool, chat_clients)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each run")
+    parser.add_argument("--embed-clients", type=int, default=4)
+    parser.add_argument("--chat-clients", type=int, default=6, help="chat clients in the loaded runs")
+    parser.add_argument("--texts", type=int, default=8, help="texts per embedding request")
+    parser.add_argument("--gpu-slots", type=int, default=4)
+    parser.add_argument("--cpu-slots", type=int, default=4, help="CPU containers x parallel inputs")
+    parser.add_argument("--gpu-ms-per-text", type=float, default=1.0)
+    parser.add_argument("--cpu-ms-per-text", type=float, default=8.0)
+    parser.add_argument("--call-ms", type=float, default=10.0, help="fixed cost per backend call")
+    parser.add_argument("--chat-seconds", type=float, default=3.0, help="how long a chat holds a GPU slot")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark: embedding response size and latency per output encoding.
+
+A stand-in Ollama backend returns random float vectors (pickled across, as
+Modal does) and the gateway, served by uvicorn, encodes them as JSON floats,
+base64 float32/float16 or a raw octet-stream matrix. Latency is measured
+from sending the request to holding decoded floats on the client, so each
+format's client-side decoding is included. Responses are requested
+uncompressed (`Accept-Encoding: identity`) to compare the formats
+themselves. Reports payload size, p50 latency and the largest decoding
+error against the original floats. Finally checks that a value beyond
+float16's range comes back as infinity rather than as an error.
+
+Run:
+    python -m benchmarks.embedding_formats --inputs 1000 --dim 1024
+"""
+
+import argparse
+import asyncio
+import base64
+import pickle
+import random
+import statistics
+import struct
+import time
+from array import array
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInCls
+from benchmarks.suite import serve_gateway
+
+
+class RandomEmbeddings:
+    """Stand-in backend answering /api/embed and /v1/embeddings with fixed random vectors."""
+
+    def __init__(self, inputs: int, dim: int):
+        rng = random.Random(0)
+        self.vectors = [[rng.uniform(-0.2, 0.2) for _ in range(dim)] for _ in range(inputs)]
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        if path == "/v1/embeddings":
+            data = [{"object": "embedding", "embedding": v, "index": i} for i, v in enumerate(self.vectors)]
+            content = {"object": "list", "data": data, "model": body["model"]}
+        else:
+            content = {"model": body["model"], "embeddings": self.vectors}
+        return pickle.loads(pickle.dumps({"status_code": 200, "body": content}))
+
+
+def unpack(data: bytes, dtype: str) -> list[float]:
+    if dtype == "<f2":
+        return list(struct.unpack(f"<{len(data) // 2}e", data))
+    return array("f", data).tolist()
+
+
+async def fetch(client: httpx.AsyncClient, name: str, path: str, body: dict, headers: dict) -> tuple[int, list]:
+    """Send one request; return payload bytes and the decoded vectors."""
+    response = await client.post(path, json=body, headers={"Accept-Encoding": "identity", **headers})
+    response.raise_for_status()
+    if name == "binary":
+        rows, dim = map(int, response.headers["x-embedding-shape"].split(","))
+        flat = unpack(response.content, response.headers["x-embedding-dtype"])
+        return len(response.content), [flat[i * dim:(i + 1) * dim] for i in range(rows)]
+    content = response.json()
+    vectors = [item["embedding"] for item in content["data"]] if "data" in content else content["embeddings"]
+    if vectors and isinstance(vectors[0], str):
+        dtype = "<f2" if body.get("embedding_dtype") == "float16" else "<f4"
+        vectors = [unpack(base64.b64decode(v), dtype) for v in vectors]
+    return len(response.content), vectors
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    backend = RandomEmbeddings(args.inputs, args.dim)
+    serve.OllamaBackend = StandInCls(backend)
+    # The stand-in answers with a fixed matrix, so requests are not split into batches
+    serve.embedding_pipeline = None
+    texts = [f"chunk {i}" for i in range(args.inputs)]
+    native = {"model": "embed", "input": texts}
+    openai = {"model": "embed", "input": texts}
+    octet = {"Accept": "application/octet-stream"}
+    cases = [
+        ("float", "/ollama/api/embed", native, {}),
+        ("float", "/ollama/v1/embeddings", openai, {}),
+        ("base64", "/ollama/v1/embeddings", {**openai, "encoding_format": "base64"}, {}),
+        ("base64", "/ollama/v1/embeddings", {**openai, "encoding_format": "base64", "embedding_dtype": "float16"}, {}),
+        ("binary", "/ollama/api/embed", native, octet),
+        ("binary", "/ollama/api/embed", {**native, "embedding_dtype": "float16"}, octet),
+    ]
+    print(f"{args.inputs} inputs x {args.dim} dimensions")
+    async with serve_gateway() as base_url, httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        baseline = None
+        for name, path, body, headers in cases:
+            await fetch(client, name, path, body, headers)  # warm up
+            latencies = []
+            for _ in range(args.requests):
+                started = time.perf_counter()
+                size, vectors = await fetch(client, name, path, body, headers)
+                latencies.append(time.perf_counter() - started)
+            baseline = baseline or size
+            error = max(abs(a - b) for got, want in zip(vectors, backend.vectors) for a, b in zip(got, want))
+            label = f"{name} {body.get('embedding_dtype', 'float32' if name != 'float' else '')}".strip()
+            print(f"  {label:<15} {path:<22} {size / 1e6:6.2f} MB ({size / baseline:4.0%})  "
+                  f"p50 {statistics.median(latencies) * 1000:7.1f} ms  max error {error:.1e}")
+
+        backend.vectors[0][0] = 1e6
+        _, vectors = await fetch(client, *cases[-1])
+        ok = vectors[0][0] == float("inf")
+        print(f"  float16 overflow: {vectors[0][0]} {'ok' if ok else 'FAIL'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
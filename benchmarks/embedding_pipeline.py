@@ -0,0 +1,149 @@
+"""Benchmark: one large embedding request, whole vs split across containers.
+
+A stand-in Ollama backend simulates GPU containers: each replica embeds one
+batch at a time, taking a fixed per-call overhead (dispatch, tokenizer
+setup) plus a cost per `--gpu-batch` texts run together. The gateway's
+embedding pipeline is swept over batch sizes and compared with sending the
+whole input list in one call, which is what happens without the pipeline.
+The corpus has `--duplicates` of its texts repeated (boilerplate chunks).
+
+Each run checks that every vector matches its own input text, so output
+order is verified. A reindex is then simulated with the embedding store
+on: a cold run, then a run after `--changed` of the texts were edited,
+which only embeds the edited ones.
+
+Run:
+    python -m benchmarks.embedding_pipeline --texts 20000 --replicas 4
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+import zlib
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInParamCls
+from common import AdmissionController, AffinityRouter, EmbeddingPipeline, EmbeddingStore
+
+MODEL = "embed"
+
+
+def vector_for(text: str, dim: int) -> list[float]:
+    """Deterministic vector for a text, so any reordering is detected."""
+    seed = zlib.crc32(text.encode())
+    return [((seed >> (i % 24)) % 1000) / 1000.0 for i in range(dim)]
+
+
+class SimulatedGPU:
+    """One replica's containers: one batch at a time, cost grows with GPU passes."""
+
+    def __init__(self, args: argparse.Namespace, calls: list[float]):
+        self.args = args
+        self.calls = calls
+        self.gpu = asyncio.Lock()
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        passes = -(-len(texts) // self.args.gpu_batch)
+        seconds = (self.args.call_overhead_ms + passes * self.args.pass_ms) / 1000
+        async with self.gpu:
+            await asyncio.sleep(seconds)
+        self.calls.append(seconds)
+        content = {
+            "model": body["model"],
+            "embeddings": [vector_for(text, self.args.dim) for text in texts],
+            "prompt_eval_count": len(texts),
+            "total_duration": int(seconds * 1e9),
+        }
+        return {"status_code": 200, "body": content, "timing": {"handler": seconds}}
+
+
+def corpus(n: int, duplicates: float, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    boilerplate = [f"footer {i}: all rights reserved" for i in range(max(1, n // 100))]
+    return [rng.choice(boilerplate) if rng.random() < duplicates else f"chunk {seed}-{i}" for i in range(n)]
+
+
+def configure(args: argparse.Namespace, pipeline: EmbeddingPipeline | None) -> list[float]:
+    """Point the gateway at fresh simulated replicas; return their call-duration log."""
+    calls: list[float] = []
+    replicas = {}
+    serve.OllamaBackend = StandInParamCls(
+        lambda replica=0: replicas.setdefault(replica, SimulatedGPU(args, calls))
+    )
+    serve.affinity_router = AffinityRouter(args.replicas, capacity=1)
+    serve.ollama_admission = AdmissionController("ollama", args.replicas, 64)
+    serve.embedding_pipeline = pipeline
+    return calls
+
+
+async def embed(client: httpx.AsyncClient, texts: list[str], dim: int) -> tuple[float, httpx.Response]:
+    started = time.perf_counter()
+    response = await client.post("/ollama/api/embed", json={"model": MODEL, "input": texts})
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    vectors = response.json()["embeddings"]
+    if len(vectors) != len(texts):
+        raise AssertionError(f"{len(vectors)} vectors for {len(texts)} texts")
+    for text, vector in zip(texts, vectors):
+        expected = vector_for(text, dim)
+        if any(abs(a - b) > 1e-6 for a, b in zip(vector, expected)):
+            raise AssertionError(f"vector out of order for {text!r}")
+    return elapsed, response
+
+
+def report(label: str, elapsed: float, calls: list[float], response: httpx.Response) -> None:
+    # The pipeline's counts, from the Server-Timing entry 'embed;desc="..."'
+    stats = response.headers.get("server-timing", "").partition('embed;desc="')[2].partition('"')[0]
+    print(f"{label:<20} {elapsed:7.2f} s  calls {len(calls):5d}  longest call {max(calls):5.2f} s  {stats}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    texts = corpus(args.texts, args.duplicates)
+    transport = httpx.ASGITransport(app=serve.gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        calls = configure(args, None)
+        elapsed, response = await embed(client, texts, args.dim)
+        report("single call", elapsed, calls, response)
+
+        for batch_size in args.batch_sizes:
+            calls = configure(args, EmbeddingPipeline(batch_size, args.replicas))
+            elapsed, response = await embed(client, texts, args.dim)
+            report(f"batches of {batch_size:<5}", elapsed, calls, response)
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = EmbeddingStore(directory)
+            batch_size = args.batch_sizes[len(args.batch_sizes) // 2]
+            calls = configure(args, EmbeddingPipeline(batch_size, args.replicas, store))
+            elapsed, response = await embed(client, texts, args.dim)
+            report("store, cold", elapsed, calls, response)
+
+            rng = random.Random(1)
+            edited = [f"{text} (edited)" if rng.random() < args.changed else text for text in texts]
+            calls = configure(args, EmbeddingPipeline(batch_size, args.replicas, EmbeddingStore(directory)))
+            elapsed, response = await embed(client, edited, args.dim)
+            report(f"store, {args.changed:.0%} edited", elapsed, calls or [0.0], response)
+    print("vectors matched their inputs in every run")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=64, help="embedding dimension")
+    parser.add_argument("--replicas", type=int, default=4, help="simulated GPU containers")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="fraction of texts that repeat")
+    parser.add_argument("--changed", type=float, default=0.05, help="fraction edited before the reindex")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256, 1024])
+    parser.add_argument("--gpu-batch", type=int, default=32, help="texts the GPU embeds in one pass")
+    parser.add_argument("--pass-ms", type=float, default=4.0, help="milliseconds per GPU pass")
+    parser.add_argument("--call-overhead-ms", type=float, default=40.0, help="fixed cost per backend call")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
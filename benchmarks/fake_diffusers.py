@@ -0,0 +1,111 @@
+"""Fake diffusers pipeline for local benchmarks.
+
+Registered in the diffusers model registry under `fake/image-a10g` and
+`fake/image-l40s`, so the real DiffusersService loads it through its normal
+`pipeline_module`/`pipeline_class` lookup. Loading and denoising sleep
+instead of touching a GPU, and the output is a real PNG of the requested
+size.
+
+Tunables (environment variables, read per call):
+    FAKE_DIFFUSERS_LOAD_SECONDS: Pipeline load time (default: 2.0)
+    FAKE_DIFFUSERS_STEP_SECONDS: Time per denoising step (default: 0.02)
+
+Usage:
+    with fake_diffusers_models():
+        service = DiffusersService(DiffusersConfig(), gpu_tier="a10g")
+        png = service.generate("fake/image-a10g", "a cat")
+"""
+
+import contextlib
+import functools
+import os
+import random
+import struct
+import time
+import zlib
+from typing import Iterator
+
+from backends.diffusers.registry import MODEL_REGISTRY
+
+FAKE_MODELS = {
+    f"fake/image-{tier}": {
+        "pipeline_class": "FakePipeline",
+        "pipeline_module": "benchmarks.fake_diffusers",
+        "gpu_tier": tier,
+        "torch_dtype": "float16",
+        "device_map": "cuda",
+        "defaults": {
+            "height": 512,
+            "width": 512,
+            "num_inference_steps": 20,
+            "guidance_scale": 7.5,
+        },
+    }
+    for tier in ("a10g", "l40s")
+}
+
+
+@functools.lru_cache(maxsize=8)
+def fake_png(width: int, height: int) -> bytes:
+    """Encode a grayscale noise PNG (incompressible, so its size is realistic)."""
+    rng = random.Random(width * 100003 + height)
+    rows = b"".join(b"\x00" + rng.randbytes(width) for _ in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeImage:
+    """Stands in for a PIL image: only `save(buffer, format="PNG")` is used."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+
+    def save(self, fp, format: str = "PNG") -> None:
+        fp.write(fake_png(self.width, self.height))
+
+
+class FakeResult:
+    def __init__(self, images: list[FakeImage]):
+        self.images = images
+
+
+class FakePipeline:
+    """Diffusers-pipeline lookalike whose load and denoise steps just sleep."""
+
+    def __init__(self, model_id: str):
+        self.model_id = model_id
+
+    @classmethod
+    def from_pretrained(cls, model_id: str, torch_dtype=None, device_map=None) -> "FakePipeline":
+        time.sleep(float(os.environ.get("FAKE_DIFFUSERS_LOAD_SECONDS", "2.0")))
+        return cls(model_id)
+
+    def __call__(self, prompt: str, height: int, width: int, num_inference_steps: int,
+                 guidance_scale: float, generator=None) -> FakeResult:
+        time.sleep(float(os.environ.get("FAKE_DIFFUSERS_STEP_SECONDS", "0.02")) * num_inference_steps)
+        return FakeResult([FakeImage(width, height)])
+
+
+@contextlib.contextmanager
+def fake_diffusers_models() -> Iterator[list[str]]:
+    """Register the fake models in the diffusers registry for the duration.
+
+    Yields:
+        The fake model IDs
+    """
+    MODEL_REGISTRY.update(FAKE_MODELS)
+    try:
+        yield list(FAKE_MODELS)
+    finally:
+        for model_id in FAKE_MODELS:
+            MODEL_REGISTRY.pop(model_id, None)
@@ -0,0 +1,367 @@
+"""Fake Ollama server and CLI for local benchmarks.
+
+Behaves enough like `ollama` for OllamaService to drive it unmodified:
+`serve` starts an HTTP server on OLLAMA_HOST that decodes fake tokens at a
+configurable rate with OLLAMA_NUM_PARALLEL slots, `list` prints the cached
+models and `pull` is a no-op. Like Ollama, it stops decoding a request
+whose client disconnects. `GET /fake/stats` reports the sequences being
+decoded and the tokens decoded so far.
+
+Tunables (environment variables):
+    FAKE_OLLAMA_MODELS: Comma-separated models reported as cached
+    FAKE_OLLAMA_TTFT: Seconds before the first token (default: 0.05)
+    FAKE_OLLAMA_TOKENS_PER_SECOND: Decode rate per sequence (default: 100)
+    FAKE_OLLAMA_NUM_TOKENS: Tokens generated per request (default: 50)
+    FAKE_OLLAMA_TOKENS_PER_CHUNK: Tokens written per streamed chunk (default: 1)
+    FAKE_OLLAMA_EMBEDDING_DIM: Embedding vector size (default: 1024)
+    FAKE_OLLAMA_PULL_SECONDS: Duration of each /api/pull (default: 1.0)
+    FAKE_OLLAMA_PULL_FAILURES: Number of /api/pull calls that fail with a 500
+        before pulls succeed (default: 0)
+    FAKE_OLLAMA_LOAD_SECONDS: Time to load a model into "VRAM" (default: 0)
+    FAKE_OLLAMA_PROMPT_TOKENS_PER_SECOND: Prompt eval rate for tokens not in the
+        prompt cache (~4 chars/token, one cached prompt per slot; default: 5000)
+
+Usage:
+    with fake_ollama_on_path(FAKE_OLLAMA_TTFT="0.1"):
+        service = OllamaService(OllamaConfig(port=free_port()))
+        service.start()
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import re
+import socket
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# A Go duration string, which is how Ollama parses a string `keep_alive`
+GO_DURATION = re.compile(r"[-+]?(0|((\d+(\.\d*)?|\.\d+)(ns|us|µs|ms|s|m|h))+)")
+
+
+def _env_float(name: str, default: str) -> float:
+    return float(os.environ.get(name, default))
+
+
+def _env_int(name: str, default: str) -> int:
+    return int(os.environ.get(name, default))
+
+
+def cached_models() -> list[str]:
+    """Models the fake server reports as present."""
+    models = os.environ.get("FAKE_OLLAMA_MODELS", "glm-4.7-flash:q4_K_M")
+    return [m for m in models.split(",") if m]
+
+
+def free_port() -> int:
+    """Return a free localhost TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def create_app():
+    """Build the fake Ollama FastAPI app from FAKE_OLLAMA_* settings."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+    from common.disconnect import ClientDisconnected, cancel_on_disconnect
+
+    ttft = _env_float("FAKE_OLLAMA_TTFT", "0.05")
+    token_interval = 1.0 / _env_float("FAKE_OLLAMA_TOKENS_PER_SECOND", "100")
+    num_tokens = _env_int("FAKE_OLLAMA_NUM_TOKENS", "50")
+    tokens_per_chunk = max(1, _env_int("FAKE_OLLAMA_TOKENS_PER_CHUNK", "1"))
+    embedding_dim = _env_int("FAKE_OLLAMA_EMBEDDING_DIM", "1024")
+    pull_seconds = _env_float("FAKE_OLLAMA_PULL_SECONDS", "1.0")
+    pull_failures = [_env_int("FAKE_OLLAMA_PULL_FAILURES", "0")]
+    load_seconds = _env_float("FAKE_OLLAMA_LOAD_SECONDS", "0")
+    prompt_rate = _env_float("FAKE_OLLAMA_PROMPT_TOKENS_PER_SECOND", "5000")
+    models = cached_models()
+    loaded: set[str] = set()
+    # Most recent prompts, one per decode slot, like Ollama's per-slot KV cache
+    prompt_cache: list[str] = []
+    load_lock = asyncio.Lock()
+    # Ollama decodes at most OLLAMA_NUM_PARALLEL sequences at once and queues the rest
+    num_slots = _env_int("OLLAMA_NUM_PARALLEL", "1")
+    slots = asyncio.Semaphore(num_slots)
+    stats = {"decoding": 0, "tokens": 0}
+
+    app = FastAPI()
+
+    def model_info(name: str) -> dict:
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return {
+            "name": name,
+            "model": name,
+            "size": 5_000_000_000,
+            "digest": digest,
+            "modified_at": "2026-01-01T00:00:00Z",
+            "details": {"format": "gguf", "family": "glm", "quantization_level": name.split(":")[-1]},
+        }
+
+    async def load(model: str, keep_alive=None) -> float:
+        """Load model weights once; return seconds spent loading."""
+        duration = 0.0
+        async with load_lock:
+            if model not in loaded:
+                started = time.perf_counter()
+                await asyncio.sleep(load_seconds)
+                loaded.add(model)
+                duration = time.perf_counter() - started
+        if keep_alive in (0, "0"):
+            loaded.discard(model)
+        return duration
+
+    def evaluate_prompt(prompt: str) -> tuple[int, float]:
+        """Return (evaluated tokens, seconds) for the part of `prompt` not cached."""
+        cached = 0
+        for previous in prompt_cache:
+            n = len(os.path.commonprefix([previous, prompt]))
+            cached = max(cached, n)
+        if prompt in prompt_cache:
+            prompt_cache.remove(prompt)
+        prompt_cache.append(prompt)
+        del prompt_cache[:-num_slots]
+        tokens = max(1, (len(prompt) - cached) // 4)
+        return tokens, tokens / prompt_rate
+
+    def prompt_text(body: dict) -> str:
+        if "messages" in body:
+            return "".join(f"{m.get('role')}:{m.get('content')}\n" for m in body["messages"])
+        return str(body.get("prompt", ""))
+
+    async def decode(model: str, prompt_seconds: float = 0.0) -> AsyncIterator[str]:
+        """Yield fake tokens, a chunk at a time, while holding one parallel decode slot."""
+        async with slots:
+            stats["decoding"] += 1
+            try:
+                await asyncio.sleep(ttft + prompt_seconds)
+                pending = []
+                for i in range(num_tokens):
+                    if i:
+                        await asyncio.sleep(token_interval)
+                    pending.append(f"tok{i} ")
+                    stats["tokens"] += 1
+                    if len(pending) == tokens_per_chunk or i == num_tokens - 1:
+                        yield "".join(pending)
+                        pending.clear()
+            finally:
+                stats["decoding"] -= 1
+
+    async def complete(request: Request, model: str, prompt_seconds: float) -> str | None:
+        """Decode a whole response; None if the client disconnected first."""
+
+        async def collect() -> str:
+            return "".join([token async for token in decode(model, prompt_seconds)])
+
+        try:
+            return await cancel_on_disconnect(request.receive, collect())
+        except ClientDisconnected:
+            return None
+
+    def timings(started: float, load_duration: float = 0.0, prompt: tuple[int, float] = (10, 0.0)) -> dict:
+        total = int((time.perf_counter() - started) * 1e9)
+        load = int(load_duration * 1e9)
+        prompt_eval = int((ttft + prompt[1]) * 1e9)
+        return {
+            "total_duration": total,
+            "load_duration": load,
+            "prompt_eval_count": prompt[0],
+            "prompt_eval_duration": prompt_eval,
+            "eval_count": num_tokens,
+            "eval_duration": max(0, total - load - prompt_eval),
+        }
+
+    @app.get("/")
+    async def root():
+        return PlainTextResponse("Ollama is running")
+
+    @app.get("/fake/stats")
+    async def fake_stats():
+        return stats
+
+    @app.get("/api/version")
+    async def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [model_info(m) for m in models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        return {"models": [model_info(m) for m in models if m in loaded]}
+
+    @app.post("/api/show")
+    async def show(request: Request):
+        body = await request.json()
+        name = body.get("model") or body.get("name")
+        if name not in models:
+            return JSONResponse({"error": f"model '{name}' not found"}, status_code=404)
+        return {"details": model_info(name)["details"], "model_info": {}, "modelfile": ""}
+
+    @app.get("/v1/models")
+    async def v1_models():
+        return {
+            "object": "list",
+            "data": [{"id": m, "object": "model", "owned_by": "library"} for m in models],
+        }
+
+    @app.post("/api/pull")
+    async def pull(request: Request):
+        body = await request.json()
+        await asyncio.sleep(pull_seconds)
+        if pull_failures[0] > 0:
+            pull_failures[0] -= 1
+            return JSONResponse({"error": "pull model manifest: connection reset"}, status_code=500)
+        if body["model"] not in models:
+            models.append(body["model"])
+        return {"status": "success"}
+
+    async def native(request: Request, key: str):
+        body = await request.json()
+        model = body.get("model", "")
+        keep_alive = body.get("keep_alive")
+        if isinstance(keep_alive, str) and not GO_DURATION.fullmatch(keep_alive):
+            return JSONResponse({"error": f'time: missing unit in duration "{keep_alive}"'}, status_code=400)
+        started = time.perf_counter()
+        load_duration = await load(model, keep_alive)
+
+        def message(text: str) -> dict:
+            if key == "message":
+                return {"message": {"role": "assistant", "content": text}}
+            return {"response": text}
+
+        # An empty prompt only loads the model, like Ollama
+        if not body.get("prompt") and not body.get("messages"):
+            return {"model": model, **message(""), "done": True, "done_reason": "load",
+                    "load_duration": int(load_duration * 1e9)}
+        prompt = evaluate_prompt(prompt_text(body))
+
+        if body.get("stream", True):
+            async def ndjson() -> AsyncIterator[bytes]:
+                async for token in decode(model, prompt[1]):
+                    yield (json.dumps({"model": model, **message(token), "done": False}) + "\n").encode()
+                final = {"model": model, **message(""), "done": True, **timings(started, load_duration, prompt)}
+                yield (json.dumps(final) + "\n").encode()
+
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+        text = await complete(request, model, prompt[1])
+        if text is None:
+            return Response(status_code=499)
+        return {"model": model, **message(text), "done": True, **timings(started, load_duration, prompt)}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        return await native(request, "response")
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return await native(request, "message")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "")
+        await load(model)
+        prompt = evaluate_prompt(prompt_text(body))
+
+        if body.get("stream", False):
+            async def sse() -> AsyncIterator[bytes]:
+                async for token in decode(model, prompt[1]):
+                    chunk = {"object": "chat.completion.chunk", "model": model,
+                             "choices": [{"index": 0, "delta": {"content": token}}]}
+                    yield f"data: {json.dumps(chunk)}\n\n".encode()
+                yield b"data: [DONE]\n\n"
+
+            return StreamingResponse(sse(), media_type="text/event-stream")
+
+        text = await complete(request, model, prompt[1])
+        if text is None:
+            return Response(status_code=499)
+        return {
+            "object": "chat.completion",
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt[0], "completion_tokens": num_tokens},
+        }
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await load(body.get("model", ""))
+        async with slots:
+            await asyncio.sleep(ttft)
+        vectors = [[(len(text) % 97 + i) / 1000.0 for i in range(embedding_dim)] for text in inputs]
+        return {"model": body.get("model", ""), "embeddings": vectors}
+
+    return app
+
+
+def serve() -> None:
+    """Run the fake server on OLLAMA_HOST (host:port), like `ollama serve`."""
+    import uvicorn
+
+    host, _, port = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434").rpartition(":")
+    uvicorn.run(create_app(), host=host or "127.0.0.1", port=int(port), log_level="warning")
+
+
+def main(argv: list[str]) -> int:
+    """Entry point for the `ollama` shim."""
+    command = argv[0] if argv else ""
+    if command == "serve":
+        serve()
+    elif command == "list":
+        print("NAME\tID\tSIZE\tMODIFIED")
+        for model in cached_models():
+            print(f"{model}\tdeadbeef\t5.0 GB\t1 day ago")
+    elif command == "pull":
+        print(f"pulled {argv[1]}")
+    else:
+        print(f"fake ollama: unsupported command {command!r}", file=sys.stderr)
+        return 1
+    return 0
+
+
+@contextlib.contextmanager
+def fake_ollama_on_path(**settings: str) -> Iterator[Path]:
+    """Put a fake `ollama` executable first on PATH for the duration.
+
+    Args:
+        **settings: FAKE_OLLAMA_* / OLLAMA_* environment overrides
+
+    Yields:
+        Directory containing the shim
+    """
+    saved = {key: os.environ.get(key) for key in ("PATH", "PYTHONPATH", *settings)}
+    with tempfile.TemporaryDirectory() as tmp:
+        shim = Path(tmp) / "ollama"
+        shim.write_text(f'#!/bin/sh\nexec "{sys.executable}" -m benchmarks.fake_ollama "$@"\n')
+        shim.chmod(shim.stat().st_mode | stat.S_IEXEC)
+        os.environ["PATH"] = f"{tmp}{os.pathsep}{os.environ.get('PATH', '')}"
+        os.environ["PYTHONPATH"] = f"{REPO_ROOT}{os.pathsep}{os.environ.get('PYTHONPATH', '')}"
+        os.environ.update(settings)
+        try:
+            yield Path(tmp)
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
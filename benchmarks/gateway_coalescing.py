@@ -0,0 +1,112 @@
+"""Benchmark: in-flight coalescing of identical gateway requests.
+
+Runs the gateway in-process against a stand-in Ollama backend and fires N
+concurrent identical requests per scenario, reporting how many backend calls
+were made. Also checks that a backend error reaches every waiter and that a
+cancelled waiter does not disturb the others, and that a request arriving
+while an abandoned call is still cancelling starts a fresh call.
+
+Run:
+    python -m benchmarks.gateway_coalescing --clients 50
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInCls
+from common import SingleFlight
+
+
+class SlowOllama:
+    """Ollama stand-in taking `seconds` per call; fails paths starting with 'fail'."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        await asyncio.sleep(self.seconds)
+        if path.startswith("/fail"):
+            raise RuntimeError("backend exploded")
+        return {"status_code": 200, "body": {"path": path, "body": body}}
+
+
+async def scenario(client: httpx.AsyncClient, backend: StandInCls, clients: int, method: str,
+                   path: str, body: dict | None = None) -> tuple[int, list[int], float]:
+    before = backend.calls("proxy")
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(client.request(method, path, json=body) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return backend.calls("proxy") - before, [r.status_code for r in responses], elapsed
+
+
+async def run(args: argparse.Namespace) -> bool:
+    backend = StandInCls(SlowOllama(args.backend_seconds))
+    serve.OllamaBackend = backend
+    transport = httpx.ASGITransport(app=serve.gateway, raise_app_exceptions=False)
+    ok = True
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        cases = [
+            ("GET /api/tags", "GET", "/ollama/api/tags", None, 200),
+            ("GET /v1/models", "GET", "/ollama/v1/models", None, 200),
+            ("POST /api/show", "POST", "/ollama/api/show", {"model": "glm-4.7-flash:q4_K_M"}, 200),
+            ("POST /api/embed", "POST", "/ollama/api/embed", {"model": "m", "input": ["a", "b"]}, 200),
+            ("backend error", "GET", "/ollama/fail", None, 500),
+        ]
+        for label, method, path, body, expected in cases:
+            calls, statuses, elapsed = await scenario(client, backend, args.clients, method, path, body)
+            passed = calls == 1 and all(s == expected for s in statuses)
+            ok &= passed
+            print(f"{label:<16} {args.clients} clients -> {calls} backend call(s), "
+                  f"statuses {sorted(set(statuses))}, {elapsed * 1000:.0f} ms  {'ok' if passed else 'FAIL'}")
+
+        # Cancel one waiter mid-flight; the rest still get the shared result
+        before = backend.calls("proxy")
+        tasks = [asyncio.create_task(client.get("/ollama/api/tags")) for _ in range(args.clients)]
+        await asyncio.sleep(args.backend_seconds / 2)
+        tasks[0].cancel()
+        results = await asyncio.gather(*tasks[1:])
+        passed = backend.calls("proxy") - before == 1 and all(r.status_code == 200 for r in results)
+        ok &= passed
+        print(f"{'cancelled waiter':<16} {len(results)} remaining clients served by 1 call  {'ok' if passed else 'FAIL'}")
+
+    # Cancel the only waiter; the call's cleanup (e.g. cancelling the backend
+    # input) takes a while, and an identical request arriving meanwhile must
+    # not join the dying call
+    async def call_with_slow_cleanup() -> str:
+        try:
+            await asyncio.sleep(args.backend_seconds)
+            return "done"
+        except asyncio.CancelledError:
+            await asyncio.sleep(args.backend_seconds / 2)
+            raise
+
+    inflight = SingleFlight()
+    abandoned = asyncio.create_task(inflight.do("key", call_with_slow_cleanup))
+    await asyncio.sleep(args.backend_seconds / 4)
+    abandoned.cancel()
+    await asyncio.sleep(0)
+    try:
+        passed = await inflight.do("key", call_with_slow_cleanup) == "done" and inflight.executed == 2
+    except asyncio.CancelledError:
+        passed = False
+    ok &= passed
+    print(f"{'abandoned call':<16} a new request after the last waiter left got a fresh call  "
+          f"{'ok' if passed else 'FAIL'}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--backend-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+    if not asyncio.run(run(args)):
+        raise SystemExit("FAIL: a coalescing check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark: fast gateway requests while a slow image call is in flight.
+
+Runs the `serve.gateway` FastAPI app in-process with stand-in backends. A slow
+diffusers call is started, then /health, count_tokens and a proxied Ollama
+request are issued at a fixed interval while it renders. With async backend calls
+their latency stays in milliseconds; `--blocking` emulates the old
+synchronous `.remote()` call, which stalls them for the whole image render.
+
+Run:
+    python -m benchmarks.gateway_concurrency --image-seconds 2
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInCls
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+class SlowDiffusers:
+    """Diffusers stand-in whose generate takes `seconds`."""
+
+    def __init__(self, seconds: float, blocking: bool):
+        self.seconds = seconds
+        self.blocking = blocking
+
+    async def generate(self, **kwargs) -> dict:
+        if self.blocking:
+            time.sleep(self.seconds)  # what a synchronous .remote() does to the loop
+        else:
+            await asyncio.sleep(self.seconds)
+        return {"image": PNG_BYTES, "timing": {"denoise": self.seconds, "handler": self.seconds}}
+
+
+class FastOllama:
+    """Ollama stand-in answering proxy calls in ~10 ms."""
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        await asyncio.sleep(0.01)
+        return {"status_code": 200, "body": {"models": []}}
+
+
+async def run(args: argparse.Namespace) -> list[float]:
+    """Return the latencies of fast requests issued during the image call."""
+    serve.OllamaBackend = StandInCls(FastOllama())
+    serve.DiffusersBackend_L40S = StandInCls(SlowDiffusers(args.image_seconds, args.blocking))
+
+    transport = httpx.ASGITransport(app=serve.gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        image = asyncio.create_task(client.post(
+            "/diffusers/generate",
+            json={"model_id": "stabilityai/stable-diffusion-xl-base-1.0", "inputs": "a sunset"},
+        ))
+        fast = [
+            ("GET", "/health", None),
+            ("POST", "/ollama/v1/messages/count_tokens", {"messages": [{"role": "user", "content": "hi"}]}),
+            ("GET", "/ollama/api/tags", None),
+        ]
+
+        t0 = time.perf_counter()
+
+        async def timed(i: int) -> float:
+            # One fast request is due every `interval` seconds while the image renders;
+            # latency counts from when it was due, so a blocked event loop shows up.
+            due = 0.05 + i * args.interval
+            await asyncio.sleep(due)
+            method, path, body = fast[i % len(fast)]
+            response = await client.request(method, path, json=body)
+            response.raise_for_status()
+            return time.perf_counter() - t0 - due
+
+        count = int(args.image_seconds / args.interval)
+        latencies = await asyncio.gather(*(timed(i) for i in range(count)))
+        (await image).raise_for_status()
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--image-seconds", type=float, default=2.0)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between fast requests")
+    parser.add_argument("--blocking", action="store_true", help="emulate synchronous .remote() calls")
+    args = parser.parse_args()
+
+    latencies = asyncio.run(run(args))
+    mode = "blocking .remote()" if args.blocking else "async .remote.aio()"
+    print(f"{mode}: {len(latencies)} fast requests during a {args.image_seconds:.1f}s image call")
+    print(f"  p50 {statistics.median(latencies) * 1000:8.1f} ms")
+    print(f"  max {max(latencies) * 1000:8.1f} ms")
+    if not args.blocking and max(latencies) > args.image_seconds / 2:
+        raise SystemExit("FAIL: fast requests were delayed by the image call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark: hot-path cost of gateway metrics.
+
+Measures a single histogram observation, then drives a trivial ASGI app
+directly (no HTTP client, no network) with and without MetricsMiddleware to
+show the per-request overhead the middleware adds.
+
+Run:
+    python -m benchmarks.metrics_overhead --requests 50000
+"""
+
+import argparse
+import asyncio
+import time
+
+from common import GatewayMetrics, MetricsMiddleware
+
+
+async def tiny_app(scope, receive, send) -> None:
+    await receive()
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-length", b"2")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def drive(app, requests: int) -> float:
+    """Return seconds per request for `requests` sequential calls."""
+    async def receive():
+        return {"type": "http.request", "body": b'{"model": "m"}', "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        scope = {"type": "http", "method": "POST", "path": "/ollama/api/chat", "headers": []}
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    metrics = GatewayMetrics()
+    started = time.perf_counter()
+    for i in range(args.requests):
+        metrics.request_seconds.observe(i * 1e-4, "/ollama/api/chat", "")
+    observe = (time.perf_counter() - started) / args.requests
+    print(f"histogram observe       {observe * 1e9:8.0f} ns")
+
+    bare = await drive(tiny_app, args.requests)
+    wrapped = await drive(MetricsMiddleware(tiny_app, metrics, lambda path: path), args.requests)
+    print(f"bare ASGI request       {bare * 1e6:8.2f} us")
+    print(f"with MetricsMiddleware  {wrapped * 1e6:8.2f} us  (+{(wrapped - bare) * 1e6:.2f} us per request)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark: two models on the shared Ollama pool vs a dedicated pool each.
+
+A stand-in backend simulates Ollama's scheduler on one GPU that holds one
+model at a time. A request for another model waits until in-flight
+requests finish. Requests that arrive after it wait too (first in, first
+out). The weights are then swapped, which takes `--swap-seconds`.
+Generation takes `--generate-seconds` per request, with up to `--slots`
+requests at once.
+
+Two groups of clients send non-streaming chats in a closed loop, one group
+per model. The same load runs with both models on the shared pool, then
+with `OLLAMA_MODEL_POOLS`-style dedicated pools. Latency, completed
+requests and weight swaps are reported.
+
+Run:
+    python -m benchmarks.model_pools --seconds 20 --clients 4
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+import serve
+from benchmarks.standins import StandInParamCls
+from common import AdmissionController, AffinityRouter
+
+MODELS = ("glm-4.7-flash:q8_0", "glm-4.7-flash:q4_K_M")
+
+
+class SimulatedGPU:
+    """One container's Ollama: one model in VRAM, FIFO scheduling, `slots` parallel requests."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.loaded: str | None = None
+        self.active = 0
+        self.swaps = 0
+        self.gate = asyncio.Lock()  # FIFO: a request waiting to swap holds back later ones
+        self.changed = asyncio.Condition()
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        model = body["model"]
+        async with self.gate, self.changed:
+            await self.changed.wait_for(
+                lambda: self.active < self.args.slots and (self.loaded == model or self.active == 0)
+            )
+            if self.loaded != model:
+                if self.loaded is not None:
+                    self.swaps += 1
+                await asyncio.sleep(self.args.swap_seconds)
+                self.loaded = model
+            self.active += 1
+        try:
+            await asyncio.sleep(self.args.generate_seconds)
+        finally:
+            async with self.changed:
+                self.active -= 1
+                self.changed.notify_all()
+        content = {"model": model, "message": {"role": "assistant", "content": "ok"}, "done": True}
+        return {"status_code": 200, "body": content}
+
+
+async def client_loop(client: httpx.AsyncClient, model: str, until: float, latencies: list[float]) -> None:
+    body = {"model": model, "messages": [{"role": "user", "content": "hi"}], "stream": False}
+    while time.perf_counter() < until:
+        started = time.perf_counter()
+        response = await client.post("/ollama/api/chat", json=body)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace, dedicated: bool) -> None:
+    gpus: dict[tuple, SimulatedGPU] = {}
+    serve.OllamaBackend = StandInParamCls(
+        lambda replica=0, model="": gpus.setdefault((replica, model), SimulatedGPU(args))
+    )
+    serve.affinity_router = AffinityRouter(1, capacity=args.slots)
+    serve.ollama_admission = AdmissionController("ollama", args.slots, 256)
+    serve.model_pools = {model: serve.ModelPool(model, 1, 300) for model in MODELS} if dedicated else {}
+
+    latencies: dict[str, list[float]] = {model: [] for model in MODELS}
+    transport = httpx.ASGITransport(app=serve.gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        until = time.perf_counter() + args.seconds
+        await asyncio.gather(*(
+            client_loop(client, model, until, latencies[model]) for model in MODELS for _ in range(args.clients)
+        ))
+    label = "dedicated pools" if dedicated else "shared pool"
+    for model in MODELS:
+        samples = sorted(latencies[model])
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(f"{label:<16} {model:<22} requests {len(samples):4d}  "
+              f"p50 {statistics.median(samples):6.2f} s  p99 {p99:6.2f} s")
+    print(f"{label:<16} weight swaps {sum(gpu.swaps for gpu in gpus.values())}  containers {len(gpus)}")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    serve.embedding_pipeline = None
+    for dedicated in (False, True):
+        await run(args, dedicated)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20.0, help="duration of each run")
+    parser.add_argument("--clients", type=int, default=4, help="clients per model")
+    parser.add_argument("--slots", type=int, default=4, help="parallel requests per container")
+    parser.add_argument("--swap-seconds", type=float, default=3.0, help="time to load a model into VRAM")
+    parser.add_argument("--generate-seconds", type=float, default=1.0, help="time per chat")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark: serial vs concurrent inputs on one OllamaService container.
+
+Serial mode reproduces one input per container (each call waits for the
+previous one). Concurrent mode issues calls through the shared AsyncClient
+with up to `num_parallel` in flight, like @modal.concurrent does.
+
+Run:
+    python -m benchmarks.ollama_concurrency --requests 32 --parallel 4
+"""
+
+import argparse
+import asyncio
+import time
+
+from backends.ollama import OllamaConfig, OllamaService
+from benchmarks.fake_ollama import fake_ollama_on_path, free_port
+
+MODEL = "glm-4.7-flash:q4_K_M"
+
+
+async def run_serial(service: OllamaService, requests: int) -> float:
+    """Issue requests one after another; return elapsed seconds."""
+    started = time.perf_counter()
+    for i in range(requests):
+        await service.chat(MODEL, [{"role": "user", "content": f"hello {i}"}])
+    return time.perf_counter() - started
+
+
+async def run_concurrent(service: OllamaService, requests: int, max_inputs: int) -> float:
+    """Issue requests with at most `max_inputs` in flight; return elapsed seconds."""
+    limit = asyncio.Semaphore(max_inputs)
+
+    async def one(i: int) -> None:
+        async with limit:
+            await service.chat(MODEL, [{"role": "user", "content": f"hello {i}"}])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - started
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    config = OllamaConfig(models=[MODEL], port=free_port(), num_parallel=args.parallel)
+    settings = {
+        "FAKE_OLLAMA_MODELS": MODEL,
+        "FAKE_OLLAMA_TTFT": str(args.ttft),
+        "FAKE_OLLAMA_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_OLLAMA_NUM_TOKENS": str(args.num_tokens),
+    }
+    with fake_ollama_on_path(**settings):
+        service = OllamaService(config)
+        service.start()
+        try:
+            serial = await run_serial(service, args.requests)
+            concurrent = await run_concurrent(service, args.requests, args.parallel)
+        finally:
+            await service.stop()
+
+    tokens = args.requests * args.num_tokens
+    print(f"{args.requests} chat requests, {args.num_tokens} tokens each, {args.parallel} slots")
+    print(f"  serial:     {serial:6.2f}s  {args.requests / serial:6.2f} req/s  {tokens / serial:8.1f} tok/s")
+    print(f"  concurrent: {concurrent:6.2f}s  {args.requests / concurrent:6.2f} req/s  {tokens / concurrent:8.1f} tok/s")
+    print(f"  speedup:    {serial / concurrent:.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--num-tokens", type=int, default=50)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Benchmark: first-request latency with and without VRAM preload.
+
+Starts OllamaService against the fake server, whose first request for a model
+pays FAKE_OLLAMA_LOAD_SECONDS of weight loading, and times container start
+plus the first chat request in both modes.
+
+Run:
+    python -m benchmarks.ollama_preload --load-seconds 3
+"""
+
+import argparse
+import asyncio
+import time
+
+from backends.ollama import OllamaConfig, OllamaService
+from benchmarks.fake_ollama import fake_ollama_on_path, free_port
+
+MODEL = "glm-4.7-flash:q4_K_M"
+
+
+async def measure(preload: bool, load_seconds: float) -> dict:
+    """Return start, first-request and reported load times in seconds."""
+    config = OllamaConfig(
+        models=[MODEL], port=free_port(), preload_models=[MODEL] if preload else []
+    )
+    with fake_ollama_on_path(FAKE_OLLAMA_MODELS=MODEL, FAKE_OLLAMA_LOAD_SECONDS=str(load_seconds)):
+        service = OllamaService(config)
+        started = time.perf_counter()
+        service.start()
+        start_seconds = time.perf_counter() - started
+        try:
+            started = time.perf_counter()
+            response = await service.chat(MODEL, [{"role": "user", "content": "hello"}])
+            first_request = time.perf_counter() - started
+        finally:
+            await service.stop()
+    return {
+        "start": start_seconds,
+        "first_request": first_request,
+        "load": response["load_duration"] / 1e9,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12} {'start':>8} {'first req':>10} {'load_duration':>14}")
+    for preload in (False, True):
+        result = asyncio.run(measure(preload, args.load_seconds))
+        mode = "preload" if preload else "no preload"
+        print(f"{mode:<12} {result['start']:7.2f}s {result['first_request']:9.2f}s {result['load']:13.2f}s")
+
+
+if __name__ == "__main__":
+    main()
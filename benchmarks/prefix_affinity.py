@@ -0,0 +1,107 @@
+"""Benchmark: prompt-eval time with and without prefix-affinity routing.
+
+Runs the gateway in-process against several backend replicas, each a real
+OllamaService driving its own fake Ollama server with a per-slot prompt cache.
+Multi-turn conversations are replayed through /ollama/api/chat once with
+random replica choice (what an unpinned container pool does) and once with
+prefix affinity, summing `prompt_eval_duration` from the responses.
+
+Run:
+    python -m benchmarks.prefix_affinity --replicas 3 --conversations 6 --turns 8
+"""
+
+import argparse
+import asyncio
+import contextlib
+import random
+import time
+
+import httpx
+
+import serve
+from backends.ollama import OllamaConfig, OllamaService
+from benchmarks.fake_ollama import fake_ollama_on_path, free_port
+from benchmarks.standins import StandInParamCls
+from common import AffinityRouter, prefix_key
+
+MODEL = "glm-4.7-flash:q4_K_M"
+
+
+class Replica:
+    """Backend stand-in forwarding to one OllamaService."""
+
+    def __init__(self, service: OllamaService):
+        self.service = service
+
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        return await self.service.proxy(method, path, body)
+
+
+async def conversation(client: httpx.AsyncClient, rng: random.Random, name: str, turns: int) -> list[int]:
+    """Play one conversation; return prompt_eval_duration (ns) per turn."""
+    messages = [{"role": "system", "content": f"{name}. " + "rules " * 2000}]
+    durations = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"turn {turn} " + "context " * rng.randint(200, 600)})
+        response = await client.post("/ollama/api/chat", json={"model": MODEL, "messages": messages, "stream": False})
+        response.raise_for_status()
+        data = response.json()
+        durations.append(data["prompt_eval_duration"])
+        messages.append(data["message"])
+    return durations
+
+
+async def run(services: list[OllamaService], args: argparse.Namespace, affinity: bool) -> tuple[float, float]:
+    """Return (total prompt-eval seconds, wall seconds) for one routing mode."""
+    serve.OllamaBackend = StandInParamCls(lambda replica=0: Replica(services[replica]))
+    serve.affinity_router = AffinityRouter(len(services), capacity=args.parallel)
+    rng = random.Random(0)
+    # Without affinity every request gets a fresh random key, i.e. an arbitrary replica
+    serve.prefix_key = prefix_key if affinity else (lambda path, body: str(rng.random()))
+
+    transport = httpx.ASGITransport(app=serve.gateway)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway", timeout=None) as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            # Names differ per mode so the second run cannot reuse the first run's cache
+            conversation(client, random.Random(i), f"{affinity} conversation {i}", args.turns)
+            for i in range(args.conversations)
+        ))
+    return sum(sum(r) for r in results) / 1e9, time.perf_counter() - started
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    settings = {
+        "FAKE_OLLAMA_MODELS": MODEL,
+        "FAKE_OLLAMA_NUM_TOKENS": "5",
+        "FAKE_OLLAMA_PROMPT_TOKENS_PER_SECOND": str(args.prompt_tokens_per_second),
+    }
+    with fake_ollama_on_path(**settings), contextlib.redirect_stdout(None):
+        services = [
+            OllamaService(OllamaConfig(models=[MODEL], port=free_port(), num_parallel=args.parallel))
+            for _ in range(args.replicas)
+        ]
+        for service in services:
+            service.start()
+    try:
+        for affinity in (False, True):
+            prompt_eval, wall = await run(services, args, affinity)
+            mode = "prefix affinity" if affinity else "random replica"
+            print(f"{mode:<16} prompt eval {prompt_eval:7.2f}s   wall {wall:6.2f}s")
+    finally:
+        for service in services:
+            await service.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--parallel", type=int, default=4, help="decode slots (and cached prompts) per replica")
+    parser.add_argument("--conversations", type=int, default=6)
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=20000)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Benchmark: parsed proxying vs GATEWAY_PASSTHROUGH for multi-megabyte bodies.
+
+Sends a chat request with a ~5 MB message history, and an embedding request
+with a multi-megabyte response, through the gateway (served by uvicorn) to a
+real OllamaService driving the fake Ollama server. The backend stand-in
+pickles arguments and results, as Modal does between containers. Each
+request is sent with the gateway parsing bodies and again in passthrough
+mode; responses are checked to decode to the same JSON.
+
+Reports p50 latency and the benchmark process's CPU time per request
+(gateway plus backend handler; the fake Ollama server runs in its own
+process).
+
+Run:
+    python -m benchmarks.raw_passthrough --megabytes 5 --requests 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import pickle
+import statistics
+import time
+
+import httpx
+
+import serve
+from backends.ollama import OllamaConfig, OllamaService
+from benchmarks.fake_ollama import fake_ollama_on_path, free_port
+from benchmarks.standins import StandInParamCls
+from benchmarks.suite import EMBED_MODEL, MODEL, serve_gateway
+
+
+class Pickled:
+    """Round-trips arguments and results through pickle, like a Modal call."""
+
+    def __init__(self, service: OllamaService):
+        self.service = service
+
+    def __getattr__(self, name: str):
+        method = getattr(self.service, name)
+
+        async def call(*args):
+            result = await method(*pickle.loads(pickle.dumps(args)))
+            return pickle.loads(pickle.dumps(result))
+
+        return call
+
+
+def chat_body(megabytes: float, i: int) -> dict:
+    """A non-streaming chat request whose history totals about `megabytes`."""
+    turn = "lorem ipsum dolor sit amet " * 40
+    turns = max(1, int(megabytes * 1024 * 1024 / len(turn)))
+    messages = [{"role": "user" if n % 2 else "assistant", "content": f"{i}:{n} {turn}"} for n in range(turns)]
+    return {"model": MODEL, "messages": messages, "stream": False}
+
+
+async def run(client: httpx.AsyncClient, path: str, payload: bytes, n: int) -> tuple[list[float], float, httpx.Response]:
+    """Send `payload` n times; return latencies, CPU seconds and the last response."""
+    latencies = []
+    cpu_started = time.process_time()
+    for _ in range(n):
+        started = time.perf_counter()
+        response = await client.post(path, content=payload, headers={"content-type": "application/json"})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    cpu = time.process_time() - cpu_started
+    return latencies, cpu, response
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    settings = {
+        "FAKE_OLLAMA_MODELS": f"{MODEL},{EMBED_MODEL}",
+        "FAKE_OLLAMA_TTFT": "0",
+        "FAKE_OLLAMA_NUM_TOKENS": "20",
+        "FAKE_OLLAMA_TOKENS_PER_SECOND": "100000",
+        "FAKE_OLLAMA_PROMPT_TOKENS_PER_SECOND": "1000000000",
+        "FAKE_OLLAMA_EMBEDDING_DIM": str(args.embedding_dim),
+    }
+    config = OllamaConfig(models=[MODEL, EMBED_MODEL], port=free_port())
+    with fake_ollama_on_path(**settings):
+        with contextlib.redirect_stdout(None):
+            service = OllamaService(config)
+            service.start()
+        serve.OllamaBackend = StandInParamCls(lambda replica=0: Pickled(service))
+        # One whole embedding call, as a client would send it with the pipeline off
+        serve.embedding_pipeline = None
+        try:
+            scenarios = {
+                "chat": ("/ollama/api/chat", json.dumps(chat_body(args.megabytes, 0)).encode()),
+                "embed": ("/ollama/api/embed", json.dumps(
+                    {"model": EMBED_MODEL, "input": [f"text {i}" for i in range(args.embed_inputs)]}
+                ).encode()),
+            }
+            async with serve_gateway() as base_url, httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+                for name, (path, payload) in scenarios.items():
+                    decoded = {}
+                    for passthrough in (False, True):
+                        serve.GATEWAY_PASSTHROUGH = passthrough
+                        await run(client, path, payload, 1)  # warm up
+                        latencies, cpu, response = await run(client, path, payload, args.requests)
+                        decoded[passthrough] = response.json()
+                        mode = "passthrough" if passthrough else "parsed"
+                        print(f"{name:<6} {mode:<12} request {len(payload) / 1e6:5.2f} MB  "
+                              f"response {len(response.content) / 1e6:5.2f} MB  "
+                              f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+                              f"cpu {cpu / args.requests * 1000:7.1f} ms/req")
+                    # Generated text and durations vary per call; compare the shape that must not
+                    same = decoded[False].keys() == decoded[True].keys()
+                    if name == "embed":
+                        same &= decoded[False]["embeddings"] == decoded[True]["embeddings"]
+                    print(f"{name:<6} responses match: {same}")
+        finally:
+            await service.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=5.0, help="chat request size")
+    parser.add_argument("--requests", type=int, default=20, help="requests per mode")
+    parser.add_argument("--embed-inputs", type=int, default=768, help="texts per embedding request")
+    parser.add_argument("--embedding-dim", type=int, default=1024)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
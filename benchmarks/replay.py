@@ -0,0 +1,169 @@
+"""Replay captured gateway traffic against local stand-in backends.
+
+Reads JSONL traces written by the gateway with GATEWAY_CAPTURE=true (one file
+per gateway container; several files are merged by wall-clock time) and
+sends every request to a locally served gateway at its recorded offset,
+divided by `--speed`. Requests are fired open-loop, like real clients, so
+bursts and overlaps are reproduced. Bodies are the trace's redacted copies.
+Image model IDs are mapped to the fake model of the same GPU tier.
+
+Reports p50/p99 latency, time to first byte and status counts per route,
+plus how late requests were sent, and writes JSON that `--compare` diffs
+against an earlier replay. Each replayed status is checked against the
+recorded one (traces from before statuses were recorded are not checked);
+the exit status is 1 if any differ.
+
+Run:
+    modal volume get gateway-traces trace-20260101-120000-1.jsonl .
+    python -m benchmarks.replay trace-*.jsonl --speed 10 --output replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+import serve
+from backends.diffusers import get_model_config
+from benchmarks.suite import (
+    Sample,
+    add_backend_arguments,
+    compare,
+    fake_settings,
+    git_commit,
+    local_backends,
+    ms,
+    percentile,
+    serve_gateway,
+    summarize,
+)
+
+
+def load_trace(paths: list[str], limit: int | None = None) -> list[dict]:
+    """Merge trace files into one list ordered by arrival, with offsets from the first request."""
+    records = []
+    for path in paths:
+        with open(path) as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda r: r["ts"])
+    if limit:
+        records = records[:limit]
+    if records:
+        first = records[0]["ts"]
+        for record in records:
+            record["offset"] = record["ts"] - first
+    return records
+
+
+def local_body(record: dict, image_models: list[str]) -> dict | None:
+    """The request body to send, with image models mapped to local fakes."""
+    body = record.get("body")
+    if body and record["path"] == "/diffusers/generate":
+        config = get_model_config(body.get("model_id", ""))
+        tier = config["gpu_tier"] if config else "a10g"
+        fake = f"fake/image-{tier}"
+        body = {**body, "model_id": fake if fake in image_models else body.get("model_id")}
+    return body
+
+
+async def send(client: httpx.AsyncClient, record: dict, body: dict | None) -> Sample:
+    started = time.perf_counter()
+    if record.get("stream"):
+        ttfb = None
+        async with client.stream(record["method"], record["path"], json=body) as response:
+            async for _ in response.aiter_raw():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+        return Sample(response.status_code, time.perf_counter() - started, ttfb)
+    response = await client.request(record["method"], record["path"], json=body)
+    return Sample(response.status_code, time.perf_counter() - started)
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    records = load_trace(args.traces, args.limit)
+    if not records:
+        raise SystemExit("trace is empty")
+    print(f"replaying {len(records)} requests spanning {records[-1]['offset']:.1f}s at {args.speed}x")
+
+    by_route: dict[str, list[Sample]] = {}
+    mismatches: dict[str, list[tuple[int, int]]] = {}
+    lateness: list[float] = []
+    async with local_backends(fake_settings(args), args.parallel) as image_models:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with serve_gateway() as base_url, \
+                httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+            loop = asyncio.get_running_loop()
+
+            async def replay_one(record: dict) -> None:
+                due = start + record["offset"] / args.speed
+                await asyncio.sleep(max(0.0, due - loop.time()))
+                lateness.append(loop.time() - due)
+                sample = await send(client, record, local_body(record, image_models))
+                route = serve.route_label(record["path"])
+                by_route.setdefault(route, []).append(sample)
+                if record.get("status") is not None and sample.status != record["status"]:
+                    mismatches.setdefault(route, []).append((record["status"], sample.status))
+
+            cpu_started = time.process_time()
+            start = loop.time()
+            await asyncio.gather(*(replay_one(record) for record in records))
+            wall = loop.time() - start
+            cpu = time.process_time() - cpu_started
+
+    results = {"all": summarize([s for samples in by_route.values() for s in samples], wall, cpu)}
+    for route, samples in sorted(by_route.items()):
+        results[route] = summarize(samples, wall, None)
+    for route, result in results.items():
+        ttfb = f"  ttfb p50 {result['ttfb_p50_ms']} ms" if result["ttfb_p50_ms"] is not None else ""
+        print(f"{route:<32} {result['requests']:5d} req  p50 {result['p50_ms']} ms  "
+              f"p99 {result['p99_ms']} ms{ttfb}  {result['statuses']}")
+    for route, pairs in sorted(mismatches.items()):
+        counts: dict[str, int] = {}
+        for recorded, replayed in pairs:
+            key = f"{recorded}->{replayed}"
+            counts[key] = counts.get(key, 0) + 1
+        print(f"{route:<32} status mismatch: FAIL  {counts}")
+    checked = sum(1 for record in records if record.get("status") is not None)
+    if checked and not mismatches:
+        print(f"recorded statuses: ok ({checked} checked)")
+    print(f"send lateness p50 {ms(percentile(lateness, 0.5))} ms  p99 {ms(percentile(lateness, 0.99))} ms")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "traces": args.traces,
+        "speed": args.speed,
+        "settings": {**vars(args), **fake_settings(args)},
+        "lateness_p99_ms": ms(percentile(lateness, 0.99)),
+        "scenarios": results,
+        "status_mismatches": sum(len(pairs) for pairs in mismatches.values()),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+", help="trace files captured with GATEWAY_CAPTURE=true")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up (1 = real time)")
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--output", default="replay-results.json")
+    parser.add_argument("--compare", help="earlier replay results file to diff against")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    run = asyncio.run(main_async(args))
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(run, json.load(f))
+    if run["status_mismatches"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
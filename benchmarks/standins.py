@@ -0,0 +1,154 @@
+"""Local stand-ins for Modal backend classes.
+
+A stand-in replaces a deployed `@app.cls` (e.g. `serve.OllamaBackend`) with an
+in-process object exposing the same call surface the gateway uses:
+`Backend().method.remote(...)`, `.remote.aio(...)`, `.remote_gen(...)`,
+`.remote_gen.aio(...)` and `.spawn.aio(...)`. Method implementations are plain
+async functions or async generators on an implementation object.
+
+Usage:
+    serve.OllamaBackend = StandInCls(MyOllamaImpl())
+    serve.OllamaBackend = StandInParamCls(lambda replica=0: MyOllamaImpl(replica))
+"""
+
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterator, Callable, Iterator
+
+
+class _Invoker:
+    """Callable with an `.aio` variant, like Modal's `.remote`."""
+
+    def __init__(self, blocking: Callable, aio: Callable):
+        self._blocking = blocking
+        self.aio = aio
+
+    def __call__(self, *args, **kwargs):
+        return self._blocking(*args, **kwargs)
+
+
+class StandInFunctionCall:
+    """A spawned call running in its own task, like Modal's `FunctionCall`."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.get = _Invoker(self._blocking, self._get_aio)
+        self.cancel = _Invoker(self._blocking, self._cancel_aio)
+
+    def _blocking(self, *args, **kwargs):
+        raise NotImplementedError("spawned stand-in calls only support .aio")
+
+    async def _get_aio(self, timeout: float | None = None) -> Any:
+        return await asyncio.wait_for(asyncio.shield(self.task), timeout)
+
+    async def _cancel_aio(self, terminate_containers: bool = False) -> None:
+        self.task.cancel()
+
+
+class StandInMethod:
+    """Wraps one implementation method and counts backend calls."""
+
+    def __init__(self, fn: Callable):
+        self.fn = fn
+        self.calls = 0
+        self.remote = _Invoker(self._remote_blocking, self._remote_aio)
+        self.remote_gen = _Invoker(self._remote_gen_blocking, self._remote_gen_aio)
+        self.spawn = _Invoker(self._spawn_blocking, self._spawn_aio)
+
+    async def _remote_aio(self, *args, **kwargs) -> Any:
+        self.calls += 1
+        return await self.fn(*args, **kwargs)
+
+    def _remote_blocking(self, *args, **kwargs) -> Any:
+        # Run on a private loop in another thread and block the caller,
+        # which is what a synchronous Modal call does to the gateway.
+        result: dict = {}
+
+        def run() -> None:
+            try:
+                result["value"] = asyncio.run(self._remote_aio(*args, **kwargs))
+            except BaseException as e:  # re-raised in the caller
+                result["error"] = e
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    async def _spawn_aio(self, *args, **kwargs) -> StandInFunctionCall:
+        # The call outlives a cancelled caller until it is cancelled itself
+        return StandInFunctionCall(asyncio.ensure_future(self._remote_aio(*args, **kwargs)))
+
+    def _spawn_blocking(self, *args, **kwargs):
+        raise NotImplementedError("stand-ins only support .spawn.aio")
+
+    def _remote_gen_aio(self, *args, **kwargs) -> AsyncIterator[Any]:
+        self.calls += 1
+        return self.fn(*args, **kwargs)
+
+    def _remote_gen_blocking(self, *args, **kwargs) -> Iterator[Any]:
+        items: queue.Queue = queue.Queue()
+        done = object()
+
+        async def drain() -> None:
+            try:
+                async for item in self._remote_gen_aio(*args, **kwargs):
+                    items.put(item)
+            finally:
+                items.put(done)
+
+        threading.Thread(target=asyncio.run, args=(drain(),), daemon=True).start()
+        while (item := items.get()) is not done:
+            yield item
+
+
+class StandInCls:
+    """Stand-in for a Modal class; instantiating it returns itself."""
+
+    def __init__(self, impl: Any):
+        self.impl = impl
+        self._methods: dict[str, StandInMethod] = {}
+
+    def __call__(self, *args, **kwargs) -> "StandInCls":
+        return self
+
+    def with_options(self, **options) -> "StandInCls":
+        """Scaling options have no local effect."""
+        return self
+
+    def __getattr__(self, name: str) -> StandInMethod:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._methods:
+            self._methods[name] = StandInMethod(getattr(self.impl, name))
+        return self._methods[name]
+
+    def calls(self, name: str) -> int:
+        """Number of backend calls made to method `name`."""
+        method = self._methods.get(name)
+        return method.calls if method else 0
+
+
+class StandInParamCls:
+    """Stand-in for a parameterized Modal class.
+
+    Each distinct set of parameters gets its own StandInCls, built from
+    `factory(**params)`, like a separate Modal instance with its own containers.
+    """
+
+    def __init__(self, factory: Callable[..., Any]):
+        self.factory = factory
+        self.instances: dict[tuple, StandInCls] = {}
+
+    def __call__(self, **params) -> StandInCls:
+        key = tuple(sorted(params.items()))
+        if key not in self.instances:
+            self.instances[key] = StandInCls(self.factory(**params))
+        return self.instances[key]
+
+    def with_options(self, **options) -> "StandInParamCls":
+        """Scaling options have no local effect."""
+        return self
@@ -0,0 +1,76 @@
+"""Benchmark: stream_proxy messages per response with and without coalescing.
+
+Streams chat completions from the fake Ollama server through
+OllamaService.stream_proxy. Each yielded item stands for one Modal generator
+message; the consumer pays a fixed per-message cost to model the
+cross-container RPC. Reports messages per response, time to first token and
+end-to-end tokens per second.
+
+Run:
+    python -m benchmarks.stream_coalescing --tokens-per-second 500 --num-tokens 500
+"""
+
+import argparse
+import asyncio
+import contextlib
+import time
+
+from backends.ollama import OllamaConfig, OllamaService
+from benchmarks.fake_ollama import fake_ollama_on_path, free_port
+
+MODEL = "glm-4.7-flash:q4_K_M"
+
+
+async def stream_once(service: OllamaService, path: str, overhead: float) -> tuple[int, float, float, bool]:
+    """Return (messages, ttft, total seconds, lines intact) for one response."""
+    body = {"model": MODEL, "messages": [{"role": "user", "content": "hi"}], "stream": True}
+    messages = 0
+    first = None
+    intact = True
+    started = time.perf_counter()
+    async for chunk in service.stream_proxy(path, body):
+        if first is None:
+            first = time.perf_counter() - started
+        messages += 1
+        intact &= chunk.endswith(b"\n")
+        await asyncio.sleep(overhead)  # per-message RPC cost
+    return messages, first or 0.0, time.perf_counter() - started, intact
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    settings = {
+        "FAKE_OLLAMA_MODELS": MODEL,
+        "FAKE_OLLAMA_TTFT": "0.05",
+        "FAKE_OLLAMA_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_OLLAMA_NUM_TOKENS": str(args.num_tokens),
+    }
+    print(f"{args.num_tokens} tokens at {args.tokens_per_second:.0f} tok/s, "
+          f"{args.overhead_ms:.1f} ms per message")
+    for coalesce in (0, args.coalesce_bytes):
+        config = OllamaConfig(models=[MODEL], port=free_port(), stream_coalesce_bytes=coalesce,
+                              stream_coalesce_ms=args.coalesce_ms)
+        with fake_ollama_on_path(**settings), contextlib.redirect_stdout(None):
+            service = OllamaService(config)
+            service.start()
+        try:
+            for path in ("/api/chat", "/v1/chat/completions"):
+                messages, ttft, total, intact = await stream_once(service, path, args.overhead_ms / 1000)
+                mode = f"coalesce {coalesce}B/{args.coalesce_ms:.0f}ms" if coalesce else "no coalescing"
+                print(f"  {mode:<22} {path:<22} {messages:5d} msgs  ttft {ttft * 1000:6.1f} ms  "
+                      f"{args.num_tokens / total:7.1f} tok/s  whole lines: {intact}")
+        finally:
+            await service.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens-per-second", type=float, default=500)
+    parser.add_argument("--num-tokens", type=int, default=500)
+    parser.add_argument("--overhead-ms", type=float, default=2.0)
+    parser.add_argument("--coalesce-bytes", type=int, default=4096)
+    parser.add_argument("--coalesce-ms", type=float, default=10)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Benchmark suite: gateway load scenarios against local stand-in backends.
+
+Serves the `serve.gateway` FastAPI app with uvicorn in this process (a real
+HTTP server, so streams are timed chunk by chunk). Ollama calls go to a real
+OllamaService driving the fake Ollama server (configurable time to first
+token, token rate and chunking); image calls go to a real DiffusersService
+running the fake diffusers pipeline (requires torch; skipped otherwise).
+
+Scenarios:
+    chat    concurrent non-streaming chat completions
+    stream  concurrent streaming chats (time to first byte and total)
+    embed   a burst of concurrent embedding requests
+    image   concurrent image generations across both GPU tiers
+
+Each scenario reports p50/p99 latency, throughput and CPU time per request
+of this process (gateway, stand-in backends and client; the fake Ollama
+server runs in its own process). Results go to a JSON file that
+`--compare` diffs against an earlier run, e.g. from another commit.
+
+Run:
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import platform
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+import httpx
+import uvicorn
+
+import serve
+from backends.ollama import OllamaConfig, OllamaService
+from benchmarks.fake_diffusers import fake_diffusers_models
+from benchmarks.fake_ollama import fake_ollama_on_path, free_port
+from benchmarks.standins import StandInCls, StandInParamCls
+
+try:
+    from backends.diffusers.backend import DiffusersService
+except ImportError:  # torch is not installed
+    DiffusersService = None
+
+MODEL = "glm-4.7-flash:q4_K_M"
+EMBED_MODEL = "qwen3-embedding:0.6b"
+SCENARIOS = ("chat", "stream", "embed", "image")
+
+
+@dataclass
+class Sample:
+    """One request's outcome."""
+
+    status: int
+    latency: float
+    ttfb: float | None = None
+
+
+class LocalDiffusers:
+    """Stand-in for a DiffusersBackend class: one DiffusersService serving one input at a time."""
+
+    def __init__(self, service):
+        self.service = service
+        self.lock = asyncio.Lock()
+
+    async def generate(self, **kwargs) -> dict:
+        async with self.lock:
+            image = await asyncio.to_thread(self.service.generate, **kwargs)
+            return {"image": image, "timing": self.service.last_timing}
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def chat_body(client_id: int, turn: int, stream: bool) -> dict:
+    # Distinct bodies so in-flight coalescing does not merge requests
+    return {
+        "model": MODEL,
+        "stream": stream,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant. " * 20},
+            {"role": "user", "content": f"client {client_id} turn {turn}: " + "question " * 50},
+        ],
+    }
+
+
+async def timed(coro) -> Sample:
+    started = time.perf_counter()
+    response = await coro
+    return Sample(response.status_code, time.perf_counter() - started)
+
+
+async def run_chat(client: httpx.AsyncClient, args: argparse.Namespace) -> list[Sample]:
+    async def one_client(i: int) -> list[Sample]:
+        return [
+            await timed(client.post("/ollama/v1/chat/completions", json=chat_body(i, turn, False)))
+            for turn in range(args.requests)
+        ]
+
+    results = await asyncio.gather(*(one_client(i) for i in range(args.clients)))
+    return [sample for samples in results for sample in samples]
+
+
+async def run_stream(client: httpx.AsyncClient, args: argparse.Namespace) -> list[Sample]:
+    async def one_stream(i: int, turn: int) -> Sample:
+        started = time.perf_counter()
+        ttfb = None
+        async with client.stream("POST", "/ollama/api/chat", json=chat_body(i, turn, True)) as response:
+            async for _ in response.aiter_raw():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - started
+        return Sample(response.status_code, time.perf_counter() - started, ttfb)
+
+    async def one_client(i: int) -> list[Sample]:
+        return [await one_stream(i, turn) for turn in range(args.requests)]
+
+    results = await asyncio.gather(*(one_client(i) for i in range(args.clients)))
+    return [sample for samples in results for sample in samples]
+
+
+async def run_embed(client: httpx.AsyncClient, args: argparse.Namespace) -> list[Sample]:
+    def body(i: int) -> dict:
+        return {"model": EMBED_MODEL, "input": [f"document {i}-{j} " * 40 for j in range(args.embed_batch)]}
+
+    return list(await asyncio.gather(*(
+        timed(client.post("/ollama/api/embed", json=body(i))) for i in range(args.embed_burst)
+    )))
+
+
+async def run_image(client: httpx.AsyncClient, args: argparse.Namespace, models: list[str]) -> list[Sample]:
+    async def one_client(i: int) -> list[Sample]:
+        body = {"model_id": models[i % len(models)], "inputs": f"client {i}: a lighthouse at dusk"}
+        return [await timed(client.post("/diffusers/generate", json=body)) for _ in range(args.image_requests)]
+
+    results = await asyncio.gather(*(one_client(i) for i in range(args.image_clients)))
+    return [sample for samples in results for sample in samples]
+
+
+def summarize(samples: list[Sample], wall: float, cpu: float | None) -> dict:
+    ok = [s for s in samples if s.status == 200]
+    statuses: dict[str, int] = {}
+    for sample in samples:
+        statuses[str(sample.status)] = statuses.get(str(sample.status), 0) + 1
+    latencies = [s.latency for s in ok]
+    ttfbs = [s.ttfb for s in ok if s.ttfb is not None]
+    return {
+        "requests": len(samples),
+        "statuses": statuses,
+        "p50_ms": ms(percentile(latencies, 0.5)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "ttfb_p50_ms": ms(percentile(ttfbs, 0.5)),
+        "ttfb_p99_ms": ms(percentile(ttfbs, 0.99)),
+        "throughput_rps": round(len(ok) / wall, 2) if wall else None,
+        "cpu_ms_per_request": ms(cpu / len(samples)) if samples and cpu is not None else None,
+        "wall_seconds": round(wall, 3),
+    }
+
+
+async def measure(name: str, run) -> dict:
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    samples = await run()
+    result = summarize(samples, time.perf_counter() - started, time.process_time() - cpu_started)
+    line = f"{name:<7} {result['requests']:4d} req  p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms"
+    if result["ttfb_p50_ms"] is not None:
+        line += f"  ttfb p50 {result['ttfb_p50_ms']} ms"
+    print(f"{line}  {result['throughput_rps']} req/s  cpu {result['cpu_ms_per_request']} ms/req  {result['statuses']}")
+    return result
+
+
+def fake_settings(args: argparse.Namespace) -> dict[str, str]:
+    """FAKE_OLLAMA_* / FAKE_DIFFUSERS_* settings from the command-line options."""
+    return {
+        "FAKE_OLLAMA_MODELS": f"{MODEL},{EMBED_MODEL}",
+        "FAKE_OLLAMA_TTFT": str(args.ttft),
+        "FAKE_OLLAMA_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_OLLAMA_NUM_TOKENS": str(args.num_tokens),
+        "FAKE_OLLAMA_TOKENS_PER_CHUNK": str(args.tokens_per_chunk),
+        "FAKE_DIFFUSERS_LOAD_SECONDS": str(args.image_load_seconds),
+        "FAKE_DIFFUSERS_STEP_SECONDS": str(args.image_step_seconds),
+    }
+
+
+def add_backend_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options controlling the fake backends."""
+    parser.add_argument("--parallel", type=int, default=4, help="Ollama decode slots")
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--num-tokens", type=int, default=50)
+    parser.add_argument("--tokens-per-chunk", type=int, default=1)
+    parser.add_argument("--image-load-seconds", type=float, default=1.0)
+    parser.add_argument("--image-step-seconds", type=float, default=0.01)
+
+
+@contextlib.asynccontextmanager
+async def local_backends(settings: dict[str, str], parallel: int) -> AsyncIterator[list[str]]:
+    """Point `serve`'s backend classes at local services.
+
+    Args:
+        settings: FAKE_OLLAMA_* / FAKE_DIFFUSERS_* environment overrides
+        parallel: Ollama decode slots
+
+    Yields:
+        The fake image model IDs (empty when torch is not installed)
+    """
+    config = OllamaConfig(models=[MODEL, EMBED_MODEL], port=free_port(), num_parallel=parallel)
+    with fake_ollama_on_path(**settings), fake_diffusers_models() as image_models:
+        with contextlib.redirect_stdout(None):
+            ollama = OllamaService(config)
+            ollama.start()
+            serve.OllamaBackend = StandInParamCls(lambda replica=0: ollama)
+            if DiffusersService is not None:
+                for tier, cls_name in (("a10g", "DiffusersBackend_A10G"), ("l40s", "DiffusersBackend_L40S")):
+                    service = DiffusersService(serve.diffusers_config, gpu_tier=tier)
+                    service.start()
+                    setattr(serve, cls_name, StandInCls(LocalDiffusers(service)))
+        try:
+            yield image_models if DiffusersService is not None else []
+        finally:
+            await ollama.stop()
+
+
+@contextlib.asynccontextmanager
+async def serve_gateway() -> AsyncIterator[str]:
+    """Run the gateway with uvicorn on a free port; yield its base URL."""
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(serve.gateway, port=port, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, previous: dict) -> None:
+    """Print the change of each metric against an earlier run."""
+    print(f"\nvs {previous.get('commit')} ({previous.get('timestamp')}):")
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ("p50_ms", "p99_ms", "ttfb_p50_ms", "throughput_rps", "cpu_ms_per_request"):
+            old, new = before.get(key), result.get(key)
+            if old and new is not None:
+                changes.append(f"{key} {old} -> {new} ({(new - old) / old:+.0%})")
+        print(f"  {name:<7} " + "  ".join(changes))
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    settings = fake_settings(args)
+    results = {}
+    async with local_backends(settings, args.parallel) as image_models:
+        if "image" in scenarios and not image_models:
+            print("image   skipped: torch is not installed", file=sys.stderr)
+            scenarios.remove("image")
+
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with serve_gateway() as base_url, \
+                httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+            runs = {
+                "chat": lambda: run_chat(client, args),
+                "stream": lambda: run_stream(client, args),
+                "embed": lambda: run_embed(client, args),
+                "image": lambda: run_image(client, args, image_models),
+            }
+            # Warm up: load the fake models and pipelines outside the measurements
+            await client.post("/ollama/api/chat", json=chat_body(-1, 0, False))
+            if "image" in scenarios:
+                for model_id in image_models:
+                    await client.post("/diffusers/generate", json={"model_id": model_id, "inputs": "warm up"})
+            for name in scenarios:
+                results[name] = await measure(name, runs[name])
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {**vars(args), **settings},
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent chat/stream clients")
+    parser.add_argument("--requests", type=int, default=5, help="sequential requests per client")
+    parser.add_argument("--embed-burst", type=int, default=48)
+    parser.add_argument("--embed-batch", type=int, default=8, help="inputs per embedding request")
+    parser.add_argument("--image-clients", type=int, default=4)
+    parser.add_argument("--image-requests", type=int, default=2)
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    run = asyncio.run(main_async(args))
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"wrote {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(run, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
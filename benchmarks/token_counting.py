@@ -0,0 +1,86 @@
+"""Benchmark: exact token counting of a ~100k-token agent conversation.
+
+Measures a cold count (nothing cached), an incremental count after the client
+appends one turn (only new messages are tokenized), and the old
+chars // 4 estimate. Without --tokenizer-file a BPE tokenizer is trained
+in-process as a stand-in for the model's tokenizer.json.
+
+Run:
+    python -m benchmarks.token_counting --tokens 100000
+"""
+
+import argparse
+import random
+import time
+
+from common.tokens import TokenCounter, estimate_tokens
+
+MODEL = "glm-4.7-flash:q4_K_M"
+WORDS = [
+    "the", "model", "function", "returns", "a", "list", "of", "tokens", "for", "each",
+    "request", "container", "gateway", "volume", "stream", "error", "python", "import",
+    "def", "class", "self", "await", "async", "config", "backend", "ollama", "chat",
+]
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) + rng.choice(["", "s", "ed", "_id", "()", "."]) for _ in range(words))
+
+
+def build_tokenizer(rng: random.Random):
+    """Train a small BPE tokenizer on synthetic text."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+
+    tokenizer = Tokenizer(models.BPE(unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=4000, special_tokens=["[UNK]"])
+    tokenizer.train_from_iterator((make_text(rng, 200) for _ in range(500)), trainer)
+    return tokenizer
+
+
+def timed(counter: TokenCounter, body: dict) -> tuple[int, float]:
+    started = time.perf_counter()
+    tokens = counter.count(body)
+    return tokens, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=100_000, help="approximate conversation size")
+    parser.add_argument("--tokenizer-file", help="tokenizer.json to use instead of the stand-in")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    if args.tokenizer_file:
+        from tokenizers import Tokenizer
+
+        tokenizer = Tokenizer.from_file(args.tokenizer_file)
+    else:
+        tokenizer = build_tokenizer(rng)
+
+    messages = []
+    body = {"model": MODEL, "system": make_text(rng, 500), "messages": messages}
+    # ~1.7 stand-in tokens per synthetic word; 250-word turns
+    for i in range(max(1, int(args.tokens / 1.7 / 250))):
+        messages.append({"role": "user" if i % 2 == 0 else "assistant", "content": make_text(rng, 250)})
+
+    counter = TokenCounter(loader=lambda repo: tokenizer)
+    tokens, cold = timed(counter, body)
+    messages.append({"role": "assistant", "content": make_text(rng, 250)})
+    messages.append({"role": "user", "content": make_text(rng, 50)})
+    incremental_tokens, incremental = timed(counter, body)
+    _, repeat = timed(counter, body)
+
+    started = time.perf_counter()
+    estimate = estimate_tokens(body)
+    estimate_seconds = time.perf_counter() - started
+
+    print(f"{len(messages)} messages")
+    print(f"  cold        {cold * 1000:8.2f} ms  {tokens} tokens")
+    print(f"  incremental {incremental * 1000:8.2f} ms  {incremental_tokens} tokens (+2 messages)")
+    print(f"  repeat      {repeat * 1000:8.2f} ms")
+    print(f"  estimate    {estimate_seconds * 1000:8.2f} ms  {estimate} tokens (chars // 4)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,69 @@
 """Shared utilities for Modal deployments."""
 
 from common.types import HealthCheckable, Startable
+from common.tokens import TokenCounter, estimate_tokens
+from common.cache import ResponseCache, is_deterministic, request_key
+from common.singleflight import SingleFlight
+from common.metadata import MetadataSnapshotCache
+from common.affinity import AffinityRouter, prefix_key
+from common.metrics import METRICS_CONTENT_TYPE, GatewayMetrics, MetricsMiddleware
+from common.timing import ServerTiming, ServerTimingMiddleware
+from common.capture import TraceRecorder, TraceStatusMiddleware
+from common.peek import peek_json
+from common.compression import CompressionMiddleware
+from common.embeddings import (
+    EMBEDDING_OUTPUT_FIELDS,
+    embedding_vectors,
+    embeddings_to_base64,
+    embeddings_to_binary,
+    requested_embedding_output,
+)
+from common.embedding_store import EmbeddingStore
+from common.embedding_pipeline import EmbeddingBatchFailed, EmbeddingPipeline
+from common.batches import BATCH_ENDPOINTS, COMPLETION_WINDOWS, BatchInputError, BatchRunner, new_batch, parse_batch_input
+from common.disconnect import ClientDisconnected, cancel_on_disconnect
+from common.admission import AdmissionController, AdmissionRejected, DeadlineExpired, QueueFull, Ticket
 
-__all__ = ["HealthCheckable", "Startable"]
+__all__ = [
+    "HealthCheckable",
+    "Startable",
+    "TokenCounter",
+    "estimate_tokens",
+    "ResponseCache",
+    "is_deterministic",
+    "request_key",
+    "SingleFlight",
+    "MetadataSnapshotCache",
+    "AffinityRouter",
+    "prefix_key",
+    "METRICS_CONTENT_TYPE",
+    "GatewayMetrics",
+    "MetricsMiddleware",
+    "ServerTiming",
+    "ServerTimingMiddleware",
+    "TraceRecorder",
+    "TraceStatusMiddleware",
+    "peek_json",
+    "CompressionMiddleware",
+    "EMBEDDING_OUTPUT_FIELDS",
+    "embedding_vectors",
+    "embeddings_to_base64",
+    "embeddings_to_binary",
+    "requested_embedding_output",
+    "EmbeddingStore",
+    "EmbeddingBatchFailed",
+    "EmbeddingPipeline",
+    "BATCH_ENDPOINTS",
+    "COMPLETION_WINDOWS",
+    "BatchInputError",
+    "BatchRunner",
+    "new_batch",
+    "parse_batch_input",
+    "ClientDisconnected",
+    "cancel_on_disconnect",
+    "AdmissionController",
+    "AdmissionRejected",
+    "DeadlineExpired",
+    "QueueFull",
+    "Ticket",
+]
@@ -0,0 +1,191 @@
+"""Admission control for gateway calls to GPU backends.
+
+Each backend (and diffusers GPU tier) gets a concurrency cap and a bounded
+FIFO wait queue. Requests beyond the queue are rejected immediately instead
+of piling up for the backend's full timeout, and queued requests are dropped
+once their deadline passes, before any GPU time is spent on them.
+"""
+
+import asyncio
+import contextlib
+import math
+from collections import deque
+from typing import AsyncIterator
+
+# Bounds for the Retry-After estimate, in seconds
+MIN_RETRY_AFTER = 1
+MAX_RETRY_AFTER = 120
+
+# Weight of the newest sample in the moving average of service time
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted; maps to an HTTP error with Retry-After."""
+
+    status_code = 503
+
+    def __init__(self, pool: str, message: str, retry_after: int):
+        super().__init__(message)
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class QueueFull(AdmissionRejected):
+    """The pool is at its concurrency cap and its wait queue is full."""
+
+    status_code = 429
+
+
+class DeadlineExpired(AdmissionRejected):
+    """The request's deadline passed before a slot became free."""
+
+    status_code = 503
+
+
+class Ticket:
+    """An admitted request's slot; release it exactly once when done."""
+
+    def __init__(self, controller: "AdmissionController", wait: float):
+        self.controller = controller
+        self.wait = wait
+        self._admitted_at = asyncio.get_running_loop().time()
+        self._released = False
+
+    def release(self) -> None:
+        """Free the slot (idempotent)."""
+        if self._released:
+            return
+        self._released = True
+        self.controller._release(asyncio.get_running_loop().time() - self._admitted_at)
+
+
+class AdmissionController:
+    """Concurrency cap plus bounded FIFO queue for one backend pool.
+
+    Used from the gateway's event loop only, so it needs no locking.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float | None = None):
+        """Initialize the controller.
+
+        Args:
+            name: Pool name used in errors and stats (e.g. "ollama")
+            max_concurrent: Requests allowed in flight at once
+            max_queue: Requests allowed to wait for a slot; more are rejected
+            max_wait: Longest a request waits without its own deadline
+                (None waits indefinitely)
+        """
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._service_time: float | None = None
+
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    @property
+    def queued(self) -> int:
+        """Requests currently waiting for a slot."""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a new request could be admitted."""
+        service = self._service_time or MIN_RETRY_AFTER
+        estimate = service * (self.queued + 1) / self.max_concurrent
+        return max(MIN_RETRY_AFTER, min(MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    async def acquire(self, deadline: float | None = None) -> Ticket:
+        """Wait for a slot.
+
+        Args:
+            deadline: Event-loop time (`loop.time()`) after which the request
+                is no longer wanted
+
+        Returns:
+            A Ticket holding the slot
+
+        Raises:
+            QueueFull: The wait queue is full
+            DeadlineExpired: The deadline (or `max_wait`) passed while queued
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if self.max_wait is not None:
+            deadline = min(deadline, now + self.max_wait) if deadline is not None else now + self.max_wait
+
+        if self.in_flight < self.max_concurrent and not self.queued:
+            self.in_flight += 1
+            return self._admit(0.0)
+        if deadline is not None and deadline <= now:
+            self.expired += 1
+            raise DeadlineExpired(self.name, f"{self.name}: deadline expired before admission", self.retry_after())
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(self.name, f"{self.name}: queue full ({self.max_queue} waiting)", self.retry_after())
+
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, None if deadline is None else deadline - now)
+        except asyncio.TimeoutError:
+            self.expired += 1
+            raise DeadlineExpired(self.name, f"{self.name}: deadline expired while queued", self.retry_after())
+        except asyncio.CancelledError:
+            # The slot may have been handed over just as the caller went away
+            if waiter.done() and not waiter.cancelled():
+                self._release(None)
+            raise
+        finally:
+            with contextlib.suppress(ValueError):
+                self._waiters.remove(waiter)
+        return self._admit(loop.time() - now)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, deadline: float | None = None) -> AsyncIterator[Ticket]:
+        """Hold a slot for the duration of an `async with` block."""
+        ticket = await self.acquire(deadline)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _admit(self, wait: float) -> Ticket:
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait_seen = max(self.max_wait_seen, wait)
+        return Ticket(self, wait)
+
+    def _release(self, service_time: float | None) -> None:
+        if service_time is not None:
+            if self._service_time is None:
+                self._service_time = service_time
+            else:
+                self._service_time += SERVICE_TIME_ALPHA * (service_time - self._service_time)
+        # Hand the slot straight to the oldest live waiter
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        """Queue depth, wait times and admission counters."""
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+            "max_wait_seconds": round(self.max_wait_seen, 4),
+        }
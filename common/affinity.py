@@ -0,0 +1,81 @@
+"""Prefix-affinity routing across Ollama backend replicas.
+
+Ollama keeps the KV cache of recent prompts, so a conversation whose turns
+land on the same container only evaluates the new tokens of each turn. The
+gateway hashes the conversation prefix (model, system prompt and first
+messages) to pick a stable replica, and falls back to the next replica in
+that conversation's rendezvous order when the preferred one is saturated.
+"""
+
+import hashlib
+import json
+
+# Paths carrying a conversation whose prompt prefix is worth keeping hot
+CHAT_PATHS = {"api/chat", "v1/chat/completions", "v1/messages"}
+
+# Leading messages that identify a conversation (later turns only append)
+PREFIX_MESSAGES = 2
+
+
+def prefix_key(path: str, body: dict | None) -> str | None:
+    """Return a stable key for a chat conversation, or None for other requests."""
+    if path not in CHAT_PATHS or not body:
+        return None
+    prefix = {
+        "model": body.get("model"),
+        "system": body.get("system"),
+        "messages": body.get("messages", [])[:PREFIX_MESSAGES],
+    }
+    return json.dumps(prefix, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _score(key: str, replica: int) -> int:
+    digest = hashlib.blake2b(f"{replica}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class AffinityRouter:
+    """Chooses a backend replica per request and tracks in-flight load.
+
+    Used from the gateway's event loop only, so it needs no locking.
+    """
+
+    def __init__(self, replicas: int, capacity: int):
+        """Initialize the router.
+
+        Args:
+            replicas: Number of backend replicas (parameterized instances)
+            capacity: In-flight requests a replica takes before overflowing
+        """
+        self.replicas = max(1, replicas)
+        self.capacity = capacity
+        self.in_flight = [0] * self.replicas
+
+    def preference(self, key: str | None) -> list[int]:
+        """Replica order for a key: rendezvous order, or 0..N-1 without a key.
+
+        Keyless requests pack onto the lowest replicas so idle ones stay
+        scaled to zero.
+        """
+        if key is None:
+            return list(range(self.replicas))
+        return sorted(range(self.replicas), key=lambda r: _score(key, r), reverse=True)
+
+    def choose(self, key: str | None) -> int:
+        """Return the first replica in preference order with spare capacity.
+
+        If every replica is saturated, the least loaded one is returned.
+        """
+        order = self.preference(key)
+        for replica in order:
+            if self.in_flight[replica] < self.capacity:
+                return replica
+        return min(order, key=lambda r: self.in_flight[r])
+
+    def acquire(self, replica: int) -> None:
+        """Record a request dispatched to `replica`."""
+        self.in_flight[replica] += 1
+
+    def release(self, replica: int) -> None:
+        """Record a request on `replica` finishing."""
+        self.in_flight[replica] -= 1
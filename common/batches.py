@@ -0,0 +1,269 @@
+"""OpenAI-style batch jobs: input validation and resumable execution.
+
+A batch input file is JSONL with one independent request per line:
+
+    {"custom_id": "task-1", "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+
+`BatchRunner` keeps a fixed number of requests in flight, so the backends
+stay fully occupied for the whole job. Each finished request is appended,
+as soon as it lands, to the output file (2xx responses) or the error file
+(everything else) in OpenAI's result line format. Those files are the job's
+progress. When a job restarts after a crash, requests whose `custom_id`
+already has a line are skipped.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable
+
+# Endpoints a batch may target; every request in a batch uses the batch's endpoint
+BATCH_ENDPOINTS = ("/v1/chat/completions", "/v1/completions", "/v1/embeddings")
+# Statuses after which a batch never changes again
+FINAL_STATUSES = {"failed", "completed", "expired", "cancelled"}
+# Attempts per request when the backend call raises (error responses are not retried)
+REQUEST_ATTEMPTS = 3
+# Completion windows a batch may ask for, in seconds; the job stops at the deadline
+COMPLETION_WINDOWS = {"24h": 24 * 60 * 60}
+
+# Last timestamp handed out by new_id, so IDs from one process never tie
+_last_id_ns = 0
+
+
+class BatchInputError(ValueError):
+    """A line of the input file is not a valid batch request."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+        self.reason = message
+
+
+def new_id(prefix: str) -> str:
+    """A fresh object ID such as 'batch_18a4...'.
+
+    The ID starts with its creation time in nanoseconds, as fixed-width hex,
+    so IDs with the same prefix sort in creation order. The random tail
+    keeps IDs from different containers unique.
+    """
+    global _last_id_ns
+    _last_id_ns = max(time.time_ns(), _last_id_ns + 1)
+    return f"{prefix}_{_last_id_ns:016x}{uuid.uuid4().hex[:16]}"
+
+
+def new_batch(input_file_id: str, endpoint: str, completion_window: str, metadata: dict | None) -> dict:
+    """A batch object in its initial 'validating' state, as OpenAI returns it.
+
+    `completion_window` must be a key of COMPLETION_WINDOWS.
+    """
+    created_at = int(time.time())
+    return {
+        "id": new_id("batch"),
+        "object": "batch",
+        "endpoint": endpoint,
+        "errors": None,
+        "input_file_id": input_file_id,
+        "completion_window": completion_window,
+        "status": "validating",
+        "output_file_id": None,
+        "error_file_id": None,
+        "created_at": created_at,
+        "in_progress_at": None,
+        "expires_at": created_at + COMPLETION_WINDOWS[completion_window],
+        "finalizing_at": None,
+        "completed_at": None,
+        "failed_at": None,
+        "expired_at": None,
+        "cancelling_at": None,
+        "cancelled_at": None,
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "metadata": metadata,
+    }
+
+
+def parse_batch_input(data: bytes, endpoint: str) -> list[dict]:
+    """Parse and validate a batch input file.
+
+    Args:
+        data: The JSONL file contents
+        endpoint: The batch's endpoint, which every request must target
+
+    Returns:
+        The requests, in file order
+
+    Raises:
+        BatchInputError: At the first invalid line, or if there are no requests
+    """
+    requests = []
+    seen: set[str] = set()
+    for number, line in enumerate(data.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError:
+            raise BatchInputError(number, "not valid JSON") from None
+        if not isinstance(request, dict):
+            raise BatchInputError(number, "must be a JSON object")
+        custom_id = request.get("custom_id")
+        if not isinstance(custom_id, str) or not custom_id:
+            raise BatchInputError(number, "custom_id must be a non-empty string")
+        if custom_id in seen:
+            raise BatchInputError(number, f"duplicate custom_id {custom_id!r}")
+        if request.get("method", "POST") != "POST":
+            raise BatchInputError(number, "method must be POST")
+        if request.get("url") != endpoint:
+            raise BatchInputError(number, f"url must be the batch endpoint {endpoint}")
+        if not isinstance(request.get("body"), dict):
+            raise BatchInputError(number, "body must be a JSON object")
+        seen.add(custom_id)
+        requests.append(request)
+    if not requests:
+        raise BatchInputError(0, "the file has no requests")
+    return requests
+
+
+def _result_line(custom_id: str, response: dict | None, error: dict | None) -> str:
+    line = {"id": new_id("batch_req"), "custom_id": custom_id, "response": response, "error": error}
+    return json.dumps(line, separators=(",", ":")) + "\n"
+
+
+def _recover(path: str) -> set[str]:
+    """Return the custom_ids already written to `path`.
+
+    A last line cut short by a crash is truncated away, so new lines are
+    appended after the last complete one.
+    """
+    done = set()
+    complete = 0
+    try:
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                done.add(json.loads(line)["custom_id"])
+                complete += len(line)
+    except FileNotFoundError:
+        return done
+    if os.path.getsize(path) != complete:
+        os.truncate(path, complete)
+    return done
+
+
+class BatchRunner:
+    """Runs one batch's requests, appending each result to the job's files."""
+
+    def __init__(self, output_path: str, error_path: str, concurrency: int):
+        """Initialize the runner.
+
+        Args:
+            output_path: JSONL file receiving 2xx results
+            error_path: JSONL file receiving error responses and failed calls
+            concurrency: Requests in flight at once
+        """
+        self.output_path = output_path
+        self.error_path = error_path
+        self.concurrency = max(1, concurrency)
+        self.counts = {"total": 0, "completed": 0, "failed": 0}
+
+    async def run(
+        self,
+        requests: list[dict],
+        call: Callable[[dict], Awaitable[tuple[int, Any]]],
+        checkpoint: Callable[[dict], Awaitable[bool]],
+        checkpoint_seconds: float,
+    ) -> bool:
+        """Run the requests that an earlier attempt did not finish.
+
+        Args:
+            requests: Parsed batch requests
+            call: Sends one request; returns its status code and response body
+            checkpoint: Called with the request counts at the start, every
+                `checkpoint_seconds` and once at the end, after the files are
+                flushed; returns True to cancel the rest of the batch
+            checkpoint_seconds: Interval between checkpoints
+
+        Returns:
+            True if every request finished, False if the batch was cancelled
+            (requests still in flight are cancelled and get no line)
+        """
+        completed = _recover(self.output_path)
+        failed = _recover(self.error_path) - completed
+        self.counts = {"total": len(requests), "completed": len(completed), "failed": len(failed)}
+        pending = iter([r for r in requests if r["custom_id"] not in completed and r["custom_id"] not in failed])
+        cancelled = False
+
+        with open(self.output_path, "a") as output, open(self.error_path, "a") as errors:
+
+            async def send(request: dict) -> None:
+                for attempt in range(REQUEST_ATTEMPTS):
+                    try:
+                        status_code, body = await call(request)
+                        break
+                    except Exception as e:
+                        if attempt == REQUEST_ATTEMPTS - 1:
+                            error = {"code": "backend_error", "message": str(e) or type(e).__name__}
+                            errors.write(_result_line(request["custom_id"], None, error))
+                            self.counts["failed"] += 1
+                            return
+                        await asyncio.sleep(2**attempt)
+                response = {"status_code": status_code, "request_id": uuid.uuid4().hex, "body": body}
+                if 200 <= status_code < 300:
+                    output.write(_result_line(request["custom_id"], response, None))
+                    self.counts["completed"] += 1
+                else:
+                    errors.write(_result_line(request["custom_id"], response, None))
+                    self.counts["failed"] += 1
+
+            async def workers() -> None:
+                async def worker() -> None:
+                    # One shared iterator: each request is taken by exactly one worker
+                    for request in pending:
+                        await send(request)
+
+                async with asyncio.TaskGroup() as group:
+                    for _ in range(self.concurrency):
+                        group.create_task(worker())
+
+            async def save() -> bool:
+                output.flush()
+                errors.flush()
+                return await checkpoint(dict(self.counts))
+
+            async def checkpoints(work: asyncio.Future) -> None:
+                nonlocal cancelled
+                while True:
+                    await asyncio.sleep(checkpoint_seconds)
+                    if await save():
+                        cancelled = True
+                        work.cancel()
+                        return
+
+            if await save():
+                return False
+            work = asyncio.ensure_future(workers())
+            ticker = asyncio.ensure_future(checkpoints(work))
+            try:
+                await asyncio.wait((work,))
+            finally:
+                ticker.cancel()
+                work.cancel()
+            if not cancelled:
+                try:
+                    work.result()
+                except BaseExceptionGroup as failed:
+                    raise failed.exceptions[0] from None
+            await save()
+        return not cancelled
+
+    def expire(self, requests: list[dict]) -> None:
+        """Write a `batch_expired` error line for every request without a result."""
+        done = _recover(self.output_path) | _recover(self.error_path)
+        error = {"code": "batch_expired", "message": "This request could not be executed before the completion window expired."}
+        with open(self.error_path, "a") as errors:
+            for request in requests:
+                if request["custom_id"] not in done:
+                    errors.write(_result_line(request["custom_id"], None, error))
+                    self.counts["failed"] += 1
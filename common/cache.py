@@ -0,0 +1,117 @@
+"""Gateway response cache for deterministic non-streaming completions.
+
+Repeated evals, CI prompts and temperature-0 classification calls produce the
+same output every time. Caching them in the gateway answers repeats without
+waking a GPU container.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+def is_deterministic(body: dict | None) -> bool:
+    """Check if a request samples deterministically (temperature 0 or a fixed seed).
+
+    Handles OpenAI/Anthropic top-level fields and Ollama's native `options`.
+    """
+    if not body or body.get("stream", False) is True:
+        return False
+    options = body.get("options") if isinstance(body.get("options"), dict) else {}
+    for params in (body, options):
+        if params.get("seed") is not None:
+            return True
+        if params.get("temperature") == 0:
+            return True
+    return False
+
+
+def request_key(method: str, path: str, body: dict | bytes | None) -> str:
+    """Return a cache key for the canonicalized request.
+
+    A raw (undecoded) body is hashed as-is, so only byte-identical requests
+    share a key.
+    """
+    if isinstance(body, bytes):
+        digest = hashlib.sha256(f"{method} {path}\n".encode())
+        digest.update(body)
+        return digest.hexdigest()
+    canonical = json.dumps(
+        {"method": method, "path": path, "body": body},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass
+class CachedResponse:
+    """A cached response body and its metadata."""
+
+    content: bytes
+    status_code: int
+    media_type: str
+    stored_at: float
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU response cache bounded by total body bytes, with per-entry TTL.
+
+    Only used from the gateway's event loop, so it needs no locking.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        """Initialize the cache.
+
+        Args:
+            max_bytes: Budget for the sum of cached body sizes
+            ttl_seconds: How long an entry stays valid
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> CachedResponse | None:
+        """Return a fresh entry for `key` and mark it recently used."""
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, content: bytes, status_code: int = 200, media_type: str = "application/json") -> None:
+        """Store a response, evicting least recently used entries over budget."""
+        if len(content) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        now = time.monotonic()
+        self._entries[key] = CachedResponse(content, status_code, media_type, now, now + self.ttl_seconds)
+        self._bytes += len(content)
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        self._bytes -= len(self._entries.pop(key).content)
+
+    def stats(self) -> dict:
+        """Return entry count, size and hit/miss counters."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
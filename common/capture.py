@@ -0,0 +1,144 @@
+"""Opt-in capture of gateway traffic shape for replay.
+
+Each request is appended to a JSONL trace with its arrival time, method,
+path, body size, model, stream flag, message count, token estimate and
+response status, plus a redacted copy of the body. Redaction replaces every free-text string with
+a placeholder of the same length. Identical texts get identical
+placeholders, so repeated system prompts and conversation history still
+look repeated on replay, which keeps caching and prefix routing behaviour
+realistic without storing any prompt text.
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import time
+from typing import Any
+
+from common.embeddings import EMBEDDING_OUTPUT_FIELDS
+from common.tokens import estimate_tokens
+
+# Body fields kept verbatim: identifiers and enums, never free text
+STRUCTURAL_KEYS = {
+    "model", "model_id", "role", "type", "format", "keep_alive", "media_type", "tool_choice",
+    *EMBEDDING_OUTPUT_FIELDS,
+}
+# Top-level fields naming a model (e.g. api/show's `name`); a nested `name`
+# (such as a message author's) is still redacted
+TOP_LEVEL_STRUCTURAL_KEYS = {"name"}
+
+
+class TraceRecorder:
+    """Appends one JSON line per request to a trace file.
+
+    Used from the gateway's event loop only; the file is line-buffered so
+    each record is a single small write.
+    """
+
+    def __init__(self, directory: str):
+        """Open a new trace file in `directory` (one file per gateway container).
+
+        Args:
+            directory: Where trace files are written (e.g. a mounted Volume)
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = time.strftime("trace-%Y%m%d-%H%M%S", time.gmtime()) + f"-{os.getpid()}.jsonl"
+        self.path = os.path.join(directory, name)
+        self._file = open(self.path, "a", buffering=1)
+        # Per-trace key, so placeholders cannot be matched against guessed prompts
+        self._key = secrets.token_bytes(16)
+        self._started = time.monotonic()
+        self.records = 0
+
+    def placeholder(self, text: str) -> str:
+        """Length-preserving stand-in for `text`, stable within this trace."""
+        if not text:
+            return text
+        digest = hashlib.blake2b(text.encode(), key=self._key, digest_size=8).hexdigest()
+        return (digest * (len(text) // len(digest) + 1))[: len(text)]
+
+    def redact(self, value: Any, key: str | None = None) -> Any:
+        """Copy `value` with every free-text string replaced by a placeholder."""
+        if isinstance(value, dict):
+            return {k: self.redact(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.redact(item, key) for item in value]
+        if isinstance(value, str) and key not in STRUCTURAL_KEYS:
+            return self.placeholder(value)
+        return value
+
+    def start(self, method: str, path: str, body: dict | None, body_bytes: int) -> dict:
+        """Take one request's shape on arrival; `finish` writes it.
+
+        Args:
+            method: HTTP method
+            path: Gateway path (e.g. '/ollama/api/chat')
+            body: Parsed JSON body, if any
+            body_bytes: Size of the raw request body
+
+        Returns:
+            The trace entry, without its response status
+        """
+        body = body if isinstance(body, dict) else None
+        redacted = None
+        if body is not None:
+            redacted = {
+                k: v if k in TOP_LEVEL_STRUCTURAL_KEYS and isinstance(v, str) else self.redact(v, k)
+                for k, v in body.items()
+            }
+        return {
+            "t": round(time.monotonic() - self._started, 4),
+            "ts": round(time.time(), 3),
+            "method": method,
+            "path": path,
+            "bytes": body_bytes,
+            "model": body.get("model") or body.get("model_id") if body else None,
+            "stream": bool(body and body.get("stream") is True),
+            "messages": len(body.get("messages") or []) if body else 0,
+            "tokens": estimate_tokens(body) if body else 0,
+            "body": redacted,
+        }
+
+    def finish(self, entry: dict, status: int) -> None:
+        """Append an entry from `start` with its response status."""
+        self._file.write(json.dumps({**entry, "status": status}, separators=(",", ":")) + "\n")
+        self.records += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class TraceStatusMiddleware:
+    """Writes a captured request's trace entry once its response status is known.
+
+    Handlers that capture a request leave `trace_finish(status)` in the
+    request state. A handler that raises is recorded as a 500.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        finished = False
+
+        def finish(status: int) -> None:
+            nonlocal finished
+            trace_finish = scope.get("state", {}).get("trace_finish")
+            if trace_finish is not None and not finished:
+                finished = True
+                trace_finish(status)
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                finish(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        except Exception:
+            finish(500)
+            raise
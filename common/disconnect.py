@@ -0,0 +1,58 @@
+"""Client disconnect detection for gateway handlers.
+
+A handler awaiting a backend call never reads from the connection again,
+so on its own it would not notice the client going away, and the backend
+would keep generating a response nobody reads. `cancel_on_disconnect`
+watches the ASGI receive channel while the call runs and cancels the call
+as soon as the client disconnects.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before its response was ready."""
+
+
+async def wait_for_disconnect(receive: Callable[[], Awaitable[dict]]) -> None:
+    """Return once the ASGI receive channel reports `http.disconnect`.
+
+    Only use after the request body has been read: body messages are
+    discarded.
+    """
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(receive: Callable[[], Awaitable[dict]], awaitable: Awaitable[T]) -> T:
+    """Await `awaitable`, cancelling it if the client disconnects first.
+
+    Args:
+        receive: The request's ASGI receive callable (`request.receive`)
+        awaitable: The work producing the response (e.g. a backend call)
+
+    Returns:
+        The result of `awaitable`
+
+    Raises:
+        ClientDisconnected: The client went away; `awaitable` was cancelled
+            and its cleanup has run
+    """
+    work = asyncio.ensure_future(awaitable)
+    watcher = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await asyncio.wait((work, watcher), return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        work.cancel()
+        watcher.cancel()
+        raise
+    watcher.cancel()
+    if work.done():
+        return work.result()
+    work.cancel()
+    # Let the work's own cleanup (e.g. cancelling a backend call) finish first
+    await asyncio.wait((work,))
+    raise ClientDisconnected()
@@ -0,0 +1,120 @@
+"""Batched, deduplicated embedding of large input lists.
+
+A single embedding call with thousands of inputs runs on one container and
+can outlive its timeout. The pipeline instead:
+
+1. drops duplicate texts (each unique text is embedded once)
+2. looks the rest up in an optional `EmbeddingStore`, so unchanged texts
+   are never embedded again
+3. splits what is left into micro-batches of `batch_size` texts and runs up
+   to `concurrency` of them at once, so they spread across containers
+4. returns one vector per input, in input order
+
+The caller supplies the function that embeds one batch, so admission
+control, replica routing and metrics stay with the gateway.
+"""
+
+import asyncio
+from typing import Awaitable, Callable
+
+from common.embedding_store import EmbeddingStore
+
+# Duration and count fields summed over batches (as Ollama names them)
+SUMMED_FIELDS = ("total_duration", "load_duration", "prompt_eval_count")
+
+
+class EmbeddingBatchFailed(Exception):
+    """A batch came back with a non-200 response; carries that response."""
+
+    def __init__(self, status_code: int, body):
+        super().__init__(f"embedding batch failed with status {status_code}")
+        self.status_code = status_code
+        self.body = body
+
+
+class EmbeddingPipeline:
+    """Splits, deduplicates, caches and fans out embedding requests."""
+
+    def __init__(self, batch_size: int, concurrency: int, store: EmbeddingStore | None = None):
+        """Initialize the pipeline.
+
+        Args:
+            batch_size: Texts per backend call (0: one call for all texts)
+            concurrency: Batches of one request in flight at once
+            store: Persistent cache of vectors by content hash (None disables)
+        """
+        self.batch_size = max(0, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.store = store
+
+    def applies_to(self, texts) -> bool:
+        """Check if an `input` value should go through the pipeline.
+
+        Only lists of strings are handled (not token arrays); lists no
+        larger than one batch are left alone unless the store could answer
+        them.
+        """
+        if isinstance(texts, str):
+            return self.store is not None
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) for t in texts):
+            return False
+        return self.store is not None or 0 < self.batch_size < len(texts)
+
+    async def embed(
+        self,
+        namespace: dict,
+        texts: list[str],
+        call_batch: Callable[[list[str]], Awaitable[dict]],
+    ) -> tuple[list[list[float]], dict]:
+        """Embed `texts`, returning vectors in input order and run statistics.
+
+        Args:
+            namespace: What makes vectors interchangeable in the store
+                (model and output-changing options)
+            texts: Input texts, duplicates allowed
+            call_batch: Embeds a list of texts; returns a dict with
+                'embeddings' (one vector per text, in order) and optionally
+                SUMMED_FIELDS. Raises EmbeddingBatchFailed on a backend error.
+
+        Returns:
+            The vectors, and a dict with 'inputs', 'unique', 'cached' and
+            'batches' counts plus SUMMED_FIELDS totals
+
+        Raises:
+            EmbeddingBatchFailed or the first exception a batch raised;
+            remaining batches are cancelled.
+        """
+        unique = list(dict.fromkeys(texts))
+        vectors: dict[str, list[float]] = {}
+        if self.store is not None:
+            stored = await asyncio.to_thread(self.store.get_many, namespace, unique)
+            vectors.update((text, v) for text, v in zip(unique, stored) if v is not None)
+        cached = len(vectors)
+
+        missing = [text for text in unique if text not in vectors]
+        size = self.batch_size or len(missing) or 1
+        batches = [missing[i:i + size] for i in range(0, len(missing), size)]
+        stats = {"inputs": len(texts), "unique": len(unique), "cached": cached, "batches": len(batches)}
+        stats.update(dict.fromkeys(SUMMED_FIELDS, 0))
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: list[str]) -> None:
+            async with limit:
+                result = await call_batch(batch)
+            embeddings = result["embeddings"]
+            if len(embeddings) != len(batch):
+                raise EmbeddingBatchFailed(502, {"error": f"expected {len(batch)} embeddings, got {len(embeddings)}"})
+            vectors.update(zip(batch, embeddings))
+            for field in SUMMED_FIELDS:
+                stats[field] += result.get(field) or 0
+            if self.store is not None:
+                # Stored as each batch lands, so a failed run keeps its progress
+                await asyncio.to_thread(self.store.put_many, namespace, batch, embeddings)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for batch in batches:
+                    group.create_task(run(batch))
+        except BaseExceptionGroup as failed:
+            raise failed.exceptions[0] from None
+        return [vectors[text] for text in texts], stats
@@ -0,0 +1,184 @@
+"""Content-hash-keyed embedding cache in compact append-only files.
+
+Vectors are stored as raw little-endian float32 rows, 4 bytes per
+dimension, next to a file of 16-byte content hashes with one hash per row.
+A namespace groups vectors that are interchangeable: same model and same
+options that change the output (`dimensions`, `truncate`, `options`).
+Each namespace is a directory. Each gateway container appends to its own
+segment, so containers sharing the directory (e.g. a Modal Volume) never
+write the same file, and all segments are indexed when a namespace is
+first used.
+
+Only the hash index (about 60 bytes per vector) is held in memory; rows are
+read from disk on a hit.
+"""
+
+import glob
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+
+KEY_BYTES = 16
+
+
+def content_key(text: str) -> bytes:
+    """Hash identifying an input text."""
+    return hashlib.blake2b(text.encode(), digest_size=KEY_BYTES).digest()
+
+
+def _pack(vectors: list[list[float]]) -> bytes:
+    packed = array("f", itertools.chain.from_iterable(vectors))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data: bytes) -> list[float]:
+    values = array("f", data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+class _Namespace:
+    """Index and segment files of one namespace directory."""
+
+    def __init__(self, path: str, description: dict):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        meta_path = os.path.join(path, "meta.json")
+        try:
+            with open(meta_path) as f:
+                self.dim: int | None = json.load(f)["dim"]
+        except (OSError, ValueError, KeyError):
+            self.dim = None
+        self._meta_path = meta_path
+        self._description = description
+        # content hash -> (segment file, row)
+        self.index: dict[bytes, tuple[str, int]] = {}
+        self._segment: str | None = None
+        self._rows = 0
+        if self.dim:
+            for keys_path in sorted(glob.glob(os.path.join(path, "*.keys"))):
+                self._load_segment(keys_path[: -len(".keys")])
+
+    def _load_segment(self, segment: str) -> None:
+        with open(segment + ".keys", "rb") as f:
+            keys = f.read()
+        try:
+            complete = os.path.getsize(segment + ".f32") // (4 * self.dim)
+        except OSError:
+            return
+        # A row whose write was cut short by a crash has no complete hash or vector
+        rows = min(len(keys) // KEY_BYTES, complete)
+        for row in range(rows):
+            self.index[keys[row * KEY_BYTES:(row + 1) * KEY_BYTES]] = (segment, row)
+
+    def read(self, locations: list[tuple[str, int]]) -> list[list[float]]:
+        row_bytes = 4 * self.dim
+        vectors = []
+        files: dict[str, int] = {}
+        try:
+            for segment, row in locations:
+                fd = files.get(segment)
+                if fd is None:
+                    fd = files[segment] = os.open(segment + ".f32", os.O_RDONLY)
+                vectors.append(_unpack(os.pread(fd, row_bytes, row * row_bytes)))
+        finally:
+            for fd in files.values():
+                os.close(fd)
+        return vectors
+
+    def append(self, keys: list[bytes], vectors: list[list[float]]) -> None:
+        if self.dim is None:
+            self.dim = len(vectors[0])
+            with open(self._meta_path, "w") as f:
+                json.dump({**self._description, "dim": self.dim}, f)
+        if self._segment is None:
+            name = time.strftime("seg-%Y%m%d-%H%M%S", time.gmtime()) + f"-{os.getpid()}"
+            self._segment = os.path.join(self.path, name)
+        # Vectors first: a hash is only valid once its row is fully written
+        with open(self._segment + ".f32", "ab") as f:
+            f.write(_pack(vectors))
+        with open(self._segment + ".keys", "ab") as f:
+            f.write(b"".join(keys))
+        for offset, key in enumerate(keys):
+            self.index[key] = (self._segment, self._rows + offset)
+        self._rows += len(keys)
+
+
+class EmbeddingStore:
+    """Persistent embedding cache keyed by content hash.
+
+    Methods do file I/O and are meant to run on a worker thread
+    (`asyncio.to_thread`); a lock serializes them.
+    """
+
+    def __init__(self, directory: str):
+        """Initialize the store; nothing is read or written until first use.
+
+        Args:
+            directory: Root directory (e.g. a mounted Volume)
+        """
+        self.directory = directory
+        self._namespaces: dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def _namespace(self, namespace: dict) -> _Namespace:
+        canonical = json.dumps(namespace, sort_keys=True, separators=(",", ":"))
+        ns = self._namespaces.get(canonical)
+        if ns is None:
+            digest = hashlib.blake2b(canonical.encode(), digest_size=8).hexdigest()
+            model = "".join(c if c.isalnum() or c in "-._" else "_" for c in str(namespace.get("model", "")))
+            ns = self._namespaces[canonical] = _Namespace(
+                os.path.join(self.directory, f"{model}-{digest}"), namespace
+            )
+        return ns
+
+    def get_many(self, namespace: dict, texts: list[str]) -> list[list[float] | None]:
+        """Return the stored vector for each text, or None where it is missing."""
+        with self._lock:
+            ns = self._namespace(namespace)
+            locations = [ns.index.get(content_key(text)) for text in texts]
+            found = [loc for loc in locations if loc is not None]
+            vectors = iter(ns.read(found)) if found else iter(())
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+            return [next(vectors) if loc is not None else None for loc in locations]
+
+    def put_many(self, namespace: dict, texts: list[str], vectors: list[list[float]]) -> None:
+        """Store vectors for texts not stored yet.
+
+        Vectors whose length differs from the namespace's are skipped.
+        """
+        with self._lock:
+            ns = self._namespace(namespace)
+            new_keys, new_vectors = [], []
+            for text, vector in zip(texts, vectors):
+                key = content_key(text)
+                if key in ns.index or (ns.dim is not None and len(vector) != ns.dim):
+                    continue
+                if new_vectors and len(vector) != len(new_vectors[0]):
+                    continue
+                new_keys.append(key)
+                new_vectors.append(vector)
+            if new_keys:
+                ns.append(new_keys, new_vectors)
+                self.stored += len(new_keys)
+
+    def stats(self) -> dict:
+        """Return vector count and hit/miss counters."""
+        return {
+            "vectors": sum(len(ns.index) for ns in self._namespaces.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+        }
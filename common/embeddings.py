@@ -0,0 +1,130 @@
+"""Compact encodings for embedding responses.
+
+Ollama returns embeddings as JSON float lists, about 10 bytes of text per
+float32. Through the gateway a client can ask for:
+
+- `encoding_format: "base64"` (as in the OpenAI API): each vector becomes a
+  base64 string of little-endian floats
+- `Accept: application/octet-stream`: the body is the raw row-major matrix
+  (NumPy layout), described by `X-Embedding-Shape` and `X-Embedding-Dtype`
+  headers
+
+Either can use `embedding_dtype: "float16"` to halve the size again. Floats
+are packed with one `array`/`struct` call per response rather than a Python
+loop per element.
+"""
+
+import base64
+import itertools
+import math
+import struct
+import sys
+from array import array
+
+OCTET_STREAM = "application/octet-stream"
+
+# Byte order of the packed floats, as NumPy spells it (e.g. '<f4')
+DTYPES = {"float32": "<f4", "float16": "<f2"}
+
+# Smallest magnitude that rounds past float16's largest finite value (65504)
+FLOAT16_OVERFLOW = 65520.0
+
+# Request fields consumed by the gateway, never forwarded to Ollama
+EMBEDDING_OUTPUT_FIELDS = ("encoding_format", "embedding_dtype")
+
+
+def requested_embedding_output(body: dict | None, accept: str) -> tuple[str, str] | None:
+    """Return the (format, dtype) a client asked for, or None for JSON floats.
+
+    Args:
+        body: Parsed request body
+        accept: The request's Accept header
+
+    Returns:
+        ('base64' or 'binary', 'float32' or 'float16'), or None when the
+        request wants Ollama's float lists unchanged
+
+    Raises:
+        ValueError: For an unknown encoding_format or embedding_dtype
+    """
+    body = body or {}
+    encoding_format = body.get("encoding_format", "float")
+    dtype = body.get("embedding_dtype", "float32")
+    if encoding_format not in ("float", "base64"):
+        raise ValueError(f"encoding_format must be 'float' or 'base64', not {encoding_format!r}")
+    if dtype not in DTYPES:
+        raise ValueError(f"embedding_dtype must be one of {sorted(DTYPES)}, not {dtype!r}")
+    if OCTET_STREAM in accept:
+        return "binary", dtype
+    if encoding_format == "base64":
+        return "base64", dtype
+    if "embedding_dtype" in body:
+        raise ValueError("embedding_dtype needs encoding_format 'base64' or Accept: application/octet-stream")
+    return None
+
+
+def embedding_vectors(body: dict) -> list[list[float]]:
+    """Vectors of a native (/api/embed, /api/embeddings) or OpenAI (/v1/embeddings) response."""
+    if "data" in body:
+        return [item["embedding"] for item in body["data"]]
+    if "embeddings" in body:
+        return body["embeddings"]
+    return [body["embedding"]]
+
+
+def pack(vectors: list[list[float]], dtype: str = "float32") -> tuple[bytes, tuple[int, int]]:
+    """Pack equal-length vectors into a little-endian row-major matrix.
+
+    Values too large for the dtype become infinities of the same sign, as
+    NumPy's `astype` gives.
+
+    Returns:
+        The packed bytes and the (rows, dimensions) shape
+
+    Raises:
+        ValueError: If the vectors differ in length
+    """
+    rows = len(vectors)
+    dim = len(vectors[0]) if vectors else 0
+    if any(len(vector) != dim for vector in vectors):
+        raise ValueError("embeddings differ in length")
+    flat = itertools.chain.from_iterable(vectors)
+    if dtype == "float16":
+        try:
+            return struct.pack(f"<{rows * dim}e", *flat), (rows, dim)
+        except OverflowError:
+            # Rare, so only then pay for a pass over every value
+            flat = (
+                math.copysign(math.inf, x) if abs(x) >= FLOAT16_OVERFLOW else x
+                for x in itertools.chain.from_iterable(vectors)
+            )
+            return struct.pack(f"<{rows * dim}e", *flat), (rows, dim)
+    packed = array("f", flat)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes(), (rows, dim)
+
+
+def embeddings_to_base64(body: dict, dtype: str = "float32") -> dict:
+    """Copy an embedding response with each vector replaced by a base64 string."""
+    vectors = embedding_vectors(body)
+    packed, (rows, dim) = pack(vectors, dtype)
+    row_bytes = len(packed) // rows if rows else 0
+    encoded = [base64.b64encode(packed[i * row_bytes:(i + 1) * row_bytes]).decode() for i in range(rows)]
+    if "data" in body:
+        return {**body, "data": [{**item, "embedding": e} for item, e in zip(body["data"], encoded)]}
+    if "embeddings" in body:
+        return {**body, "embeddings": encoded}
+    return {**body, "embedding": encoded[0]}
+
+
+def embeddings_to_binary(body: dict, dtype: str = "float32") -> tuple[bytes, dict[str, str]]:
+    """Raw matrix bytes of an embedding response, and headers describing them."""
+    packed, (rows, dim) = pack(embedding_vectors(body), dtype)
+    headers = {
+        "X-Embedding-Shape": f"{rows},{dim}",
+        "X-Embedding-Dtype": DTYPES[dtype],
+    }
+    if body.get("model"):
+        headers["X-Embedding-Model"] = body["model"]
+    return packed, headers
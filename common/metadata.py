@@ -0,0 +1,49 @@
+"""Gateway-side cache of the model metadata snapshot published by backends.
+
+Clients poll model listings often; answering them from a snapshot keeps the
+poll from cold-starting a GPU container. The snapshot is re-read in the
+background once it is older than the refresh interval (stale-while-revalidate).
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+
+class MetadataSnapshotCache:
+    """Holds the latest snapshot and refreshes it in the background."""
+
+    def __init__(self, load: Callable[[], Awaitable[dict | None]], refresh_seconds: float):
+        """Initialize the cache.
+
+        Args:
+            load: Coroutine function returning the stored snapshot (or None)
+            refresh_seconds: Age after which the snapshot is re-read
+        """
+        self._load = load
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: dict | None = None
+        self._loaded_at: float | None = None
+        self._refresh_task: asyncio.Task | None = None
+
+    async def get(self) -> dict | None:
+        """Return the current snapshot, or None if no backend has published one.
+
+        The first call waits for the load; later calls return immediately and
+        trigger a background refresh when the snapshot is stale.
+        """
+        stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+        if stale and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.create_task(self._refresh())
+        if self._loaded_at is None:
+            await asyncio.shield(self._refresh_task)
+        return self._snapshot
+
+    async def _refresh(self) -> None:
+        try:
+            snapshot = await self._load()
+            if snapshot is not None:
+                self._snapshot = snapshot
+        except Exception as e:
+            print(f"Failed to load metadata snapshot: {e}")
+        self._loaded_at = time.monotonic()
@@ -0,0 +1,257 @@
+"""Prometheus-style metrics for the gateway.
+
+Minimal counters, gauges and histograms rendered in the Prometheus text
+exposition format, plus a pure ASGI middleware recording per-route latency,
+time to first byte, bytes in/out, errors and in-flight requests.
+
+Everything is updated from the gateway's event loop, so the request path
+takes no locks: a series is a preallocated list of bucket counts, and an
+observation is a bisect and two additions.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+# Seconds: 5 ms up to the 30-minute backend timeout
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800,
+)
+
+# Bytes: 100 B up to 64 MB (images, long streams)
+SIZE_BUCKETS = tuple(100 * 4**i for i in range(11))
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    # Empty label values are omitted, as Prometheus treats them as absent
+    pairs = [
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values) if value
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    """Monotonic counter per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Add `amount` to the series for `labels`."""
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that goes up and down per label set."""
+
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        """Subtract `amount` from the series for `labels`."""
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, *labels: str, value: float) -> None:
+        """Set the series for `labels` to `value`."""
+        self._values[labels] = value
+
+
+class _Series:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram per label set."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], _Series] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record one observation for `labels`."""
+        series = self._series.get(labels)
+        if series is None:
+            # One extra slot for +Inf
+            series = self._series[labels] = _Series(len(self.buckets) + 1)
+        series.counts[bisect_left(self.buckets, value)] += 1
+        series.sum += value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics plus callbacks that refresh gauges at scrape time."""
+
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class GatewayMetrics:
+    """The gateway's request metrics, labelled by route and (optionally) model."""
+
+    LABELS = ("route", "model")
+
+    def __init__(self, registry: MetricsRegistry | None = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.request_seconds = r.histogram(
+            "gateway_request_duration_seconds", "Time from request start to last response byte", self.LABELS
+        )
+        self.backend_seconds = r.histogram(
+            "gateway_backend_call_duration_seconds", "Time spent awaiting a backend .remote() call", self.LABELS
+        )
+        self.first_byte_seconds = r.histogram(
+            "gateway_stream_first_byte_seconds", "Time to the first body byte of a streamed response", self.LABELS
+        )
+        self.request_bytes = r.histogram(
+            "gateway_request_size_bytes", "Request body size", self.LABELS, SIZE_BUCKETS
+        )
+        self.response_bytes = r.histogram(
+            "gateway_response_size_bytes", "Response body size", self.LABELS, SIZE_BUCKETS
+        )
+        self.requests = r.counter("gateway_requests_total", "Requests by status code", self.LABELS + ("status",))
+        self.errors = r.counter(
+            "gateway_request_errors_total", "Requests answered with an error status or failed", self.LABELS + ("status",)
+        )
+        self.in_flight = r.gauge("gateway_requests_in_flight", "Requests currently being served", ("route",))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware feeding GatewayMetrics.
+
+    Handlers may set `request.state.metrics_model` to label a request with
+    its model (e.g. the diffusers model_id).
+    """
+
+    def __init__(self, app, metrics: GatewayMetrics, route_label: Callable[[str], str]):
+        """Initialize the middleware.
+
+        Args:
+            app: The ASGI app to wrap
+            metrics: Metrics to record into
+            route_label: Maps a request path to a bounded route label
+        """
+        self.app = app
+        self.metrics = metrics
+        self.route_label = route_label
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        route = self.route_label(scope["path"])
+        state = scope.setdefault("state", {})
+        started = time.perf_counter()
+        bytes_in = 0
+        bytes_out = 0
+        status = 500
+        streamed = False
+        first_byte: float | None = None
+
+        async def receive_counted():
+            nonlocal bytes_in
+            message = await receive()
+            if message["type"] == "http.request":
+                bytes_in += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal bytes_out, status, streamed, first_byte
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streamed = not any(name == b"content-length" for name, _ in message.get("headers", ()))
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                if body and first_byte is None:
+                    first_byte = time.perf_counter() - started
+                bytes_out += len(body)
+            await send(message)
+
+        metrics.in_flight.inc(route)
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            metrics.in_flight.dec(route)
+            labels = (route, state.get("metrics_model", ""))
+            metrics.request_seconds.observe(time.perf_counter() - started, *labels)
+            metrics.request_bytes.observe(bytes_in, *labels)
+            metrics.response_bytes.observe(bytes_out, *labels)
+            if streamed and first_byte is not None:
+                metrics.first_byte_seconds.observe(first_byte, *labels)
+            metrics.requests.inc(*labels, str(status))
+            if status >= 400:
+                metrics.errors.inc(*labels, str(status))
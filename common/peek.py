@@ -0,0 +1,149 @@
+"""Partial JSON parsing for raw request passthrough.
+
+The gateway only needs a handful of top-level fields (`stream`, `model`,
+sampling options, the first chat messages) to route a request. `peek_json`
+walks the top-level object and decodes just those values. Other values are
+skipped by scanning for the quotes and brackets that delimit them, so a
+multi-megabyte message history is never decoded into Python objects.
+"""
+
+import json
+import re
+from typing import Iterable
+
+# Runs of bytes that cannot open or close a string or container
+_PLAIN = re.compile(rb'[^"\[\]{}]*')
+_LITERAL = re.compile(rb"[^\s,\]}]+")
+_WHITESPACE = re.compile(rb"\s*")
+_COLON = re.compile(rb"\s*:\s*")
+_BACKSLASH = 0x5C
+
+
+def _skip_ws(raw: bytes, pos: int) -> int:
+    return _WHITESPACE.match(raw, pos).end()
+
+
+def _string_end(raw: bytes, pos: int) -> int:
+    """Return the offset just past the string whose opening quote is at `pos`."""
+    end = pos
+    while True:
+        end = raw.find(b'"', end + 1)
+        if end < 0:
+            raise ValueError(f"unterminated string at {pos}")
+        # A quote after an odd run of backslashes is escaped
+        run = end - 1
+        while raw[run] == _BACKSLASH:
+            run -= 1
+        if (end - 1 - run) % 2 == 0:
+            return end + 1
+
+
+def _skip_value(raw: bytes, pos: int, keep: int = 0) -> tuple[int, list[tuple[int, int]]]:
+    """Find the end of the value at `pos`.
+
+    Strings are skipped with `bytes.find` and everything between them with a
+    single-character-class regex, so the cost is a scan of the bytes plus a
+    little Python per string and bracket.
+
+    Args:
+        raw: The JSON document
+        pos: Offset where the value starts
+        keep: For an array, how many of its leading object elements to locate
+
+    Returns:
+        The offset just past the value, and (start, end) spans of up to
+        `keep` leading object elements
+
+    Raises:
+        ValueError: If the value is truncated or not JSON
+    """
+    first = raw[pos:pos + 1]
+    if first == b'"':
+        return _string_end(raw, pos), []
+    if first not in (b"{", b"["):
+        match = _LITERAL.match(raw, pos)
+        if match is None:
+            raise ValueError(f"expected a value at {pos}")
+        return match.end(), []
+
+    spans: list[tuple[int, int]] = []
+    element_start = None
+    depth = 0
+    cursor = pos
+    while True:
+        cursor = _PLAIN.match(raw, cursor).end()
+        char = raw[cursor:cursor + 1]
+        if char == b'"':
+            cursor = _string_end(raw, cursor)
+            continue
+        if not char:
+            raise ValueError(f"unterminated {first.decode()} at {pos}")
+        if char in (b"{", b"["):
+            depth += 1
+            if depth == 2 and char == b"{" and len(spans) < keep:
+                element_start = cursor
+        else:
+            depth -= 1
+            if depth == 1 and element_start is not None:
+                spans.append((element_start, cursor + 1))
+                element_start = None
+            elif depth == 0:
+                return cursor + 1, spans
+        cursor += 1
+
+
+def peek_json(raw: bytes, keys: Iterable[str], prefixes: dict[str, int] | None = None) -> dict:
+    """Decode selected top-level fields of a JSON object without parsing the rest.
+
+    Args:
+        raw: The JSON document (request or response body)
+        keys: Top-level fields to decode; missing fields are left out
+        prefixes: Array fields to decode only partially, mapped to how many
+            leading object elements to keep (e.g. {"messages": 2})
+
+    Returns:
+        The selected fields. An empty body gives an empty dict.
+
+    Raises:
+        ValueError: If the body is not a JSON object
+    """
+    prefixes = prefixes or {}
+    wanted = set(keys) | set(prefixes)
+    found: dict = {}
+    pos = _skip_ws(raw, 0)
+    if pos == len(raw):
+        return found
+    if raw[pos:pos + 1] != b"{":
+        raise ValueError("body is not a JSON object")
+    pos = _skip_ws(raw, pos + 1)
+    if raw[pos:pos + 1] == b"}":
+        return found
+
+    while True:
+        if raw[pos:pos + 1] != b'"':
+            raise ValueError(f"expected a key at {pos}")
+        key_end = _string_end(raw, pos)
+        colon = _COLON.match(raw, key_end)
+        if colon is None:
+            raise ValueError(f"expected ':' at {key_end}")
+        key = json.loads(raw[pos:key_end])
+        value_start = colon.end()
+        keep = prefixes.get(key, 0)
+        value_end, spans = _skip_value(raw, value_start, keep)
+        if key in prefixes:
+            if raw[value_start:value_start + 1] == b"[":
+                found[key] = [json.loads(raw[start:end]) for start, end in spans]
+            else:
+                found[key] = json.loads(raw[value_start:value_end])
+        elif key in wanted:
+            found[key] = json.loads(raw[value_start:value_end])
+        if len(found) == len(wanted):
+            return found
+
+        pos = _skip_ws(raw, value_end)
+        separator = raw[pos:pos + 1]
+        if separator == b"}":
+            return found
+        if separator != b",":
+            raise ValueError(f"expected ',' or '}}' at {pos}")
+        pos = _skip_ws(raw, pos + 1)
@@ -0,0 +1,76 @@
+"""In-flight request coalescing (singleflight) for the gateway.
+
+When many clients send the same request at once (e.g. editors reconnecting
+and listing models), one backend call is made and its result or error is
+fanned out to every waiter.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+
+class _Call:
+    """One shared in-flight call and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into a single execution.
+
+    A waiter that is cancelled stops waiting without affecting the others;
+    the shared call is only cancelled once no waiters remain. Used from the
+    gateway's event loop only, so it needs no locking.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` unless a call with the same key is already in flight.
+
+        Args:
+            key: Identity of the call (e.g. method, path and canonical body)
+            fn: Coroutine function performing the call
+
+        Returns:
+            The shared call's result
+
+        Raises:
+            Exception: Whatever the shared call raised, re-raised in every waiter
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Forget the call now: a request arriving before the task
+                # finishes cancelling must start a fresh call, not join this one
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def _finish(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception retrieved when every waiter has already left
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently executing."""
+        return len(self._calls)
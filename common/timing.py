@@ -0,0 +1,114 @@
+"""Server-Timing headers and trace IDs for gateway responses.
+
+Handlers add stages (parse, queue, dispatch, backend-reported stages) to
+the request's ServerTiming; the middleware writes them into a
+`Server-Timing` header, together with the total gateway time and an
+`X-Trace-Id`, when the response starts.
+"""
+
+import re
+import time
+import uuid
+
+TRACE_HEADER = "x-trace-id"
+_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+# Backend timing keys and the Server-Timing metric names they are shown as
+BACKEND_STAGES = {
+    "model_wait": "model-wait",
+    "load": "load",
+    "prompt_eval": "prompt-eval",
+    "eval": "eval",
+    "pipeline_load": "pipeline-load",
+    "denoise": "denoise",
+    "encode": "encode",
+    "handler": "backend",
+}
+
+
+class ServerTiming:
+    """Ordered Server-Timing entries for one response."""
+
+    def __init__(self):
+        self.entries: list[tuple[str, float | None, str | None]] = []
+
+    def add(self, name: str, seconds: float | None = None, desc: str | None = None) -> None:
+        """Add a metric; `seconds` becomes its `dur` in milliseconds."""
+        self.entries.append((name, seconds, desc))
+
+    def add_backend(self, timing: dict | None, round_trip: float) -> None:
+        """Add the stages a backend reported for one call.
+
+        Args:
+            timing: The backend's `timing` dict (None for older backends)
+            round_trip: Seconds the gateway spent awaiting the call
+        """
+        if not timing:
+            self.add("dispatch", round_trip)
+            return
+        # Round trip not spent in the handler: Modal scheduling and container start
+        self.add("dispatch", max(0.0, round_trip - timing.get("handler", 0.0)))
+        if timing.get("first_request"):
+            self.add("cold-start", timing.get("startup"), "first request")
+        if "container_age" in timing:
+            self.add("container", desc=f"age {timing['container_age']:.0f}s")
+        for key, name in BACKEND_STAGES.items():
+            if key in timing:
+                self.add(name, timing[key])
+
+    def header(self) -> str:
+        """Render the entries as a Server-Timing header value."""
+        parts = []
+        for name, seconds, desc in self.entries:
+            part = name
+            if seconds is not None:
+                part += f";dur={seconds * 1000:.1f}"
+            if desc:
+                part += ';desc="{}"'.format(desc.replace('"', "'"))
+            parts.append(part)
+        return ", ".join(parts)
+
+
+def trace_id_from(headers: dict[str, str]) -> str:
+    """Use the client's X-Trace-Id or W3C traceparent trace ID, else a new one."""
+    trace_id = headers.get(TRACE_HEADER, "")
+    if _TRACE_ID.match(trace_id):
+        return trace_id
+    traceparent = headers.get("traceparent", "").split("-")
+    if len(traceparent) == 4 and len(traceparent[1]) == 32:
+        return traceparent[1]
+    return uuid.uuid4().hex
+
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware adding Server-Timing and X-Trace-Id headers.
+
+    Handlers find their ServerTiming at `request.state.server_timing` and the
+    trace ID at `request.state.trace_id`.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope["headers"]}
+        state = scope.setdefault("state", {})
+        timing = state["server_timing"] = ServerTiming()
+        trace_id = state["trace_id"] = trace_id_from(headers)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing.add("total", time.perf_counter() - started)
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"server-timing", timing.header().encode("latin-1")),
+                    (b"x-trace-id", trace_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,182 @@
+"""Token counting for the gateway's /v1/messages/count_tokens endpoint.
+
+Counts are exact for models with a known tokenizer and fall back to a
+~4 chars/token estimate otherwise. "Exact" covers message content only: the
+gateway ships `tokenizers`, not the model's chat template, so the template's
+per-message markup is approximated by MESSAGE_OVERHEAD tokens. Agent clients
+resend the same long history on every turn, so counts are cached per message
+by content hash and only new messages are tokenized.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+# Ollama model family -> HuggingFace repo with the matching tokenizer.json
+TOKENIZER_REPOS: dict[str, str] = {
+    "glm-4.7-flash": "zai-org/GLM-4.7-Flash",
+}
+
+# Approximate tokens the chat template adds around each message (role marker +
+# separator); the template itself is not applied
+MESSAGE_OVERHEAD = 2
+
+# Seconds before retrying a tokenizer that failed to load (e.g. Hub unreachable);
+# doubles after each further failure, up to MAX_RETRY_SECONDS
+RETRY_SECONDS = 30
+MAX_RETRY_SECONDS = 1800
+
+
+def estimate_tokens(body: dict | None) -> int:
+    """Estimate token count from message content (~4 chars per token)."""
+    if not body:
+        return 0
+    total_chars = 0
+    # Count characters in messages
+    for msg in body.get("messages", []):
+        content = msg.get("content", "")
+        if isinstance(content, str):
+            total_chars += len(content)
+        elif isinstance(content, list):
+            # Handle multi-part content (text, images, etc.)
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    total_chars += len(part.get("text", ""))
+    # Count system prompt if present
+    system = body.get("system", "")
+    if isinstance(system, str):
+        total_chars += len(system)
+    # Rough estimate: ~4 characters per token
+    return max(1, total_chars // 4)
+
+
+def _content_text(content: Any) -> str:
+    """Flatten Anthropic-style content (string or list of blocks) to text."""
+    if isinstance(content, str):
+        return content
+    if not isinstance(content, list):
+        return ""
+    texts = []
+    for part in content:
+        if isinstance(part, str):
+            texts.append(part)
+        elif not isinstance(part, dict):
+            continue
+        elif part.get("type") == "text":
+            texts.append(part.get("text", ""))
+        elif part.get("type") == "tool_use":
+            texts.append(f"{part.get('name', '')} {json.dumps(part.get('input', {}))}")
+        elif part.get("type") == "tool_result":
+            texts.append(_content_text(part.get("content", "")))
+    return "\n".join(texts)
+
+
+def _load_tokenizer(repo: str):
+    """Download a tokenizer.json from the HuggingFace Hub."""
+    from tokenizers import Tokenizer
+
+    return Tokenizer.from_pretrained(repo)
+
+
+class TokenCounter:
+    """Exact, per-message cached token counter.
+
+    Tokenizers are loaded lazily on first use of each model family; one that
+    fails to load is retried with backoff, and counts are estimated meanwhile.
+    Counts are kept in an LRU cache keyed by tokenizer and message content hash.
+    """
+
+    def __init__(
+        self,
+        repos: dict[str, str] | None = None,
+        loader: Callable[[str], Any] = _load_tokenizer,
+        max_entries: int = 100_000,
+    ):
+        """Initialize the counter.
+
+        Args:
+            repos: Model family to tokenizer repo mapping (default: TOKENIZER_REPOS)
+            loader: Function returning a `tokenizers.Tokenizer` for a repo
+            max_entries: Maximum number of cached per-message counts
+        """
+        self.repos = TOKENIZER_REPOS if repos is None else repos
+        self._loader = loader
+        self._tokenizers: dict[str, Any] = {}
+        # repo -> (consecutive load failures, monotonic time of the next attempt)
+        self._failures: dict[str, tuple[int, float]] = {}
+        self._load_lock = threading.Lock()
+        self._cache: OrderedDict[bytes, int] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def _tokenizer(self, model: str) -> tuple[str, Any] | None:
+        """Return (repo, tokenizer) for a model, or None if unavailable."""
+        repo = self.repos.get(model.split(":")[0])
+        if repo is None:
+            return None
+        with self._load_lock:
+            if repo not in self._tokenizers:
+                failures, retry_at = self._failures.get(repo, (0, 0.0))
+                if time.monotonic() < retry_at:
+                    return None
+                try:
+                    self._tokenizers[repo] = self._loader(repo)
+                except Exception as e:
+                    delay = min(RETRY_SECONDS * 2**failures, MAX_RETRY_SECONDS)
+                    self._failures[repo] = (failures + 1, time.monotonic() + delay)
+                    print(f"Tokenizer {repo} unavailable, estimating tokens for {delay}s: {e}")
+                    return None
+                self._failures.pop(repo, None)
+        return repo, self._tokenizers[repo]
+
+    def count(self, body: dict | None) -> int:
+        """Count input tokens of a Messages API request body.
+
+        Args:
+            body: Request body with 'model', 'messages' and optional 'system'/'tools'
+
+        Returns:
+            Token count (estimated if the model's tokenizer is unavailable)
+        """
+        if not body:
+            return 0
+        loaded = self._tokenizer(str(body.get("model", "")))
+        if loaded is None:
+            return estimate_tokens(body)
+        repo, tokenizer = loaded
+
+        segments: list[Any] = list(body.get("messages", []))
+        if body.get("system"):
+            segments.append({"role": "system", "content": body["system"]})
+        if body.get("tools"):
+            segments.append({"role": "tools", "content": json.dumps(body["tools"])})
+
+        keys = []
+        for segment in segments:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(repo.encode())
+            digest.update(json.dumps(segment, sort_keys=True, separators=(",", ":")).encode())
+            keys.append(digest.digest())
+
+        counts: dict[bytes, int] = {}
+        with self._cache_lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    counts[key] = self._cache[key]
+
+        missing = {key: segment for key, segment in zip(keys, segments) if key not in counts}
+        if missing:
+            texts = [_content_text(segment.get("content", "")) for segment in missing.values()]
+            encodings = tokenizer.encode_batch(texts, add_special_tokens=False)
+            with self._cache_lock:
+                for key, encoding in zip(missing, encodings):
+                    counts[key] = len(encoding.ids) + MESSAGE_OVERHEAD
+                    self._cache[key] = counts[key]
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+
+        return max(1, sum(counts[key] for key in keys))
@@ -2,24 +2,108 @@
 
 import os
 
+
+def _per_model(name: str) -> dict[str, int]:
+    """Parse a `model=value,...` environment variable into integers by model."""
+    values = {}
+    for item in os.environ.get(name, "").split(","):
+        model, _, value = item.rpartition("=")
+        if model:
+            values[model] = int(value)
+    return values
+
 # App identity
 APP_NAME = "personal-model-garden"
 
 # Gateway settings (CPU, always warm)
 GATEWAY_MIN_CONTAINERS = int(os.environ.get("GATEWAY_MIN_CONTAINERS", "1"))
+# Response cache for deterministic non-streaming completions (0 disables)
+GATEWAY_RESPONSE_CACHE_MB = int(os.environ.get("GATEWAY_RESPONSE_CACHE_MB", "0"))
+GATEWAY_RESPONSE_CACHE_TTL = int(os.environ.get("GATEWAY_RESPONSE_CACHE_TTL", "3600"))
+# Seconds before the gateway re-reads the backend's model metadata snapshot
+GATEWAY_METADATA_REFRESH = int(os.environ.get("GATEWAY_METADATA_REFRESH", "60"))
+# Longest a request waits in a backend queue without its own deadline (0 = no limit)
+GATEWAY_MAX_QUEUE_WAIT = float(os.environ.get("GATEWAY_MAX_QUEUE_WAIT", "300"))
+# Record the shape of gateway traffic (no prompt text) to GATEWAY_CAPTURE_DIR for replay
+GATEWAY_CAPTURE = os.environ.get("GATEWAY_CAPTURE", "false").lower() == "true"
+GATEWAY_CAPTURE_DIR = os.environ.get("GATEWAY_CAPTURE_DIR", "/traces")
+# Forward Ollama request and response bytes undecoded, peeking only at routing fields
+GATEWAY_PASSTHROUGH = os.environ.get("GATEWAY_PASSTHROUGH", "false").lower() == "true"
+# Negotiated gzip/zstd response compression above a size threshold, and compressed uploads
+GATEWAY_COMPRESSION = os.environ.get("GATEWAY_COMPRESSION", "true").lower() == "true"
+GATEWAY_COMPRESS_MIN_BYTES = int(os.environ.get("GATEWAY_COMPRESS_MIN_BYTES", "1024"))
+# Bodies at least this large are compressed on a worker thread, off the event loop
+GATEWAY_COMPRESS_OFFLOAD_BYTES = int(os.environ.get("GATEWAY_COMPRESS_OFFLOAD_BYTES", "262144"))
+# Largest request body accepted after decompression
+GATEWAY_MAX_DECOMPRESSED_MB = int(os.environ.get("GATEWAY_MAX_DECOMPRESSED_MB", "64"))
+# Embedding inputs per backend call when a large input list is split (0 disables splitting)
+GATEWAY_EMBED_BATCH_SIZE = int(os.environ.get("GATEWAY_EMBED_BATCH_SIZE", "256"))
+# Batches of one embedding request in flight at once (0 = OLLAMA_MAX_CONCURRENT)
+GATEWAY_EMBED_CONCURRENCY = int(os.environ.get("GATEWAY_EMBED_CONCURRENCY", "0"))
+# Persistent embedding cache keyed by input text hash, on a Volume at GATEWAY_EMBED_CACHE_DIR
+GATEWAY_EMBED_CACHE = os.environ.get("GATEWAY_EMBED_CACHE", "false").lower() == "true"
+GATEWAY_EMBED_CACHE_DIR = os.environ.get("GATEWAY_EMBED_CACHE_DIR", "/embeddings")
+# Cancel a backend call (and stop its generation) when the client disconnects
+GATEWAY_CANCEL_ON_DISCONNECT = os.environ.get("GATEWAY_CANCEL_ON_DISCONNECT", "true").lower() == "true"
+# Batch jobs (/ollama/v1/batches): requests in flight per job (0 = every slot of the pools it uses)
+GATEWAY_BATCH_CONCURRENCY = int(os.environ.get("GATEWAY_BATCH_CONCURRENCY", "0"))
+# Where job containers mount the `gateway-batches` volume holding input and result files
+GATEWAY_BATCH_DIR = os.environ.get("GATEWAY_BATCH_DIR", "/batches")
+# Largest batch input file accepted
+GATEWAY_BATCH_MAX_FILE_MB = int(os.environ.get("GATEWAY_BATCH_MAX_FILE_MB", "200"))
+# Seconds between saving a job's progress (and checking for cancellation)
+GATEWAY_BATCH_CHECKPOINT = float(os.environ.get("GATEWAY_BATCH_CHECKPOINT", "10"))
+# Longest a job container runs; a job that times out (or crashes) is retried and resumes
+GATEWAY_BATCH_TIMEOUT = int(os.environ.get("GATEWAY_BATCH_TIMEOUT", "86400"))
 
 # Ollama backend settings (GPU, separate lifecycle)
 OLLAMA_GPU = os.environ.get("OLLAMA_GPU", "A10G")
 OLLAMA_MAX_CONTAINERS = int(os.environ.get("OLLAMA_MAX_CONTAINERS", "1"))
 OLLAMA_SCALEDOWN = int(os.environ.get("OLLAMA_SCALEDOWN", "300"))
 OLLAMA_TIMEOUT = int(os.environ.get("OLLAMA_TIMEOUT", "1800"))
+# Concurrent inputs per container, matched to Ollama's parallel decode slots
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+# Backend replicas that chat conversations are pinned to by prompt prefix
+OLLAMA_AFFINITY_REPLICAS = int(os.environ.get("OLLAMA_AFFINITY_REPLICAS", "1"))
+# Gateway admission control: requests in flight to Ollama, and requests queued behind them
+OLLAMA_MAX_CONCURRENT = int(os.environ.get(
+    "OLLAMA_MAX_CONCURRENT", str(OLLAMA_MAX_CONTAINERS * OLLAMA_NUM_PARALLEL * OLLAMA_AFFINITY_REPLICAS)
+))
+OLLAMA_MAX_QUEUE = int(os.environ.get("OLLAMA_MAX_QUEUE", "64"))
+# Models served by their own container pool instead of the shared one (comma-separated)
+OLLAMA_MODEL_POOLS = [m for m in os.environ.get("OLLAMA_MODEL_POOLS", "").split(",") if m]
+# Per-pool overrides of OLLAMA_MAX_CONTAINERS and OLLAMA_SCALEDOWN, as model=value pairs
+OLLAMA_POOL_MAX_CONTAINERS = _per_model("OLLAMA_POOL_MAX_CONTAINERS")
+OLLAMA_POOL_SCALEDOWN = _per_model("OLLAMA_POOL_SCALEDOWN")
+
+# Ollama CPU embedding pool (no GPU): embedding requests for these models never wake a GPU
+OLLAMA_CPU_EMBED_MODELS = [m for m in os.environ.get("OLLAMA_CPU_EMBED_MODELS", "").split(",") if m]
+OLLAMA_CPU_CORES = float(os.environ.get("OLLAMA_CPU_CORES", "4"))
+OLLAMA_CPU_MEMORY_MB = int(os.environ.get("OLLAMA_CPU_MEMORY_MB", "4096"))
+OLLAMA_CPU_MAX_CONTAINERS = int(os.environ.get("OLLAMA_CPU_MAX_CONTAINERS", "2"))
+OLLAMA_CPU_SCALEDOWN = int(os.environ.get("OLLAMA_CPU_SCALEDOWN", "120"))
+OLLAMA_CPU_TIMEOUT = int(os.environ.get("OLLAMA_CPU_TIMEOUT", "600"))
+# Concurrent inputs per CPU container (Ollama's parallel slots)
+OLLAMA_CPU_NUM_PARALLEL = int(os.environ.get("OLLAMA_CPU_NUM_PARALLEL", "2"))
+OLLAMA_CPU_MAX_CONCURRENT = int(os.environ.get(
+    "OLLAMA_CPU_MAX_CONCURRENT", str(OLLAMA_CPU_MAX_CONTAINERS * OLLAMA_CPU_NUM_PARALLEL)
+))
+OLLAMA_CPU_MAX_QUEUE = int(os.environ.get("OLLAMA_CPU_MAX_QUEUE", "64"))
 
 # Diffusers A10G tier settings (24GB VRAM, for smaller models like GLM-Image)
 DIFFUSERS_A10G_MAX_CONTAINERS = int(os.environ.get("DIFFUSERS_A10G_MAX_CONTAINERS", "1"))
 DIFFUSERS_A10G_SCALEDOWN = int(os.environ.get("DIFFUSERS_A10G_SCALEDOWN", "300"))
 DIFFUSERS_A10G_TIMEOUT = int(os.environ.get("DIFFUSERS_A10G_TIMEOUT", "1800"))
+DIFFUSERS_A10G_MAX_CONCURRENT = int(os.environ.get(
+    "DIFFUSERS_A10G_MAX_CONCURRENT", str(DIFFUSERS_A10G_MAX_CONTAINERS)
+))
+DIFFUSERS_A10G_MAX_QUEUE = int(os.environ.get("DIFFUSERS_A10G_MAX_QUEUE", "8"))
 
 # Diffusers L40S tier settings (48GB VRAM, for larger models like SDXL)
 DIFFUSERS_L40S_MAX_CONTAINERS = int(os.environ.get("DIFFUSERS_L40S_MAX_CONTAINERS", "1"))
 DIFFUSERS_L40S_SCALEDOWN = int(os.environ.get("DIFFUSERS_L40S_SCALEDOWN", "300"))
 DIFFUSERS_L40S_TIMEOUT = int(os.environ.get("DIFFUSERS_L40S_TIMEOUT", "1800"))
+DIFFUSERS_L40S_MAX_CONCURRENT = int(os.environ.get(
+    "DIFFUSERS_L40S_MAX_CONCURRENT", str(DIFFUSERS_L40S_MAX_CONTAINERS)
+))
+DIFFUSERS_L40S_MAX_QUEUE = int(os.environ.get("DIFFUSERS_L40S_MAX_QUEUE", "8"))
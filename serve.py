@@ -11,25 +11,118 @@ Serve locally for testing:
     modal serve serve.py
 """
 
+import asyncio
+import contextlib
+import dataclasses
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
 import modal
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile
 
 from config import (
     APP_NAME,
     GATEWAY_MIN_CONTAINERS,
+    GATEWAY_RESPONSE_CACHE_MB,
+    GATEWAY_RESPONSE_CACHE_TTL,
+    GATEWAY_METADATA_REFRESH,
+    GATEWAY_MAX_QUEUE_WAIT,
+    GATEWAY_CAPTURE,
+    GATEWAY_CAPTURE_DIR,
+    GATEWAY_PASSTHROUGH,
+    GATEWAY_COMPRESSION,
+    GATEWAY_COMPRESS_MIN_BYTES,
+    GATEWAY_COMPRESS_OFFLOAD_BYTES,
+    GATEWAY_MAX_DECOMPRESSED_MB,
+    GATEWAY_EMBED_BATCH_SIZE,
+    GATEWAY_EMBED_CONCURRENCY,
+    GATEWAY_EMBED_CACHE,
+    GATEWAY_EMBED_CACHE_DIR,
+    GATEWAY_CANCEL_ON_DISCONNECT,
+    GATEWAY_BATCH_CONCURRENCY,
+    GATEWAY_BATCH_DIR,
+    GATEWAY_BATCH_MAX_FILE_MB,
+    GATEWAY_BATCH_CHECKPOINT,
+    GATEWAY_BATCH_TIMEOUT,
     OLLAMA_GPU,
     OLLAMA_MAX_CONTAINERS,
     OLLAMA_SCALEDOWN,
     OLLAMA_TIMEOUT,
+    OLLAMA_NUM_PARALLEL,
+    OLLAMA_AFFINITY_REPLICAS,
+    OLLAMA_MAX_CONCURRENT,
+    OLLAMA_MAX_QUEUE,
+    OLLAMA_MODEL_POOLS,
+    OLLAMA_POOL_MAX_CONTAINERS,
+    OLLAMA_POOL_SCALEDOWN,
+    OLLAMA_CPU_EMBED_MODELS,
+    OLLAMA_CPU_CORES,
+    OLLAMA_CPU_MEMORY_MB,
+    OLLAMA_CPU_MAX_CONTAINERS,
+    OLLAMA_CPU_SCALEDOWN,
+    OLLAMA_CPU_TIMEOUT,
+    OLLAMA_CPU_NUM_PARALLEL,
+    OLLAMA_CPU_MAX_CONCURRENT,
+    OLLAMA_CPU_MAX_QUEUE,
     DIFFUSERS_A10G_MAX_CONTAINERS,
     DIFFUSERS_A10G_SCALEDOWN,
     DIFFUSERS_A10G_TIMEOUT,
+    DIFFUSERS_A10G_MAX_CONCURRENT,
+    DIFFUSERS_A10G_MAX_QUEUE,
     DIFFUSERS_L40S_MAX_CONTAINERS,
     DIFFUSERS_L40S_SCALEDOWN,
     DIFFUSERS_L40S_TIMEOUT,
+    DIFFUSERS_L40S_MAX_CONCURRENT,
+    DIFFUSERS_L40S_MAX_QUEUE,
+)
+from common import (
+    BATCH_ENDPOINTS,
+    COMPLETION_WINDOWS,
+    EMBEDDING_OUTPUT_FIELDS,
+    METRICS_CONTENT_TYPE,
+    AdmissionController,
+    AdmissionRejected,
+    AffinityRouter,
+    BatchInputError,
+    BatchRunner,
+    ClientDisconnected,
+    CompressionMiddleware,
+    EmbeddingBatchFailed,
+    EmbeddingPipeline,
+    EmbeddingStore,
+    GatewayMetrics,
+    MetadataSnapshotCache,
+    MetricsMiddleware,
+    ServerTimingMiddleware,
+    ResponseCache,
+    SingleFlight,
+    Ticket,
+    TokenCounter,
+    TraceRecorder,
+    TraceStatusMiddleware,
+    cancel_on_disconnect,
+    embeddings_to_base64,
+    embeddings_to_binary,
+    embedding_vectors,
+    is_deterministic,
+    new_batch,
+    parse_batch_input,
+    peek_json,
+    prefix_key,
+    request_key,
+    requested_embedding_output,
 )
-from backends.ollama import OllamaService, OllamaConfig
+from common.affinity import PREFIX_MESSAGES
+from common.batches import FINAL_STATUSES, new_id
+from common.embedding_pipeline import SUMMED_FIELDS
+from backends.ollama import OllamaService, OllamaConfig, normalize_model_name
 from backends.diffusers import (
     DiffusersConfig,
     get_model_config,
@@ -46,18 +139,46 @@ app = modal.App(APP_NAME)
 # Volumes for model storage
 ollama_volume = modal.Volume.from_name("ollama-models", create_if_missing=True)
 diffusers_volume = modal.Volume.from_name("diffusers-models", create_if_missing=True)
+# Traffic traces written by the gateway when GATEWAY_CAPTURE is on
+trace_volume = modal.Volume.from_name("gateway-traces", create_if_missing=True)
+# Embedding vectors cached by the gateway when GATEWAY_EMBED_CACHE is on
+embedding_volume = modal.Volume.from_name("gateway-embeddings", create_if_missing=True)
+# Batch job input and result files
+batch_volume = modal.Volume.from_name("gateway-batches", create_if_missing=True)
 
 # Backend configurations
 ollama_config = OllamaConfig()
+# Models with a container pool of their own (see OLLAMA_MODEL_POOLS)
+POOL_MODELS = {normalize_model_name(model) for model in OLLAMA_MODEL_POOLS}
+# CPU embedding pool: only its embedding models, loaded at startup and kept in RAM
+ollama_cpu_config = OllamaConfig(
+    models=OLLAMA_CPU_EMBED_MODELS,
+    num_parallel=OLLAMA_CPU_NUM_PARALLEL,
+    preload_models=OLLAMA_CPU_EMBED_MODELS,
+)
 diffusers_config = DiffusersConfig()
 
+# Model metadata snapshot written by the Ollama backend, read by the gateway
+ollama_metadata = modal.Dict.from_name(ollama_config.metadata_dict_name, create_if_missing=True)
+# Streams the gateway abandoned, one partition per stream's cancel key
+ollama_cancellations = modal.Queue.from_name("ollama-cancellations", create_if_missing=True)
+
+
+def stream_cancelled(cancel_key: str):
+    """Awaitable that completes once the gateway cancels the stream `cancel_key`."""
+    return ollama_cancellations.get.aio(partition=cancel_key)
+
+
+# Batch jobs: batch objects, file records and cancel requests, keyed by ID
+batch_records = modal.Dict.from_name("gateway-batches", create_if_missing=True)
+
 # =============================================================================
 # Container Images (separate for gateway vs backends)
 # =============================================================================
 
 gateway_image = (
     modal.Image.debian_slim(python_version="3.11")
-    .pip_install("fastapi", "httpx")
+    .pip_install("fastapi", "httpx", "python-multipart", "tokenizers", "zstandard")
     .add_local_python_source("config")
     .add_local_python_source("common")
     .add_local_python_source("backends")
@@ -73,6 +194,7 @@ ollama_image = (
         "rm /tmp/ollama.tar.zst",
     )
     .add_local_python_source("config")
+    .add_local_python_source("common")
     .add_local_python_source("backends")
 )
 
@@ -89,6 +211,7 @@ diffusers_image = (
         "sentencepiece",
     )
     .add_local_python_source("config")
+    .add_local_python_source("common")
     .add_local_python_source("backends")
 )
 
@@ -105,39 +228,68 @@ diffusers_image = (
     scaledown_window=OLLAMA_SCALEDOWN,
     timeout=OLLAMA_TIMEOUT,
 )
+@modal.concurrent(max_inputs=OLLAMA_NUM_PARALLEL)
 class OllamaBackend:
-    """Ollama backend running on GPU with separate lifecycle."""
+    """Ollama backend running on GPU with separate lifecycle.
+
+    Accepts up to OLLAMA_NUM_PARALLEL concurrent inputs per container so a long
+    stream does not block other callers while Ollama has free decode slots.
+    Each `replica` value is a separate instance with its own containers; the
+    gateway pins conversations to a replica to keep Ollama's prompt cache hot.
+
+    With `model` set, the instance is that model's dedicated pool: it pulls
+    and preloads only that model, so its weights are never swapped out of
+    VRAM for another one. The shared pool (`model` empty) serves every other
+    model and publishes the metadata snapshot.
+    """
+
+    replica: int = modal.parameter(default=0)
+    model: str = modal.parameter(default="")
 
     @modal.enter()
     def start(self):
         """Start Ollama server and pull models on container startup."""
-        self.service = OllamaService(ollama_config, volume=ollama_volume)
+        if self.model:
+            config = dataclasses.replace(ollama_config, models=[self.model], preload_models=[self.model])
+            self.service = OllamaService(config, volume=ollama_volume, cancel_signal=stream_cancelled)
+        else:
+            # Models with their own pool are never requested here, so never loaded into VRAM
+            preload = [m for m in ollama_config.preload_models if normalize_model_name(m) not in POOL_MODELS]
+            config = dataclasses.replace(ollama_config, preload_models=preload)
+            self.service = OllamaService(
+                config, volume=ollama_volume, metadata=ollama_metadata, cancel_signal=stream_cancelled
+            )
         self.service.start()
 
+    @modal.exit()
+    async def stop(self):
+        """Close the pooled HTTP client and stop the Ollama server."""
+        await self.service.stop()
+
     @modal.method()
-    def generate(self, model: str, prompt: str, **kwargs) -> dict:
+    async def generate(self, model: str, prompt: str, **kwargs) -> dict:
         """Generate text using Ollama."""
-        return self.service.generate(model, prompt, **kwargs)
+        return await self.service.generate(model, prompt, **kwargs)
 
     @modal.method()
-    def chat(self, model: str, messages: list, **kwargs) -> dict:
+    async def chat(self, model: str, messages: list, **kwargs) -> dict:
         """Chat completion using Ollama."""
-        return self.service.chat(model, messages, **kwargs)
+        return await self.service.chat(model, messages, **kwargs)
 
     @modal.method()
-    def list_models(self) -> dict:
+    async def list_models(self) -> dict:
         """List available models."""
-        return self.service.list_models()
+        return await self.service.list_models()
 
     @modal.method()
-    def show_model(self, name: str) -> dict:
+    async def show_model(self, name: str) -> dict:
         """Show model information."""
-        return self.service.show_model(name)
+        return await self.service.show_model(name)
 
     @modal.method()
-    def embeddings(self, model: str, input: str | list[str], **kwargs) -> dict:
+    async def embeddings(self, model: str, input: str | list[str], **kwargs) -> dict:
         """Generate embeddings."""
-        return self.service.embeddings(model, input, **kwargs)
+        return await self.service.embeddings(model, input, **kwargs)
 
     @modal.method()
     def health(self) -> dict:
@@ -145,14 +297,99 @@ class OllamaBackend:
         return self.service.health_check()
 
     @modal.method()
-    def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
         """Generic proxy to forward requests to local Ollama server."""
-        return self.service.proxy(method, path, body)
+        return await self.service.proxy(method, path, body)
+
+    @modal.method()
+    async def raw_proxy(
+        self,
+        method: str,
+        path: str,
+        content: bytes = b"",
+        content_type: str | None = None,
+        model: str | None = None,
+    ) -> dict:
+        """Passthrough proxy: raw request bytes in, raw response bytes out."""
+        return await self.service.raw_proxy(method, path, content, content_type, model)
 
     @modal.method()
-    def stream_proxy(self, path: str, body: dict):
-        """Streaming proxy - use with .remote_gen() for SSE support."""
-        yield from self.service.stream_proxy(path, body)
+    async def stream_proxy(
+        self,
+        path: str,
+        body: dict,
+        content: bytes | None = None,
+        content_type: str | None = None,
+        cancel_key: str | None = None,
+    ):
+        """Streaming proxy - use with .remote_gen() for SSE support.
+
+        Ends early when the gateway puts `cancel_key` on ollama_cancellations.
+        """
+        async for chunk in self.service.stream_proxy(path, body, content, content_type, cancel_key):
+            yield chunk
+
+
+# =============================================================================
+# Ollama CPU Embedding Backend (no GPU, separate lifecycle)
+# =============================================================================
+
+
+@app.cls(
+    image=ollama_image,
+    cpu=OLLAMA_CPU_CORES,
+    memory=OLLAMA_CPU_MEMORY_MB,
+    volumes={ollama_cpu_config.volume_mount: ollama_volume},
+    max_containers=OLLAMA_CPU_MAX_CONTAINERS,
+    scaledown_window=OLLAMA_CPU_SCALEDOWN,
+    timeout=OLLAMA_CPU_TIMEOUT,
+)
+@modal.concurrent(max_inputs=OLLAMA_CPU_NUM_PARALLEL)
+class OllamaCPUBackend:
+    """Ollama on CPU for the embedding models in OLLAMA_CPU_EMBED_MODELS.
+
+    Embedding requests for these models never queue behind chat generations
+    or wake a GPU container. Shares the model volume with the GPU backend
+    but publishes no metadata snapshot.
+    """
+
+    @modal.enter()
+    def start(self):
+        """Start Ollama server and load the embedding models on container startup."""
+        self.service = OllamaService(ollama_cpu_config, volume=ollama_volume)
+        self.service.start()
+
+    @modal.exit()
+    async def stop(self):
+        """Close the pooled HTTP client and stop the Ollama server."""
+        await self.service.stop()
+
+    @modal.method()
+    async def embeddings(self, model: str, input: str | list[str], **kwargs) -> dict:
+        """Generate embeddings."""
+        return await self.service.embeddings(model, input, **kwargs)
+
+    @modal.method()
+    def health(self) -> dict:
+        """Health check for the CPU embedding backend."""
+        return self.service.health_check()
+
+    @modal.method()
+    async def proxy(self, method: str, path: str, body: dict | None = None) -> dict:
+        """Generic proxy to forward requests to local Ollama server."""
+        return await self.service.proxy(method, path, body)
+
+    @modal.method()
+    async def raw_proxy(
+        self,
+        method: str,
+        path: str,
+        content: bytes = b"",
+        content_type: str | None = None,
+        model: str | None = None,
+    ) -> dict:
+        """Passthrough proxy: raw request bytes in, raw response bytes out."""
+        return await self.service.raw_proxy(method, path, content, content_type, model)
 
 
 # =============================================================================
@@ -177,7 +414,7 @@ class DiffusersBackend_A10G:
         # Import here to avoid torch dependency in gateway
         from backends.diffusers.backend import DiffusersService
 
-        self.service = DiffusersService(diffusers_config)
+        self.service = DiffusersService(diffusers_config, gpu_tier="a10g")
         self.service.start()
 
     @modal.method()
@@ -191,8 +428,12 @@ class DiffusersBackend_A10G:
         guidance_scale: float | None = None,
         seed: int | None = None,
     ) -> dict:
-        """Generate image from text prompt."""
-        return self.service.generate(
+        """Generate image from text prompt.
+
+        Returns:
+            Dict with the PNG bytes ('image') and stage timings ('timing')
+        """
+        image = self.service.generate(
             model_id=model_id,
             prompt=prompt,
             height=height,
@@ -201,6 +442,7 @@ class DiffusersBackend_A10G:
             guidance_scale=guidance_scale,
             seed=seed,
         )
+        return {"image": image, "timing": self.service.last_timing}
 
     @modal.method()
     def health(self) -> dict:
@@ -225,7 +467,7 @@ class DiffusersBackend_L40S:
         # Import here to avoid torch dependency in gateway
         from backends.diffusers.backend import DiffusersService
 
-        self.service = DiffusersService(diffusers_config)
+        self.service = DiffusersService(diffusers_config, gpu_tier="l40s")
         self.service.start()
 
     @modal.method()
@@ -239,8 +481,12 @@ class DiffusersBackend_L40S:
         guidance_scale: float | None = None,
         seed: int | None = None,
     ) -> dict:
-        """Generate image from text prompt."""
-        return self.service.generate(
+        """Generate image from text prompt.
+
+        Returns:
+            Dict with the PNG bytes ('image') and stage timings ('timing')
+        """
+        image = self.service.generate(
             model_id=model_id,
             prompt=prompt,
             height=height,
@@ -249,6 +495,7 @@ class DiffusersBackend_L40S:
             guidance_scale=guidance_scale,
             seed=seed,
         )
+        return {"image": image, "timing": self.service.last_timing}
 
     @modal.method()
     def health(self) -> dict:
@@ -262,15 +509,173 @@ class DiffusersBackend_L40S:
 
 gateway = FastAPI(title="Personal Model Garden")
 
+# Ollama path families reported as separate routes; anything else is "other"
+OLLAMA_ROUTES = {
+    "api/chat",
+    "api/generate",
+    "api/tags",
+    "api/show",
+    "api/ps",
+    "api/version",
+    "api/embed",
+    "api/embeddings",
+    "api/event_logging",
+    "v1/models",
+    "v1/chat/completions",
+    "v1/completions",
+    "v1/embeddings",
+    "v1/messages",
+    "v1/messages/count_tokens",
+    "v1/files",
+    "v1/batches",
+}
+GATEWAY_ROUTES = {"/", "/health", "/metrics", "/diffusers/models", "/diffusers/generate"}
+
+
+def route_label(path: str) -> str:
+    """Map a request path to a bounded route label for metrics."""
+    if path.startswith("/ollama/"):
+        family = path[len("/ollama/"):]
+        if family.startswith("api/event_logging"):
+            family = "api/event_logging"
+        elif family.startswith(("v1/files", "v1/batches")):
+            family = "/".join(family.split("/")[:2])
+        return "/ollama/" + (family if family in OLLAMA_ROUTES else "other")
+    return path if path in GATEWAY_ROUTES else "other"
+
+
+# Accept-Encoding / Content-Encoding; innermost, so metrics count bytes on the wire
+if GATEWAY_COMPRESSION:
+    gateway.add_middleware(
+        CompressionMiddleware,
+        minimum_size=GATEWAY_COMPRESS_MIN_BYTES,
+        offload_size=GATEWAY_COMPRESS_OFFLOAD_BYTES,
+        max_request_size=GATEWAY_MAX_DECOMPRESSED_MB * 1024 * 1024,
+    )
+# Per-route latency, backend time, time to first byte, sizes, errors and in-flight requests
+metrics = GatewayMetrics()
+gateway.add_middleware(MetricsMiddleware, metrics=metrics, route_label=route_label)
+# Server-Timing breakdown and X-Trace-Id on every response
+gateway.add_middleware(ServerTimingMiddleware)
+# Response status for captured requests
+if GATEWAY_CAPTURE:
+    gateway.add_middleware(TraceStatusMiddleware)
+
+# Per-backend concurrency caps and bounded wait queues
+max_queue_wait = GATEWAY_MAX_QUEUE_WAIT or None
+ollama_admission = AdmissionController("ollama", OLLAMA_MAX_CONCURRENT, OLLAMA_MAX_QUEUE, max_queue_wait)
+ollama_cpu_admission = AdmissionController("ollama-cpu", OLLAMA_CPU_MAX_CONCURRENT, OLLAMA_CPU_MAX_QUEUE, max_queue_wait)
+diffusers_admission = {
+    "a10g": AdmissionController(
+        "diffusers-a10g", DIFFUSERS_A10G_MAX_CONCURRENT, DIFFUSERS_A10G_MAX_QUEUE, max_queue_wait
+    ),
+    "l40s": AdmissionController(
+        "diffusers-l40s", DIFFUSERS_L40S_MAX_CONCURRENT, DIFFUSERS_L40S_MAX_QUEUE, max_queue_wait
+    ),
+}
+
+# Client deadline: seconds the client is willing to wait for a response
+DEADLINE_HEADER = "x-request-timeout"
+
+
+def request_deadline(request: Request) -> float | None:
+    """Event-loop time after which the client no longer wants the response.
+
+    Raises:
+        ValueError: The deadline header is not a number of seconds
+    """
+    timeout = request.headers.get(DEADLINE_HEADER)
+    if timeout is None:
+        return None
+    return asyncio.get_running_loop().time() + float(timeout)
+
+
+# Created on the first captured request so importing serve.py never writes a trace
+trace_recorder: TraceRecorder | None = None
+
+
+async def capture_request(request: Request, body: dict | None) -> None:
+    """Record the request's shape (never its text) when GATEWAY_CAPTURE is on."""
+    global trace_recorder
+    if trace_recorder is None:
+        trace_recorder = TraceRecorder(GATEWAY_CAPTURE_DIR)
+    body_bytes = len(await request.body()) if request.method == "POST" else 0
+    entry = trace_recorder.start(request.method, request.url.path, body, body_bytes)
+    # Written by TraceStatusMiddleware with the response status
+    request.state.trace_finish = lambda status: trace_recorder.finish(entry, status)
+
+
+@gateway.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    """Shed load with 429 (queue full) or 503 (deadline expired) and Retry-After."""
+    return JSONResponse(
+        content={"error": str(exc), "backend": exc.pool},
+        status_code=exc.status_code,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@gateway.exception_handler(ClientDisconnected)
+async def client_disconnected(request: Request, exc: ClientDisconnected):
+    """Nobody reads this response; 499 (client closed request) only shows up in metrics."""
+    return Response(status_code=499)
+
+
+admission_queued = metrics.registry.gauge(
+    "gateway_admission_queued", "Requests waiting for a backend slot", ("pool",)
+)
+admission_in_flight = metrics.registry.gauge(
+    "gateway_admission_in_flight", "Requests holding a backend slot", ("pool",)
+)
+
+
+def collect_admission() -> None:
+    """Refresh the admission gauges at scrape time."""
+    model_admission = (pool.admission for pool in model_pools.values())
+    for pool in (ollama_admission, *model_admission, ollama_cpu_admission, *diffusers_admission.values()):
+        admission_queued.set(pool.name, value=pool.queued)
+        admission_in_flight.set(pool.name, value=pool.in_flight)
+
+
+metrics.registry.collectors.append(collect_admission)
+
+
+@gateway.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics for the gateway (does not wake any backend)."""
+    return Response(content=metrics.registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 
 @gateway.get("/health")
 async def health():
-    """Gateway health check (does not check backends to avoid cold starts)."""
+    """Gateway health check (does not check backends to avoid cold starts).
+
+    Includes each backend pool's queue depth and wait times.
+    """
     return {
         "status": "healthy",
         "backends": {
-            "ollama": {"status": "available"},
-            "diffusers": {"status": "available"},
+            "ollama": {
+                "status": "available",
+                "admission": ollama_admission.stats(),
+                "model_pools": {
+                    model: {
+                        "max_containers": pool.max_containers,
+                        "scaledown_window": pool.scaledown_window,
+                        "admission": pool.admission.stats(),
+                    }
+                    for model, pool in model_pools.items()
+                },
+            },
+            "ollama-cpu": {
+                "status": "available" if CPU_EMBED_MODELS else "disabled",
+                "models": sorted(CPU_EMBED_MODELS),
+                "admission": ollama_cpu_admission.stats(),
+            },
+            "diffusers": {
+                "status": "available",
+                "admission": {tier: pool.stats() for tier, pool in diffusers_admission.items()},
+            },
         },
     }
 
@@ -283,6 +688,7 @@ async def root():
         "architecture": "Gateway (CPU) + Backends (GPU)",
         "endpoints": {
             "/health": "Gateway health check",
+            "/metrics": "Prometheus metrics",
             "/ollama/*": "Wildcard proxy to Ollama (native + OpenAI-compatible API)",
             "/diffusers/models": "List supported diffusers models",
             "/diffusers/generate": "Generate images (HuggingFace-style API)",
@@ -293,6 +699,7 @@ async def root():
             "POST /ollama/api/chat": "Chat completion (native)",
             "GET /ollama/v1/models": "List models (OpenAI)",
             "POST /ollama/v1/chat/completions": "Chat completion (OpenAI)",
+            "POST /ollama/v1/batches": "Run a file of requests as a batch job (OpenAI)",
         },
         "diffusers_examples": {
             "GET /diffusers/models": "List supported models with GPU tier",
@@ -301,6 +708,301 @@ async def root():
     }
 
 
+# =============================================================================
+# Batch Jobs (OpenAI-style /v1/files and /v1/batches)
+# =============================================================================
+
+
+async def file_record(file_id: str) -> dict | None:
+    """The stored record ({"file": file object, "path": path in the volume}) of a file."""
+    if not file_id.startswith("file_"):
+        return None
+    return await batch_records.get.aio(file_id)
+
+
+async def batch_record(batch_id: str) -> dict | None:
+    """A batch object, showing a cancellation its job has not picked up yet."""
+    if not batch_id.startswith("batch_"):
+        return None
+    batch = await batch_records.get.aio(batch_id)
+    if batch is not None and batch["status"] not in FINAL_STATUSES and batch["status"] != "cancelling":
+        cancelling_at = await batch_records.get.aio(f"cancel:{batch_id}")
+        if cancelling_at is not None:
+            batch = {**batch, "status": "cancelling", "cancelling_at": cancelling_at}
+    return batch
+
+
+@gateway.post("/ollama/v1/files")
+async def create_file(request: Request):
+    """Upload a batch input file (multipart form with `file` and `purpose=batch`)."""
+    async with request.form(max_files=1) as form:
+        upload = form.get("file")
+        if form.get("purpose") != "batch":
+            return JSONResponse(content={"error": "purpose must be 'batch'"}, status_code=400)
+        if not isinstance(upload, UploadFile):
+            return JSONResponse(content={"error": "file is required"}, status_code=400)
+        if upload.size > GATEWAY_BATCH_MAX_FILE_MB * 1024 * 1024:
+            return JSONResponse(
+                content={"error": f"file exceeds {GATEWAY_BATCH_MAX_FILE_MB} MB"},
+                status_code=413,
+            )
+        file = {
+            "id": new_id("file"),
+            "object": "file",
+            "bytes": upload.size,
+            "created_at": int(time.time()),
+            "filename": upload.filename,
+            "purpose": "batch",
+        }
+        path = f"files/{file['id']}.jsonl"
+        async with batch_volume.batch_upload.aio() as volume_upload:
+            volume_upload.put_file(upload.file, f"/{path}")
+    await batch_records.put.aio(file["id"], {"file": file, "path": path})
+    return file
+
+
+@gateway.get("/ollama/v1/files/{file_id}")
+async def retrieve_file(file_id: str):
+    """Describe an uploaded file or a batch's output or error file."""
+    record = await file_record(file_id)
+    if record is None:
+        return JSONResponse(content={"error": f"No such file: {file_id}"}, status_code=404)
+    return record["file"]
+
+
+@gateway.get("/ollama/v1/files/{file_id}/content")
+async def file_content(file_id: str):
+    """Stream a file's contents (JSONL) from the batch volume."""
+    record = await file_record(file_id)
+    if record is None:
+        return JSONResponse(content={"error": f"No such file: {file_id}"}, status_code=404)
+    return StreamingResponse(batch_volume.read_file.aio(f"/{record['path']}"), media_type="application/jsonl")
+
+
+@gateway.post("/ollama/v1/batches")
+async def create_batch(request: Request):
+    """Create a batch from an uploaded input file and start its job."""
+    body = await request.json()
+    endpoint = body.get("endpoint")
+    if endpoint not in BATCH_ENDPOINTS:
+        return JSONResponse(
+            content={"error": f"endpoint must be one of {', '.join(BATCH_ENDPOINTS)}"},
+            status_code=400,
+        )
+    input_file_id = body.get("input_file_id")
+    if not isinstance(input_file_id, str) or await file_record(input_file_id) is None:
+        return JSONResponse(content={"error": f"No such file: {input_file_id}"}, status_code=404)
+    completion_window = body.get("completion_window", "24h")
+    if completion_window not in COMPLETION_WINDOWS:
+        return JSONResponse(
+            content={"error": f"completion_window must be one of {', '.join(COMPLETION_WINDOWS)}"},
+            status_code=400,
+        )
+    batch = new_batch(input_file_id, endpoint, completion_window, body.get("metadata"))
+    await batch_records.put.aio(batch["id"], batch)
+    await run_batch.spawn.aio(batch["id"])
+    return batch
+
+
+@gateway.get("/ollama/v1/batches")
+async def list_batches(limit: int = 20, after: str | None = None):
+    """List batches, newest first, paginated with `limit` and `after`.
+
+    Batch IDs sort in creation order (see new_id), so a page starts right
+    after the `after` ID even if that batch is gone. The Dict has no ordered
+    index, so every call reads all its records: O(batches + files).
+    """
+    batches = [
+        value async for _, value in batch_records.items.aio()
+        if isinstance(value, dict) and value.get("object") == "batch"
+    ]
+    batches.sort(key=lambda batch: batch["id"], reverse=True)
+    if after is not None:
+        batches = [batch for batch in batches if batch["id"] < after]
+    page = batches[:limit]
+    return {
+        "object": "list",
+        "data": page,
+        "first_id": page[0]["id"] if page else None,
+        "last_id": page[-1]["id"] if page else None,
+        "has_more": len(batches) > limit,
+    }
+
+
+@gateway.get("/ollama/v1/batches/{batch_id}")
+async def retrieve_batch(batch_id: str):
+    """Report a batch's status and request counts."""
+    batch = await batch_record(batch_id)
+    if batch is None:
+        return JSONResponse(content={"error": f"No such batch: {batch_id}"}, status_code=404)
+    return batch
+
+
+@gateway.post("/ollama/v1/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    """Ask a batch's job to stop; results so far stay available in its files."""
+    batch = await batch_record(batch_id)
+    if batch is None:
+        return JSONResponse(content={"error": f"No such batch: {batch_id}"}, status_code=404)
+    if batch["status"] in FINAL_STATUSES:
+        return JSONResponse(
+            content={"error": f"Cannot cancel a batch with status {batch['status']}"},
+            status_code=409,
+        )
+    if batch["status"] == "cancelling":
+        return batch
+    cancelling_at = int(time.time())
+    await batch_records.put.aio(f"cancel:{batch_id}", cancelling_at)
+    return {**batch, "status": "cancelling", "cancelling_at": cancelling_at}
+
+
+async def fail_batch(batch: dict, code: str, message: str, line: int | None = None) -> dict:
+    """Save a batch as failed with one error."""
+    error = {"code": code, "message": message, "param": None, "line": line}
+    batch.update(status="failed", failed_at=int(time.time()), errors={"object": "list", "data": [error]})
+    await batch_records.put.aio(batch["id"], batch)
+    return batch
+
+
+async def execute_batch(batch_id: str) -> dict | None:
+    """Run a batch's requests, resuming from the results already in its files.
+
+    Requests go to the same pools as gateway traffic (dedicated model pools
+    and the CPU embedding pool included). Each pool gets at most as many of
+    them at once as it has slots, and the job keeps every one of those slots
+    busy unless GATEWAY_BATCH_CONCURRENCY sets a lower total. At the batch's
+    `expires_at` the job stops, and the requests without a result get a
+    `batch_expired` error line.
+
+    Returns:
+        The batch object as finally saved (None for an unknown batch)
+    """
+    batch = await batch_records.get.aio(batch_id)
+    if batch is None or batch["status"] in FINAL_STATUSES:
+        return batch
+    await batch_volume.reload.aio()
+    input_file = await batch_records.get.aio(batch["input_file_id"])
+    if input_file is None:
+        return await fail_batch(batch, "invalid_request", f"No such file: {batch['input_file_id']}")
+    data = await asyncio.to_thread(Path(GATEWAY_BATCH_DIR, input_file["path"]).read_bytes)
+    try:
+        requests = parse_batch_input(data, batch["endpoint"])
+    except BatchInputError as e:
+        return await fail_batch(batch, "invalid_request", e.reason, e.line or None)
+    if batch["status"] == "validating":
+        batch.update(status="in_progress", in_progress_at=int(time.time()))
+
+    path = batch["endpoint"].lstrip("/")
+
+    def route(body: dict) -> tuple[bool, ModelPool | None, AdmissionController]:
+        cpu_pool = uses_cpu_pool("POST", path, body)
+        pool = None if cpu_pool else model_pool(body)
+        return cpu_pool, pool, pool_admission(cpu_pool, pool)
+
+    capacity = {}
+    for request in requests:
+        admission = route(request["body"])[2]
+        capacity[admission.name] = admission.max_concurrent
+    slots = {name: asyncio.Semaphore(size) for name, size in capacity.items()}
+
+    async def call(request: dict) -> tuple[int, Any]:
+        body = {**request["body"], "stream": False}
+        cpu_pool, pool, admission = route(body)
+        async with slots[admission.name]:
+            with ollama_backend(cpu_pool, prefix_key(path, body), pool) as backend:
+                result = await call_remote(backend.proxy, "POST", batch["endpoint"], body)
+        return result["status_code"], result["body"]
+
+    expired = False
+
+    async def checkpoint(counts: dict) -> bool:
+        nonlocal expired
+        await batch_volume.commit.aio()
+        cancelling_at = await batch_records.get.aio(f"cancel:{batch_id}")
+        if cancelling_at is not None and batch["status"] != "cancelling":
+            batch.update(status="cancelling", cancelling_at=cancelling_at)
+        # Batches created before expiry was enforced have no expires_at
+        expired = cancelling_at is None and time.time() >= (batch.get("expires_at") or float("inf"))
+        batch["request_counts"] = counts
+        await batch_records.put.aio(batch_id, batch)
+        return cancelling_at is not None or expired
+
+    directory = Path(GATEWAY_BATCH_DIR, "batches", batch_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    runner = BatchRunner(
+        str(directory / "output.jsonl"),
+        str(directory / "errors.jsonl"),
+        GATEWAY_BATCH_CONCURRENCY or sum(capacity.values()),
+    )
+    finished = await runner.run(requests, call, checkpoint, GATEWAY_BATCH_CHECKPOINT)
+    if expired:
+        await asyncio.to_thread(runner.expire, requests)
+        batch["request_counts"] = dict(runner.counts)
+
+    now = int(time.time())
+    batch["finalizing_at"] = now
+    for field, result_path in (("output_file_id", runner.output_path), ("error_file_id", runner.error_path)):
+        size = os.path.getsize(result_path)
+        if size:
+            file = {
+                "id": new_id("file"),
+                "object": "file",
+                "bytes": size,
+                "created_at": now,
+                "filename": f"{batch_id}_{Path(result_path).name}",
+                "purpose": "batch_output",
+            }
+            record = {"file": file, "path": os.path.relpath(result_path, GATEWAY_BATCH_DIR)}
+            await batch_records.put.aio(file["id"], record)
+            batch[field] = file["id"]
+    if finished:
+        batch.update(status="completed", completed_at=now)
+    elif expired:
+        batch.update(status="expired", expired_at=now)
+    else:
+        batch.update(status="cancelled", cancelled_at=now)
+    await batch_volume.commit.aio()
+    await batch_records.put.aio(batch_id, batch)
+    return batch
+
+
+# Retries of a batch job after a crash, a timeout or an error
+BATCH_JOB_RETRIES = 5
+
+
+async def run_batch_attempt(batch_id: str) -> None:
+    """One attempt at a batch job (see execute_batch).
+
+    An error is raised again so Modal retries the job, except on the last
+    attempt, which saves the batch as failed instead of leaving it in
+    progress for good. Attempts are counted in the Dict, since Modal does
+    not tell a function which attempt it is.
+    """
+    attempt = await batch_records.get.aio(f"attempts:{batch_id}", 0) + 1
+    await batch_records.put.aio(f"attempts:{batch_id}", attempt)
+    try:
+        await execute_batch(batch_id)
+    except Exception as e:
+        if attempt <= BATCH_JOB_RETRIES:
+            raise
+        print(f"Batch {batch_id} failed on its last attempt: {e!r}")
+        batch = await batch_records.get.aio(batch_id)
+        if batch is not None and batch["status"] not in FINAL_STATUSES:
+            await fail_batch(batch, "batch_error", str(e) or type(e).__name__)
+
+
+@app.function(
+    image=gateway_image,
+    volumes={GATEWAY_BATCH_DIR: batch_volume},
+    timeout=GATEWAY_BATCH_TIMEOUT,
+    # A crashed or timed-out job starts again and resumes from its files
+    retries=modal.Retries(max_retries=BATCH_JOB_RETRIES, initial_delay=10.0, backoff_coefficient=2.0),
+)
+async def run_batch(batch_id: str) -> None:
+    """Run one batch job in a CPU container of its own (see run_batch_attempt)."""
+    await run_batch_attempt(batch_id)
+
+
 # =============================================================================
 # Ollama Wildcard Proxy (forwards all /ollama/* to backend)
 # =============================================================================
@@ -319,28 +1021,346 @@ GATEWAY_ONLY_PATHS = {
     "api/event_logging/batch",
 }
 
+# Metadata paths answered from the backend's snapshot when one exists
+SNAPSHOT_PATHS = {
+    ("GET", "api/tags"),
+    ("GET", "v1/models"),
+    ("POST", "api/show"),
+}
+
+metadata_snapshot = MetadataSnapshotCache(
+    lambda: ollama_metadata.get.aio(ollama_config.metadata_key),
+    refresh_seconds=GATEWAY_METADATA_REFRESH,
+)
+
+
+async def metadata_from_snapshot(method: str, path: str, body: dict | None) -> dict | None:
+    """Answer a metadata request from the snapshot, or None to use the backend."""
+    snapshot = await metadata_snapshot.get()
+    if snapshot is None:
+        return None
+    if path == "api/tags":
+        return snapshot["tags"]
+    if path == "v1/models":
+        return snapshot["v1_models"]
+    # Verbose show output (full tensor list) is not part of the snapshot
+    if not body or body.get("verbose"):
+        return None
+    name = body.get("model") or body.get("name")
+    return snapshot["show"].get(normalize_model_name(name)) if name else None
+
+
+# Exact token counts for count_tokens (tokenizers load lazily per model family)
+token_counter = TokenCounter()
+
+# Opt-in cache for deterministic non-streaming completions
+response_cache = (
+    ResponseCache(GATEWAY_RESPONSE_CACHE_MB * 1024 * 1024, GATEWAY_RESPONSE_CACHE_TTL)
+    if GATEWAY_RESPONSE_CACHE_MB > 0
+    else None
+)
+
+# Identical concurrent backend calls share one in-flight request
+inflight = SingleFlight()
+
+# Idempotent POST paths that are safe to coalesce (GETs always are)
+COALESCE_PATHS = {
+    "api/show",
+    "api/embed",
+    "api/embeddings",
+    "v1/embeddings",
+}
+
+
+# Embedding endpoints that accept encoding_format / embedding_dtype
+EMBEDDING_PATHS = {"api/embed", "api/embeddings", "v1/embeddings"}
+
+# Embedding models served by OllamaCPUBackend instead of the GPU backend
+CPU_EMBED_MODELS = {normalize_model_name(model) for model in OLLAMA_CPU_EMBED_MODELS}
+
+
+def uses_cpu_pool(method: str, path: str, body: dict | None) -> bool:
+    """Check if a request is an embedding for a model assigned to the CPU pool."""
+    if method != "POST" or path not in EMBEDDING_PATHS or not body:
+        return False
+    model = body.get("model")
+    return isinstance(model, str) and normalize_model_name(model) in CPU_EMBED_MODELS
+
+
+def embedding_response(body: dict, encoding: str, dtype: str) -> Response:
+    """Encode an embedding response as base64 JSON or a raw float matrix."""
+    try:
+        if encoding == "binary":
+            content, headers = embeddings_to_binary(body, dtype)
+            return Response(content=content, media_type="application/octet-stream", headers=headers)
+        return JSONResponse(content=embeddings_to_base64(body, dtype))
+    except (KeyError, TypeError, ValueError) as e:
+        return JSONResponse(content={"error": f"Cannot encode embeddings: {e}"}, status_code=502)
+
+
+def is_coalescable(method: str, path: str, body: dict | None) -> bool:
+    """Check if identical concurrent requests may share one backend call.
+
+    Sampling requests are only shared when deterministic, so concurrent
+    callers never receive one another's random completion.
+    """
+    if method == "GET":
+        return True
+    return method == "POST" and (path in COALESCE_PATHS or is_deterministic(body))
+
+
+def wants_cache_bypass(request: Request) -> bool:
+    """Check if the client asked to skip the response cache."""
+    if request.headers.get("x-cache-bypass", "").lower() in ("1", "true"):
+        return True
+    return "no-cache" in request.headers.get("cache-control", "").lower()
+
+
+# Routes requests across OLLAMA_AFFINITY_REPLICAS parameterized backend instances.
+# A replica scales to OLLAMA_MAX_CONTAINERS containers, so it overflows only once
+# all of them could be busy; affinity picks the replica, Modal the container.
+affinity_router = AffinityRouter(OLLAMA_AFFINITY_REPLICAS, capacity=OLLAMA_MAX_CONTAINERS * OLLAMA_NUM_PARALLEL)
 
-def estimate_tokens(body: dict | None) -> int:
-    """Estimate token count from message content (~4 chars per token)."""
-    if not body:
-        return 0
-    total_chars = 0
-    # Count characters in messages
-    for msg in body.get("messages", []):
-        content = msg.get("content", "")
-        if isinstance(content, str):
-            total_chars += len(content)
-        elif isinstance(content, list):
-            # Handle multi-part content (text, images, etc.)
-            for part in content:
-                if isinstance(part, dict) and part.get("type") == "text":
-                    total_chars += len(part.get("text", ""))
-    # Count system prompt if present
-    system = body.get("system", "")
-    if isinstance(system, str):
-        total_chars += len(system)
-    # Rough estimate: ~4 characters per token
-    return max(1, total_chars // 4)
+
+class ModelPool:
+    """Ollama containers dedicated to one model.
+
+    A pool is an `OllamaBackend(model=...)` instance per replica, with its
+    own scaling limits, affinity router and admission queue, so traffic for
+    other models neither evicts its weights nor takes its slots.
+    """
+
+    def __init__(self, model: str, max_containers: int, scaledown_window: int):
+        self.model = model
+        self.max_containers = max_containers
+        self.scaledown_window = scaledown_window
+        self.router = AffinityRouter(OLLAMA_AFFINITY_REPLICAS, capacity=max_containers * OLLAMA_NUM_PARALLEL)
+        self.admission = AdmissionController(
+            f"ollama-{model}",
+            max_containers * OLLAMA_NUM_PARALLEL * OLLAMA_AFFINITY_REPLICAS,
+            OLLAMA_MAX_QUEUE,
+            max_queue_wait,
+        )
+        # Built on first use, so the class variant is looked up once per gateway
+        self._cls = None
+
+    def backend(self, replica: int):
+        """The pool's backend instance for `replica`."""
+        if self._cls is None:
+            self._cls = OllamaBackend.with_options(
+                max_containers=self.max_containers, scaledown_window=self.scaledown_window
+            )
+        return self._cls(replica=replica, model=self.model)
+
+
+def _pool_setting(values: dict[str, int], model: str, default: int) -> int:
+    for name, value in values.items():
+        if normalize_model_name(name) == model:
+            return value
+    return default
+
+
+model_pools = {
+    model: ModelPool(
+        model,
+        _pool_setting(OLLAMA_POOL_MAX_CONTAINERS, model, OLLAMA_MAX_CONTAINERS),
+        _pool_setting(OLLAMA_POOL_SCALEDOWN, model, OLLAMA_SCALEDOWN),
+    )
+    for model in sorted(POOL_MODELS)
+}
+
+
+def model_pool(body: dict | None) -> ModelPool | None:
+    """The dedicated pool for the request's model, or None for the shared pool."""
+    model = (body.get("model") or body.get("name")) if body else None
+    if not isinstance(model, str) or not model:
+        return None
+    return model_pools.get(normalize_model_name(model))
+
+
+def pool_admission(cpu_pool: bool, pool: ModelPool | None) -> AdmissionController:
+    """The admission queue of the pool a request is routed to."""
+    if cpu_pool:
+        return ollama_cpu_admission
+    return pool.admission if pool is not None else ollama_admission
+
+
+@contextlib.contextmanager
+def ollama_backend(cpu_pool: bool, key: str | None, pool: ModelPool | None = None):
+    """Pick the backend for one non-streaming call, tracking replica load until it ends.
+
+    CPU pool calls go to OllamaCPUBackend; GPU calls go to the replica the
+    affinity router of `pool` (default: the shared pool) picks for `key`
+    (None: any replica with spare capacity).
+    """
+    if cpu_pool:
+        yield OllamaCPUBackend()
+        return
+    router = pool.router if pool is not None else affinity_router
+    replica = router.choose(key)
+    router.acquire(replica)
+    try:
+        yield pool.backend(replica) if pool is not None else OllamaBackend(replica=replica)
+    finally:
+        router.release(replica)
+
+
+# Backend cancellations still being sent, referenced until they finish
+pending_cancellations: set[asyncio.Task] = set()
+
+
+def send_cancellation(request) -> None:
+    """Send a cancellation in the background, so a cancelled task can still send it."""
+
+    async def send():
+        try:
+            await request
+        except Exception as e:
+            print(f"Failed to cancel backend call: {e}")
+
+    task = asyncio.ensure_future(send())
+    pending_cancellations.add(task)
+    task.add_done_callback(pending_cancellations.discard)
+
+
+async def call_remote(method, *args):
+    """Call a backend method; cancelling the caller cancels the backend input too.
+
+    An abandoned `.remote()` call keeps running in its container. With
+    GATEWAY_CANCEL_ON_DISCONNECT the input is spawned instead, and its
+    FunctionCall is cancelled along with the caller: the container's handler
+    gets CancelledError, which closes its Ollama connection and stops
+    generation.
+    """
+    if not GATEWAY_CANCEL_ON_DISCONNECT:
+        return await method.remote.aio(*args)
+    call = await method.spawn.aio(*args)
+    try:
+        return await call.get.aio()
+    except asyncio.CancelledError:
+        send_cancellation(call.cancel.aio())
+        raise
+
+
+def cancel_stream(cancel_key: str) -> None:
+    """Tell the backend to stop the stream `cancel_key` (it outlives a closed `.remote_gen()`)."""
+    send_cancellation(ollama_cancellations.put.aio(True, partition=cancel_key, partition_ttl=OLLAMA_TIMEOUT))
+
+
+# Passthrough mode: the only body fields the gateway reads (routing, caching, affinity)
+PEEK_FIELDS = ("model", "name", "stream", "system", "options", "temperature", "seed", *EMBEDDING_OUTPUT_FIELDS)
+PEEK_PREFIXES = {"messages": PREFIX_MESSAGES}
+# Paths answered from the full body in the gateway itself, never passed through
+PARSED_PATHS = {"api/show", "v1/messages/count_tokens"}
+
+# Embedding paths whose `input` list is split into batches, deduplicated and cached
+PIPELINE_PATHS = {"api/embed", "v1/embeddings"}
+embedding_pipeline = (
+    EmbeddingPipeline(
+        GATEWAY_EMBED_BATCH_SIZE,
+        GATEWAY_EMBED_CONCURRENCY or OLLAMA_MAX_CONCURRENT,
+        EmbeddingStore(GATEWAY_EMBED_CACHE_DIR) if GATEWAY_EMBED_CACHE else None,
+    )
+    if GATEWAY_EMBED_BATCH_SIZE > 0 or GATEWAY_EMBED_CACHE
+    else None
+)
+
+
+async def embed_in_batches(
+    path: str, body: dict, deadline: float | None, cpu_pool: bool = False, pool: ModelPool | None = None
+) -> dict:
+    """Answer an embedding request through the pipeline.
+
+    Each batch is a separate backend call with its own admission slot, sent
+    to whichever replica has spare capacity (or to the CPU pool), so
+    batches of one request spread across containers.
+
+    Returns:
+        A backend-call result: 'status_code', 'body' in the path's response
+        format, 'queue' (longest batch wait), 'round_trip' and the
+        pipeline's 'embed' statistics
+    """
+    options = {k: v for k, v in body.items() if k != "input"}
+    # Fields that change the vectors; keep_alive and user do not
+    namespace = {k: v for k, v in options.items() if k not in ("keep_alive", "user")}
+    namespace["model"] = normalize_model_name(body["model"])
+    texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+    waits = [0.0]
+
+    admission = pool_admission(cpu_pool, pool)
+
+    async def call_batch(batch: list[str]) -> dict:
+        async with admission.slot(deadline) as ticket:
+            with ollama_backend(cpu_pool, None, pool) as backend:
+                started = time.perf_counter()
+                try:
+                    result = await call_remote(backend.proxy, "POST", f"/{path}", {**options, "input": batch})
+                finally:
+                    metrics.backend_seconds.observe(time.perf_counter() - started, route_label(f"/ollama/{path}"), "")
+        waits.append(ticket.wait)
+        if result["status_code"] != 200:
+            raise EmbeddingBatchFailed(result["status_code"], result["body"])
+        response = result["body"]
+        if path == "v1/embeddings":
+            response["data"].sort(key=lambda item: item["index"])
+            usage = response.get("usage") or {}
+            return {"embeddings": embedding_vectors(response), "prompt_eval_count": usage.get("prompt_tokens")}
+        return response
+
+    started = time.perf_counter()
+    try:
+        vectors, stats = await embedding_pipeline.embed(namespace, texts, call_batch)
+    except EmbeddingBatchFailed as e:
+        return {"status_code": e.status_code, "body": e.body, "queue": max(waits),
+                "round_trip": time.perf_counter() - started}
+    if path == "v1/embeddings":
+        tokens = stats["prompt_eval_count"]
+        content = {
+            "object": "list",
+            "data": [{"object": "embedding", "embedding": v, "index": i} for i, v in enumerate(vectors)],
+            "model": body["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+    else:
+        content = {"model": body["model"], "embeddings": vectors, **{f: stats[f] for f in SUMMED_FIELDS}}
+    return {"status_code": 200, "body": content, "queue": max(waits),
+            "round_trip": time.perf_counter() - started, "embed": stats}
+
+
+async def stream_from_replica(
+    replica: int,
+    path: str,
+    body: dict,
+    ticket: Ticket,
+    raw: bytes | None = None,
+    content_type: str | None = None,
+    pool: ModelPool | None = None,
+):
+    """Stream from one backend replica, holding its admission slot until done.
+
+    With `raw`, the undecoded request body is forwarded and `body` only
+    supplies the model name. `pool` is the model's dedicated pool (None for
+    the shared one). A stream left unfinished (client disconnect) is
+    cancelled in the backend when GATEWAY_CANCEL_ON_DISCONNECT is on.
+    """
+    router = pool.router if pool is not None else affinity_router
+    router.acquire(replica)
+    started = time.perf_counter()
+    args = (path, body) if raw is None else (path, body, raw, content_type)
+    cancel_key = uuid.uuid4().hex if GATEWAY_CANCEL_ON_DISCONNECT else None
+    kwargs = {"cancel_key": cancel_key} if cancel_key else {}
+    backend = pool.backend(replica) if pool is not None else OllamaBackend(replica=replica)
+    finished = False
+    try:
+        async for chunk in backend.stream_proxy.remote_gen.aio(*args, **kwargs):
+            yield chunk
+        finished = True
+    finally:
+        if cancel_key and not finished:
+            cancel_stream(cancel_key)
+        metrics.backend_seconds.observe(time.perf_counter() - started, route_label(f"/ollama{path}"), "")
+        router.release(replica)
+        ticket.release()
 
 
 @gateway.api_route("/ollama/{path:path}", methods=["GET", "POST", "DELETE"])
@@ -354,26 +1374,157 @@ async def ollama_proxy(path: str, request: Request):
     if path in GATEWAY_ONLY_PATHS or path.startswith("api/event_logging"):
         return JSONResponse(content={"status": "ok"}, status_code=200)
 
+    timing = request.state.server_timing
     method = request.method
     body = None
+    # Passthrough forwards these bytes as-is; `body` then holds only PEEK_FIELDS
+    raw = None
+    content_type = request.headers.get("content-type")
+    passthrough = GATEWAY_PASSTHROUGH and path not in PARSED_PATHS
     if method == "POST":
-        body = await request.json()
+        parse_started = time.perf_counter()
+        if passthrough:
+            raw = await request.body()
+            may_pipeline = embedding_pipeline is not None and path in PIPELINE_PATHS
+            try:
+                body = peek_json(raw, (*PEEK_FIELDS, "input") if may_pipeline else PEEK_FIELDS, PEEK_PREFIXES) or None
+            except ValueError:
+                return JSONResponse(content={"error": "request body must be a JSON object"}, status_code=400)
+            # The embedding pipeline rewrites `input` per batch, so it needs the parsed body
+            if may_pipeline and body and embedding_pipeline.applies_to(body.get("input")):
+                body, raw, passthrough = json.loads(raw), None, False
+        else:
+            body = await request.json()
+        timing.add("parse", time.perf_counter() - parse_started)
+    if GATEWAY_CAPTURE:
+        # Capture records message counts and token estimates, so it needs the full body
+        await capture_request(request, json.loads(raw) if raw else body)
+
+    try:
+        deadline = request_deadline(request)
+    except ValueError:
+        return JSONResponse(content={"error": "X-Request-Timeout must be a number of seconds"}, status_code=400)
+
+    # Compact embedding encodings are produced here from Ollama's float lists
+    embedding_output = None
+    if method == "POST" and path in EMBEDDING_PATHS:
+        try:
+            embedding_output = requested_embedding_output(body, request.headers.get("accept", ""))
+        except ValueError as e:
+            return JSONResponse(content={"error": str(e)}, status_code=400)
+        if embedding_output is not None:
+            # The gateway's own fields are stripped, so the body is parsed even in passthrough mode
+            if passthrough:
+                body, raw, passthrough = (json.loads(raw) if raw else None), None, False
+            body = {k: v for k, v in (body or {}).items() if k not in EMBEDDING_OUTPUT_FIELDS}
+    # Large input lists are split into batches across containers (and served from the store)
+    pipelined = (
+        embedding_pipeline is not None
+        and method == "POST"
+        and path in PIPELINE_PATHS
+        and isinstance((body or {}).get("model"), str)
+        and embedding_pipeline.applies_to(body.get("input"))
+    )
+
+    # Serve model metadata from the snapshot without waking the GPU
+    if (method, path) in SNAPSHOT_PATHS:
+        content = await metadata_from_snapshot(method, path, body)
+        if content is not None:
+            return JSONResponse(content=content, headers={"X-Cache": "SNAPSHOT"})
 
     # Handle token counting in gateway (Ollama doesn't support this endpoint)
     if path == "v1/messages/count_tokens":
-        return JSONResponse(content={"input_tokens": estimate_tokens(body)}, status_code=200)
-
-    # Streaming requests use .remote_gen() for true SSE support
-    if is_streaming_request(body):
+        # Tokenize off the event loop; only messages not seen before are tokenized
+        input_tokens = await asyncio.to_thread(token_counter.count, body)
+        return JSONResponse(content={"input_tokens": input_tokens}, status_code=200)
+
+    # Embeddings for CPU pool models never wait behind chats for a GPU slot;
+    # models with a dedicated pool never share (and swap) VRAM with other models
+    cpu_pool = uses_cpu_pool(method, path, body)
+    pool = None if cpu_pool else model_pool(body)
+    admission = pool_admission(cpu_pool, pool)
+
+    # Streaming requests use .remote_gen() for true SSE support.
+    # Backend calls go through .aio so a long GPU call never blocks the event loop.
+    if is_streaming_request(body) and not cpu_pool:
+        # Admit before responding so a full queue still gets a 429
+        ticket = await admission.acquire(deadline)
+        # Backend stages arrive in the body (e.g. Ollama's final chunk), after the headers
+        timing.add("queue", ticket.wait)
+        # Turns of one conversation stick to one replica so its prompt cache stays hot
+        replica = (pool.router if pool is not None else affinity_router).choose(prefix_key(path, body))
         return StreamingResponse(
-            OllamaBackend().stream_proxy.remote_gen(f"/{path}", body),
+            stream_from_replica(replica, f"/{path}", body, ticket, raw, content_type, pool),
             media_type="text/event-stream",
             headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
+            # Frees the slot even if the stream is never iterated
+            background=BackgroundTask(ticket.release),
         )
 
-    # Non-streaming requests use .remote() (current behavior)
-    result = OllamaBackend().proxy.remote(method, f"/{path}", body)
-    return JSONResponse(content=result["body"], status_code=result["status_code"])
+    # Deterministic requests may be answered from the cache without waking the GPU
+    # (passthrough keys on the raw bytes, since `body` is only a partial view)
+    key_body = body if raw is None else raw
+    cache_key = None
+    cache_status = "BYPASS"
+    if response_cache is not None and method == "POST" and embedding_output is None and is_deterministic(body):
+        cache_key = request_key(method, path, key_body)
+        if not wants_cache_bypass(request):
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return Response(
+                    content=cached.content,
+                    status_code=cached.status_code,
+                    media_type=cached.media_type,
+                    headers={"X-Cache": "HIT"},
+                )
+            cache_status = "MISS"
+
+    # Non-streaming requests use call_remote(); identical in-flight calls are coalesced
+    async def call_backend():
+        if pipelined:
+            return await embed_in_batches(path, body, deadline, cpu_pool, pool)
+        async with admission.slot(deadline) as ticket:
+            with ollama_backend(cpu_pool, prefix_key(path, body), pool) as backend:
+                started = time.perf_counter()
+                try:
+                    if passthrough:
+                        model = (body.get("model") or body.get("name")) if body else None
+                        result = await call_remote(
+                            backend.raw_proxy, method, f"/{path}", raw or b"", content_type, model
+                        )
+                    else:
+                        result = await call_remote(backend.proxy, method, f"/{path}", body)
+                finally:
+                    round_trip = time.perf_counter() - started
+                    metrics.backend_seconds.observe(round_trip, route_label(f"/ollama/{path}"), "")
+        return {**result, "queue": ticket.wait, "round_trip": round_trip}
+
+    if is_coalescable(method, path, body):
+        pending = inflight.do(cache_key or request_key(method, path, key_body), call_backend)
+    else:
+        pending = call_backend()
+    # A client that goes away cancels its call (a shared call once all its callers are gone)
+    result = await (cancel_on_disconnect(request.receive, pending) if GATEWAY_CANCEL_ON_DISCONNECT else pending)
+    timing.add("queue", result["queue"])
+    if cpu_pool or pool is not None:
+        timing.add("pool", desc=admission.name)
+    timing.add_backend(result.get("timing"), result["round_trip"])
+    if "embed" in result:
+        stats = result["embed"]
+        timing.add("embed", desc=f"{stats['inputs']} inputs, {stats['unique']} unique, "
+                                 f"{stats['cached']} cached, {stats['batches']} batches")
+    if passthrough:
+        # Ollama's bytes and headers go back unchanged
+        response = Response(content=result["content"], status_code=result["status_code"], headers=result["headers"])
+    elif embedding_output is not None and result["status_code"] == 200:
+        return embedding_response(result["body"], *embedding_output)
+    else:
+        response = JSONResponse(content=result["body"], status_code=result["status_code"])
+    if cache_key is not None:
+        if response.status_code == 200:
+            response_cache.put(cache_key, response.body, media_type=response.headers.get("content-type", "application/json"))
+        response.headers["X-Cache"] = cache_status
+    return response
 
 
 # =============================================================================
@@ -411,7 +1562,12 @@ async def diffusers_generate(request: Request):
         Raw PNG image bytes (HuggingFace Inference API style)
         Content-Type: image/png
     """
+    timing = request.state.server_timing
+    parse_started = time.perf_counter()
     body = await request.json()
+    timing.add("parse", time.perf_counter() - parse_started)
+    if GATEWAY_CAPTURE:
+        await capture_request(request, body)
 
     # Validate required fields
     model_id = body.get("model_id")
@@ -440,39 +1596,51 @@ async def diffusers_generate(request: Request):
             status_code=400,
         )
 
+    try:
+        deadline = request_deadline(request)
+    except ValueError:
+        return JSONResponse(content={"error": "X-Request-Timeout must be a number of seconds"}, status_code=400)
+
+    # Label this request's metrics with the (validated) model
+    request.state.metrics_model = model_id
+
     # Extract optional parameters
     params = body.get("parameters", {})
 
     # Route to appropriate GPU tier backend
     gpu_tier = model_config["gpu_tier"]
     if gpu_tier == "a10g":
-        image_bytes = DiffusersBackend_A10G().generate.remote(
-            model_id=model_id,
-            prompt=inputs,
-            height=params.get("height"),
-            width=params.get("width"),
-            num_inference_steps=params.get("num_inference_steps"),
-            guidance_scale=params.get("guidance_scale"),
-            seed=params.get("seed"),
-        )
+        backend = DiffusersBackend_A10G()
     elif gpu_tier == "l40s":
-        image_bytes = DiffusersBackend_L40S().generate.remote(
-            model_id=model_id,
-            prompt=inputs,
-            height=params.get("height"),
-            width=params.get("width"),
-            num_inference_steps=params.get("num_inference_steps"),
-            guidance_scale=params.get("guidance_scale"),
-            seed=params.get("seed"),
-        )
+        backend = DiffusersBackend_L40S()
     else:
         return JSONResponse(
             content={"error": f"Unknown GPU tier: {gpu_tier}"},
             status_code=500,
         )
 
+    # Await the GPU call asynchronously so other gateway requests keep flowing;
+    # each tier admits a bounded number of renders and sheds the rest
+    async with diffusers_admission[gpu_tier].slot(deadline) as ticket:
+        started = time.perf_counter()
+        try:
+            result = await backend.generate.remote.aio(
+                model_id=model_id,
+                prompt=inputs,
+                height=params.get("height"),
+                width=params.get("width"),
+                num_inference_steps=params.get("num_inference_steps"),
+                guidance_scale=params.get("guidance_scale"),
+                seed=params.get("seed"),
+            )
+        finally:
+            round_trip = time.perf_counter() - started
+            metrics.backend_seconds.observe(round_trip, "/diffusers/generate", model_id)
+    timing.add("queue", ticket.wait)
+    timing.add_backend(result["timing"], round_trip)
+
     # Return raw PNG bytes (HuggingFace Inference API style)
-    return Response(content=image_bytes, media_type="image/png")
+    return Response(content=result["image"], media_type="image/png")
 
 
 # =============================================================================
@@ -480,9 +1648,17 @@ async def diffusers_generate(request: Request):
 # =============================================================================
 
 
+gateway_volumes = {}
+if GATEWAY_CAPTURE:
+    gateway_volumes[GATEWAY_CAPTURE_DIR] = trace_volume
+if GATEWAY_EMBED_CACHE:
+    gateway_volumes[GATEWAY_EMBED_CACHE_DIR] = embedding_volume
+
+
 @app.cls(
     image=gateway_image,
     min_containers=GATEWAY_MIN_CONTAINERS,
+    volumes=gateway_volumes,
 )
 class GatewayServer:
     """Main gateway server (CPU, always warm) that routes to backends."""